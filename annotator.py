@@ -1,14 +1,13 @@
-import json
-import math
-import random
 import numpy as np
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Dict, List, Optional, Tuple, Union
 
-from datatypes.reference import Reference, ReferenceTrack
-from datatypes.detection import Detection
-from utilities import get_data_path, save_json
+from datatypes.sequence import Sequence
+from utilities import get_data_path, save_data
+
+Seed = Union[None, int, np.random.SeedSequence]
 
 
 class TrackGenerator:
@@ -19,121 +18,145 @@ class TrackGenerator:
         position_randomization: float = 0.1,
         delete_probability: float = 0.1,
         add_probability: float = 0.1,
+        seed: Seed = None,
+        mod_min: float = 0.10,
+        mod_max: float = 0.40,
+        position_range: float = 10.0,
     ):
         self.num_frames = num_frames
         self.num_tracks = num_tracks
         self.position_randomization = position_randomization
         self.delete_probability = delete_probability
         self.add_probability = add_probability
+        self.mod_min = mod_min
+        self.mod_max = mod_max
+        self.position_range = position_range
+        self.rng = np.random.default_rng(seed)
 
         self.min_track_length = 20
         self.annotations = self.generate_annotations()
         self.min_max_ranges = self.get_min_max_ranges()
 
-    def _generate_track_ranges(self) -> Dict[int, Tuple[int, int]]:
-        track_ranges = {}
-        for i in range(self.num_tracks):
-            start_frame = random.randint(
-                1, self.num_frames - (self.min_track_length + 1)
-            )
-            end_frame = random.randint(
-                start_frame + self.min_track_length, self.num_frames
-            )
-            track_ranges[i] = (start_frame, end_frame)
-        return track_ranges
-
-    def generate_annotations(self) -> Dict[int, List[Reference]]:
-        track_ranges = self._generate_track_ranges()
-        annotations = {frame: [] for frame in range(1, self.num_frames + 1)}
-
-        for track_id, (start_frame, end_frame) in track_ranges.items():
-            initial_x = random.uniform(-10, 10)
-            initial_y = random.uniform(-10, 10)
-            initial_z = random.uniform(-10, 10)
-            track = ReferenceTrack(
-                track_id, initial_x, initial_y, initial_z, start_frame, end_frame
-            )
-            track_positions = track.generate()
+    def _generate_track_ranges(self) -> Tuple[np.ndarray, np.ndarray]:
+        start_frames = self.rng.integers(
+            1,
+            self.num_frames - (self.min_track_length + 1),
+            self.num_tracks,
+            endpoint=True,
+        )
+        end_frames = self.rng.integers(
+            start_frames + self.min_track_length, self.num_frames, endpoint=True
+        )
+        return start_frames, end_frames
+
+    def generate_annotations(self) -> Sequence:
+        start_frames, end_frames = self._generate_track_ranges()
+        initial = self.rng.uniform(
+            -self.position_range, self.position_range, (self.num_tracks, 3)
+        )
+        functions = self.rng.integers(0, 3, (self.num_tracks, 3))
+        mods = self.rng.uniform(self.mod_min, self.mod_max, (self.num_tracks, 3))
+
+        # Each axis moves by sin, cos or a linear ramp of mod * steps since the
+        # track started; positions are the running sum of those increments.
+        steps = np.arange(self.num_frames)
+        phase = mods[:, None, :] * steps[None, :, None]
+        increments = np.where(
+            functions[:, None, :] == 0,
+            np.sin(phase),
+            np.where(functions[:, None, :] == 1, np.cos(phase), 0.20 * phase),
+        )
+        positions = initial[:, None, :] + np.cumsum(increments, axis=1) - increments
+
+        valid = steps[None, :] <= (end_frames - start_frames)[:, None]
+        track_ids, track_steps = np.nonzero(valid)
+        frames = start_frames[track_ids] + track_steps
+        order = np.argsort(frames, kind="stable")
+
+        return self._to_sequence(
+            frames[order],
+            positions[track_ids, track_steps][order],
+            track_ids[order],
+        )
 
-            for frame, reference in track_positions.items():
-                annotations[frame].append(reference)
+    def _to_sequence(
+        self, frames: np.ndarray, positions: np.ndarray, ids: Optional[np.ndarray]
+    ) -> Sequence:
+        counts = np.bincount(frames - 1, minlength=self.num_frames)
+        return Sequence(
+            frames=np.arange(1, self.num_frames + 1, dtype=np.int64),
+            frame_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            positions=positions,
+            ids=ids.astype(np.int64) if ids is not None else None,
+        )
 
-        return annotations
+    def _object_frames(self, sequence: Sequence) -> np.ndarray:
+        return np.repeat(sequence.frames, np.diff(sequence.frame_offsets))
 
     def get_min_max_ranges(self) -> Dict[str, Tuple[float, float]]:
-        x_values, y_values, z_values = [], [], []
-        for frame_data in self.annotations.values():
-            for track in frame_data:
-                x_values.append(track.x)
-                y_values.append(track.y)
-                z_values.append(track.z)
-
-        return {
-            "x": (min(x_values), max(x_values)),
-            "y": (min(y_values), max(y_values)),
-            "z": (min(z_values), max(z_values)),
-        }
-
-    def generate_false_positives(self, new_tracks: List[Detection]) -> List[Detection]:
-        num_new_tracks = np.random.poisson(self.add_probability)
-        x_range, y_range, z_range = (
-            self.min_max_ranges["x"],
-            self.min_max_ranges["y"],
-            self.min_max_ranges["z"],
+        low = self.annotations.positions.min(axis=0).tolist()
+        high = self.annotations.positions.max(axis=0).tolist()
+        return {axis: (low[i], high[i]) for i, axis in enumerate(("x", "y", "z"))}
+
+    def generate_false_positives(self) -> Tuple[np.ndarray, np.ndarray]:
+        counts = self.rng.poisson(self.add_probability, self.num_frames)
+        frames = np.repeat(np.arange(1, self.num_frames + 1), counts)
+        low, high = np.array(list(self.min_max_ranges.values())).T
+        positions = self.rng.uniform(low, high, (len(frames), 3))
+        return frames, positions
+
+    def modify_tracks(self) -> Sequence:
+        references = self.annotations
+        keep = self.rng.random(references.num_objects) >= self.delete_probability
+        frames = self._object_frames(references)[keep]
+        positions = references.positions[keep] + self.rng.uniform(
+            -self.position_randomization,
+            self.position_randomization,
+            (np.count_nonzero(keep), 3),
         )
-        for _ in range(num_new_tracks):
-            new_track = Detection(
-                x=np.random.uniform(x_range[0], x_range[1]),
-                y=np.random.uniform(y_range[0], y_range[1]),
-                z=np.random.uniform(z_range[0], z_range[1]),
-            )
-            new_tracks.append(new_track)
-        return new_tracks
 
-    def modify_tracks(self) -> Dict[int, List[Detection]]:
-        new_data = {}
+        false_frames, false_positions = self.generate_false_positives()
+        frames = np.concatenate([frames, false_frames])
+        order = np.argsort(frames, kind="stable")
 
-        for frame, frame_data in self.annotations.items():
-            new_tracks = []
-            for track in frame_data:
-                if random.random() < self.delete_probability:
-                    continue
+        return self._to_sequence(
+            frames[order], np.concatenate([positions, false_positions])[order], None
+        )
 
-                new_track = Detection(x=track.x, y=track.y, z=track.z)
-                new_track.x += np.random.uniform(
-                    -self.position_randomization, self.position_randomization
-                )
-                new_track.y += np.random.uniform(
-                    -self.position_randomization, self.position_randomization
-                )
-                new_track.z += np.random.uniform(
-                    -self.position_randomization, self.position_randomization
-                )
-                new_tracks.append(new_track)
+    def save_data(self, annotations_path: Path, detections_path: Path) -> None:
+        save_data(annotations_path, self.annotations)
+        save_data(detections_path, self.modify_tracks())
 
-            new_tracks = self.generate_false_positives(new_tracks)
 
-            new_data[frame] = new_tracks
+def _generate_sequence(
+    arguments: Tuple[Path, Path, Dict, np.random.SeedSequence],
+) -> None:
+    annotations_path, detections_path, settings, seed = arguments
+    TrackGenerator(**settings, seed=seed).save_data(annotations_path, detections_path)
 
-        return new_data
 
-    def save_data(self, annotations_path: Path, detections_path: Path) -> None:
-        detections = self.modify_tracks()
-
-        save_json(
-            annotations_path,
-            {
-                frame: {"tracks": [ref.to_dict() for ref in ref_list]}
-                for frame, ref_list in self.annotations.items()
-            },
-        )
-        save_json(
-            detections_path,
-            {
-                frame: {"tracks": [det.to_dict() for det in det_list]}
-                for frame, det_list in detections.items()
-            },
-        )
+def generate_sequences(
+    paths: List[Tuple[Path, Path]],
+    settings: Dict,
+    seed: Optional[int] = None,
+    workers: int = 1,
+) -> None:
+    # Every sequence draws from its own child seed, so the output does not
+    # depend on the number of workers or the order they finish in.
+    seeds = np.random.SeedSequence(seed).spawn(len(paths))
+    arguments = [
+        (annotations_path, detections_path, settings, sequence_seed)
+        for (annotations_path, detections_path), sequence_seed in zip(paths, seeds)
+    ]
+
+    if workers <= 1:
+        for argument in arguments:
+            _generate_sequence(argument)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(arguments) // (4 * workers))
+        list(pool.map(_generate_sequence, arguments, chunksize=chunksize))
 
 
 def parse_args():
@@ -144,12 +167,12 @@ def parse_args():
     parser.add_argument(
         "--output-references",
         type=Path,
-        help="Path to save references.",
+        help="Path to save references (.json, .ndjson or columnar .npz).",
     )
     parser.add_argument(
         "--output-detections",
         type=Path,
-        help="Path to save detections.",
+        help="Path to save detections (.json, .ndjson or columnar .npz).",
     )
     parser.add_argument("--num-frames", type=int, help="Number of frames.")
     parser.add_argument(
@@ -173,22 +196,55 @@ def parse_args():
         default=1.42,
         help="Add probability of false detections. (framewise FPr) (default: %(default)s)",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the generated sequences, random when not set. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sequences",
+        type=int,
+        default=1,
+        help="Number of sequences, more than one appends _<nr> to the output names. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes generating sequences in parallel. (default: %(default)s)",
+    )
 
     return parser.parse_args()
 
 
+def _numbered_path(path: Path, nr: int) -> Path:
+    return path.with_name(f"{path.stem}_{nr}{path.suffix}")
+
+
 def main() -> None:
     args = parse_args()
 
-    track_generator = TrackGenerator(
-        num_frames=args.num_frames,
-        num_tracks=args.num_tracks,
-        position_randomization=args.position_randomize,
-        delete_probability=args.delete_probability,
-        add_probability=args.add_probability,
-    )
+    settings = {
+        "num_frames": args.num_frames,
+        "num_tracks": args.num_tracks,
+        "position_randomization": args.position_randomize,
+        "delete_probability": args.delete_probability,
+        "add_probability": args.add_probability,
+    }
+
+    if args.sequences == 1:
+        paths = [(args.output_references, args.output_detections)]
+    else:
+        paths = [
+            (
+                _numbered_path(args.output_references, nr),
+                _numbered_path(args.output_detections, nr),
+            )
+            for nr in range(args.sequences)
+        ]
 
-    track_generator.save_data(args.output)
+    generate_sequences(paths, settings, seed=args.seed, workers=args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,301 @@
+import argparse
+import numpy as np
+from time import perf_counter
+from tabulate import tabulate
+from typing import Callable, List, Tuple
+
+from tracker import (
+    ASSIGNMENT_SOLVERS,
+    DISTANCE_METRICS,
+    BatchTracker,
+    Track,
+    Tracker,
+    TrackSettings,
+    compute_cost_matrix,
+    compute_mahalanobis_cost_matrix,
+    innovation_covariance_inverses,
+)
+
+
+def _loop_cost_matrix(states: np.ndarray, detections: np.ndarray) -> np.ndarray:
+    cost_matrix = np.zeros((len(states), len(detections)))
+    for i, state in enumerate(states):
+        for j, detection in enumerate(detections):
+            cost_matrix[i, j] = np.linalg.norm(state - detection)
+    return cost_matrix
+
+
+def _best_time(function: Callable[[], None], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        t0 = perf_counter()
+        function()
+        timings.append(perf_counter() - t0)
+    return min(timings)
+
+
+def _object_tracker(settings: TrackSettings, states: np.ndarray) -> Tracker:
+    tracker = Tracker(settings)
+    for state in states:
+        tracker.tracks.append(
+            Track(tracker.track_id, state, np.zeros(3), np.zeros(3), settings)
+        )
+        tracker.track_id += 1
+    return tracker
+
+
+def _batch_tracker(settings: TrackSettings, states: np.ndarray) -> BatchTracker:
+    tracker = BatchTracker(settings)
+    tracker._add_tracks(states)
+    return tracker
+
+
+def _frame_latency(
+    build: Callable[[TrackSettings, np.ndarray], object],
+    settings: TrackSettings,
+    states: np.ndarray,
+    detections: np.ndarray,
+    repeats: int,
+) -> float:
+    timings = []
+    for _ in range(repeats):
+        tracker = build(settings, states)
+        frame_detections = list(detections)
+        t0 = perf_counter()
+        tracker.predict_tracks()
+        tracker.update_tracks(frame_detections)
+        timings.append(perf_counter() - t0)
+    return min(timings)
+
+
+def _with_solver(settings: TrackSettings, solver: str) -> TrackSettings:
+    return TrackSettings(**{**vars(settings), "solver": solver})
+
+
+def _assignment(
+    settings: TrackSettings, states: np.ndarray, detections: np.ndarray
+) -> Tuple[np.ndarray, float]:
+    # Pairs chosen for the first frame and their gated cost, every unmatched
+    # track costs its full gate.
+    tracker = _batch_tracker(settings, states)
+    tracker.predict_tracks()
+    predicted = tracker.x[: tracker.size, :3]
+    if settings.metric == "mahalanobis":
+        inverse_covariances = innovation_covariance_inverses(
+            tracker.P[: tracker.size, :3, :3], tracker.R
+        )
+        cost_matrix = compute_mahalanobis_cost_matrix(
+            predicted, detections, inverse_covariances
+        )
+    else:
+        inverse_covariances = None
+        cost_matrix = compute_cost_matrix(predicted, detections)
+
+    track_indices, detection_indices = tracker._match(detections, inverse_covariances)
+    pairs = np.column_stack([track_indices, detection_indices])
+    cost = cost_matrix[track_indices, detection_indices].sum() + (
+        settings.distance_threshold * (len(states) - len(pairs))
+    )
+    return pairs, cost
+
+
+def _solver_rows(
+    settings: TrackSettings,
+    solvers: List[str],
+    states: np.ndarray,
+    detections: np.ndarray,
+    repeats: int,
+) -> List[List[object]]:
+    # Quality is measured against the exact hungarian solution of the frame.
+    reference, reference_cost = _assignment(
+        _with_solver(settings, "hungarian"), states, detections
+    )
+    reference_pairs = set(map(tuple, reference.tolist()))
+
+    rows = []
+    for solver in solvers:
+        solver_settings = _with_solver(settings, solver)
+        pairs, cost = _assignment(solver_settings, states, detections)
+        agreement = len(reference_pairs.intersection(map(tuple, pairs.tolist())))
+        latency = _frame_latency(
+            _batch_tracker, solver_settings, states, detections, repeats
+        )
+        rows.append(
+            [
+                len(states),
+                len(detections),
+                solver,
+                f"{1000 * latency:.2f}",
+                len(pairs),
+                f"{100 * agreement / max(len(reference_pairs), 1):.1f}",
+                f"{100 * (cost / reference_cost - 1):+.3f}",
+            ]
+        )
+    return rows
+
+
+def run(
+    sizes: List[int],
+    repeats: int,
+    max_loop_pairs: int,
+    seed: int,
+    gating: bool = False,
+    metric: str = "euclidean",
+    solvers: Tuple[str, ...] = ASSIGNMENT_SOLVERS,
+    noise: float = 0.1,
+) -> None:
+    rng = np.random.default_rng(seed)
+    settings = TrackSettings(
+        measurement_noise=0.5,
+        process_noise=0.01,
+        covariance=5.0,
+        distance_threshold=2.0,
+        max_age=3,
+        min_hits=2,
+        max_consecutive_misses=3,
+        gating=gating,
+        metric=metric,
+    )
+
+    table = []
+    solver_table = []
+    for size in sizes:
+        extent = 10.0 * np.cbrt(size)
+        states = rng.uniform(-extent, extent, size=(size, 3))
+        detections = np.concatenate(
+            [
+                states + rng.normal(scale=noise, size=states.shape),
+                rng.uniform(-extent, extent, size=(size // 2, 3)),
+            ]
+        )
+
+        if size * len(detections) <= max_loop_pairs:
+            loop = _best_time(lambda: _loop_cost_matrix(states, detections), repeats)
+            loop_ms = f"{1000 * loop:.2f}"
+        else:
+            loop_ms = "-"
+        vectorized = _best_time(
+            lambda: compute_cost_matrix(states, detections), repeats
+        )
+
+        table.append(
+            [
+                size,
+                len(detections),
+                loop_ms,
+                f"{1000 * vectorized:.2f}",
+                f"{1000 * _frame_latency(_object_tracker, settings, states, detections, repeats):.2f}",
+                f"{1000 * _frame_latency(_batch_tracker, settings, states, detections, repeats):.2f}",
+            ]
+        )
+        solver_table.extend(
+            _solver_rows(settings, list(solvers), states, detections, repeats)
+        )
+
+    print(
+        tabulate(
+            table,
+            headers=[
+                "Tracks",
+                "Detections",
+                "Loop cost (ms)",
+                "Vectorized cost (ms)",
+                "Frame object (ms)",
+                "Frame batch (ms)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print(
+        tabulate(
+            solver_table,
+            headers=[
+                "Tracks",
+                "Detections",
+                "Solver",
+                "Frame batch (ms)",
+                "Matches",
+                "Hungarian pairs (%)",
+                "Cost vs hungarian (%)",
+            ],
+            tablefmt="grid",
+        )
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark of association frame latency against scene size."
+    )
+
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 500, 1000, 2000],
+        help="Number of live tracks per scenario. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Repetitions per measurement, best is reported. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-loop-pairs",
+        type=int,
+        default=250_000,
+        help="Skip the python loop kernel above this many pairs. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--gating",
+        action="store_true",
+        help="Gate association with a spatial index.",
+    )
+    parser.add_argument(
+        "--metric",
+        type=str,
+        choices=DISTANCE_METRICS,
+        default="euclidean",
+        help="Association distance of the frame latency scenarios. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--solvers",
+        type=str,
+        nargs="+",
+        choices=ASSIGNMENT_SOLVERS,
+        default=list(ASSIGNMENT_SOLVERS),
+        help="Association solvers compared on frame latency and assignment quality. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0.1,
+        help="Standard deviation of detections around their tracks, larger values crowd the gates. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for the scenarios. (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    run(
+        args.sizes,
+        args.repeats,
+        args.max_loop_pairs,
+        args.seed,
+        gating=args.gating,
+        metric=args.metric,
+        solvers=tuple(args.solvers),
+        noise=args.noise,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import numpy as np
+import optuna
+from pathlib import Path
+from time import perf_counter
+from tabulate import tabulate
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from annotator import TrackGenerator
+from evaluator import process_data
+from optimizer import Optimizer
+from tracker import TrackSettings, run_tracker_with_parameters
+from utilities import load_json, save_json
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "throughput.json"
+METRICS = (
+    "tracker_object_fps",
+    "tracker_batch_fps",
+    "tracker_gating_fps",
+    "evaluator_pairs_per_s",
+    "optimizer_trials_per_min",
+)
+
+
+def _environment() -> Dict[str, Any]:
+    # Throughput only compares on the machine and interpreter that recorded it.
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def _scenario_key(num_tracks: int, false_positives: int) -> str:
+    return f"tracks={num_tracks},fp={false_positives}"
+
+
+def _generator(
+    num_tracks: int, false_positives: int, num_frames: int, seed: int
+) -> TrackGenerator:
+    # Constant track density, the volume grows with the number of tracks.
+    return TrackGenerator(
+        num_frames=num_frames,
+        num_tracks=num_tracks,
+        position_randomization=0.05,
+        delete_probability=0.1,
+        add_probability=false_positives,
+        seed=seed,
+        position_range=10.0 * (num_tracks / 10) ** (1 / 3),
+    )
+
+
+def _candidate_pairs(references: Dict[str, Any], tracks: Dict[str, Any]) -> int:
+    # The evaluator compares every annotation with every track of its frame.
+    return sum(
+        len(content["tracks"]) * len(tracks.get(frame, {"tracks": []})["tracks"])
+        for frame, content in references.items()
+    )
+
+
+def _best_time(function: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        t0 = perf_counter()
+        function()
+        timings.append(perf_counter() - t0)
+    return min(timings)
+
+
+def _settings(gating: bool) -> TrackSettings:
+    return TrackSettings(
+        measurement_noise=0.5,
+        process_noise=0.01,
+        covariance=5.0,
+        distance_threshold=2.0,
+        max_age=3,
+        min_hits=2,
+        max_consecutive_misses=3,
+        gating=gating,
+    )
+
+
+def _optimizer_throughput(
+    generators: List[TrackGenerator], trials: int, seed: int
+) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        references_dir = Path(directory) / "references"
+        detections_dir = Path(directory) / "detections"
+        filelist = [f"clip_{nr}" for nr in range(len(generators))]
+        for file, generator in zip(filelist, generators):
+            generator.save_data(
+                references_dir / f"{file}.npz", detections_dir / f"{file}.npz"
+            )
+
+        # Default settings, the path main.py takes without extra options.
+        optimizer = Optimizer(references_dir, detections_dir, filelist)
+        optimizer.study.sampler = optuna.samplers.RandomSampler(seed=seed)
+        optimizer._load_data()
+        elapsed = _best_time(lambda: optimizer._run_trials(trials), 1)
+    return 60.0 * trials / elapsed
+
+
+def run_scenario(
+    num_tracks: int,
+    false_positives: int,
+    num_frames: int,
+    repeats: int,
+    max_object_tracks: int,
+    max_evaluator_pairs: int,
+    max_optimizer_tracks: int,
+    optimizer_sequences: int,
+    optimizer_trials: int,
+    seed: int,
+) -> Dict[str, Optional[float]]:
+    generator = _generator(num_tracks, false_positives, num_frames, seed)
+    references = generator.annotations.to_dict()
+    detections = generator.modify_tracks().to_dict()
+    results: Dict[str, Optional[float]] = dict.fromkeys(METRICS)
+
+    if num_tracks <= max_object_tracks:
+        elapsed = _best_time(
+            lambda: run_tracker_with_parameters(_settings(False), detections), repeats
+        )
+        results["tracker_object_fps"] = num_frames / elapsed
+
+    # Both engines track with the same settings, gating is measured on its own.
+    tracks: Dict[str, Any] = {}
+
+    def run_batch() -> None:
+        tracks.update(
+            run_tracker_with_parameters(_settings(False), detections, engine="batch")
+        )
+
+    results["tracker_batch_fps"] = num_frames / _best_time(run_batch, repeats)
+
+    elapsed = _best_time(
+        lambda: run_tracker_with_parameters(
+            _settings(True), detections, engine="batch"
+        ),
+        repeats,
+    )
+    results["tracker_gating_fps"] = num_frames / elapsed
+
+    num_pairs = _candidate_pairs(references, tracks)
+    if num_pairs <= max_evaluator_pairs:
+        elapsed = _best_time(lambda: process_data(references, tracks), repeats)
+        results["evaluator_pairs_per_s"] = num_pairs / elapsed
+
+    if num_tracks <= max_optimizer_tracks:
+        generators = [
+            _generator(num_tracks, false_positives, num_frames, seed + nr)
+            for nr in range(optimizer_sequences)
+        ]
+        results["optimizer_trials_per_min"] = _optimizer_throughput(
+            generators, optimizer_trials, seed
+        )
+
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Optional[float]]],
+    baseline: Dict[str, Dict[str, Optional[float]]],
+    tolerance: float,
+) -> List[Tuple[str, str, float, float]]:
+    regressions = []
+    for key, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(key, {}).get(metric)
+            if value is None or reference is None:
+                continue
+            if value < (1.0 - tolerance) * reference:
+                regressions.append((key, metric, value, reference))
+    return regressions
+
+
+def _format(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.1f}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Throughput of tracker, evaluator and optimizer on synthetic scenarios, compared against stored baselines."
+    )
+
+    parser.add_argument(
+        "--tracks",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="Number of reference tracks per scenario. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--false-positives",
+        type=int,
+        nargs="+",
+        default=[0, 10, 50],
+        help="Mean false positives per frame per scenario. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=50,
+        help="Frames per sequence. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Repetitions per measurement, best is reported. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-object-tracks",
+        type=int,
+        default=1000,
+        help="Skip the object engine above this many tracks. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-evaluator-pairs",
+        type=int,
+        default=20_000_000,
+        help="Skip the evaluator above this many candidate pairs. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-optimizer-tracks",
+        type=int,
+        default=100,
+        help="Skip the optimizer above this many tracks. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--optimizer-sequences",
+        type=int,
+        default=3,
+        help="Sequences per optimizer trial. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--optimizer-trials",
+        type=int,
+        default=5,
+        help="Trials per optimizer measurement. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for the scenarios. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINE_PATH,
+        help="Baseline file to compare against. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown reported as a regression. (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    results = {}
+    for num_tracks in args.tracks:
+        for false_positives in args.false_positives:
+            key = _scenario_key(num_tracks, false_positives)
+            results[key] = run_scenario(
+                num_tracks,
+                false_positives,
+                args.frames,
+                args.repeats,
+                args.max_object_tracks,
+                args.max_evaluator_pairs,
+                args.max_optimizer_tracks,
+                args.optimizer_sequences,
+                args.optimizer_trials,
+                args.seed,
+            )
+            print(
+                key, {metric: _format(value) for metric, value in results[key].items()}
+            )
+
+    print(
+        tabulate(
+            [
+                [key, *map(_format, metrics.values())]
+                for key, metrics in results.items()
+            ],
+            headers=[
+                "Scenario",
+                "Tracker object (frames/s)",
+                "Tracker batch (frames/s)",
+                "Tracker batch, gated (frames/s)",
+                "Evaluator (pairs/s)",
+                "Optimizer (trials/min)",
+            ],
+            tablefmt="grid",
+            colalign=("left", "right", "right", "right", "right", "right"),
+        )
+    )
+
+    if args.save_baseline:
+        save_json(
+            args.baseline,
+            {
+                "environment": _environment(),
+                "frames": args.frames,
+                "scenarios": results,
+            },
+            indent=4,
+        )
+        print("Saved baseline to", args.baseline)
+        return
+
+    if not args.baseline.exists():
+        print("No baseline at", args.baseline)
+        return
+
+    baseline = load_json(args.baseline)
+    recorded = baseline.get("environment", {})
+    changed = [
+        f"{key}={recorded.get(key)!r} (now {value!r})"
+        for key, value in _environment().items()
+        if recorded.get(key) != value
+    ]
+    if changed:
+        print(
+            "Baseline was recorded in another environment,",
+            ", ".join(changed) + ", not comparing.",
+        )
+        return
+    if baseline["frames"] != args.frames:
+        print(
+            "Baseline was recorded with", baseline["frames"], "frames, not comparing."
+        )
+        return
+
+    regressions = compare(results, baseline["scenarios"], args.tolerance)
+    if regressions:
+        print(
+            tabulate(
+                [
+                    [key, metric, _format(value), _format(reference)]
+                    for key, metric, value, reference in regressions
+                ],
+                headers=["Scenario", "Metric", "Current", "Baseline"],
+                tablefmt="grid",
+            )
+        )
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from utilities import load_sequence, save_data
+
+
+def convert(inputs: List[Path], extension: str, output_dir: Optional[Path]) -> None:
+    for input_path in inputs:
+        output_path = (output_dir or input_path.parent) / (input_path.stem + extension)
+        assert output_path != input_path, f"{input_path} is already {extension}"
+
+        save_data(output_path, load_sequence(input_path))
+        print(f"Converted {input_path} -> {output_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert references, detections or tracks between json, ndjson and columnar npz."
+    )
+
+    parser.add_argument(
+        "--input",
+        type=Path,
+        nargs="+",
+        help="Paths to files to convert.",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["json", "ndjson", "npz"],
+        default="npz",
+        help="Output format. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Folder for the converted files, next to the inputs if omitted.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    convert(args.input, f".{args.format}", args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
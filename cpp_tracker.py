@@ -0,0 +1,137 @@
+import os
+import ctypes
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from tracker import TrackSettings
+
+LIBRARY_PATH = Path(__file__).resolve().parent / "target" / "build" / "libtracktuner.so"
+
+_library: Optional[ctypes.CDLL] = None
+
+
+def _library_path() -> Path:
+    return Path(os.environ.get("TRACKTUNER_CPP_LIBRARY", LIBRARY_PATH))
+
+
+def load_library() -> ctypes.CDLL:
+    global _library
+    if _library is not None:
+        return _library
+
+    library_path = _library_path()
+    if not library_path.exists():
+        raise FileNotFoundError(
+            f"C++ tracker library not found at {library_path}, build it with "
+            "`cmake -S target -B target/build && cmake --build target/build`."
+        )
+
+    library = ctypes.CDLL(str(library_path))
+    library.tracker_create.restype = ctypes.c_void_p
+    library.tracker_create.argtypes = [
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+    ]
+    library.tracker_destroy.restype = None
+    library.tracker_destroy.argtypes = [ctypes.c_void_p]
+    library.tracker_run.restype = ctypes.c_int64
+    library.tracker_run.argtypes = [
+        ctypes.c_void_p,
+        np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS"),
+        np.ctypeslib.ndpointer(np.int64, flags="C_CONTIGUOUS"),
+        ctypes.c_int64,
+    ]
+    library.tracker_get_output.restype = None
+    library.tracker_get_output.argtypes = [
+        ctypes.c_void_p,
+        np.ctypeslib.ndpointer(np.int64, flags="C_CONTIGUOUS"),
+        np.ctypeslib.ndpointer(np.int64, flags="C_CONTIGUOUS"),
+        np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS"),
+    ]
+
+    _library = library
+    return _library
+
+
+def is_available() -> bool:
+    try:
+        load_library()
+    except (FileNotFoundError, OSError):
+        return False
+    return True
+
+
+def run_tracker_arrays(
+    tracker_settings: TrackSettings, detections: np.ndarray, frame_offsets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if tracker_settings.gating:
+        raise ValueError("Gating is not supported by the cpp backend.")
+    if tracker_settings.metric != "euclidean":
+        raise ValueError("Only the euclidean metric is supported by the cpp backend.")
+    if tracker_settings.solver != "hungarian":
+        raise ValueError("Only the hungarian solver is supported by the cpp backend.")
+
+    library = load_library()
+    detections = np.ascontiguousarray(detections, dtype=np.float64).reshape(-1, 3)
+    frame_offsets = np.ascontiguousarray(frame_offsets, dtype=np.int64)
+    num_frames = len(frame_offsets) - 1
+
+    handle = library.tracker_create(
+        tracker_settings.measurement_noise,
+        tracker_settings.process_noise,
+        tracker_settings.covariance,
+        tracker_settings.distance_threshold,
+        tracker_settings.max_age,
+        tracker_settings.min_hits,
+        tracker_settings.max_consecutive_misses,
+    )
+    try:
+        num_outputs = library.tracker_run(handle, detections, frame_offsets, num_frames)
+        output_offsets = np.zeros(num_frames + 1, dtype=np.int64)
+        ids = np.zeros(num_outputs, dtype=np.int64)
+        states = np.zeros((num_outputs, 9), dtype=np.float64)
+        library.tracker_get_output(handle, output_offsets, ids, states)
+    finally:
+        library.tracker_destroy(handle)
+
+    return output_offsets, ids, states
+
+
+def run_tracker_with_parameters(
+    tracker_settings: TrackSettings, detections: Dict[str, Any]
+) -> Dict[str, Any]:
+    frames = list(detections.keys())
+    counts = [len(detections[frame]["tracks"]) for frame in frames]
+    frame_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    positions = np.array(
+        [
+            [obj["x"], obj["y"], obj["z"]]
+            for frame in frames
+            for obj in detections[frame]["tracks"]
+        ],
+        dtype=np.float64,
+    )
+
+    output_offsets, ids, states = run_tracker_arrays(
+        tracker_settings, positions, frame_offsets
+    )
+
+    keys = ["x", "y", "z", "vx", "vy", "vz", "ax", "ay", "az"]
+    ids = ids.tolist()
+    states = states.tolist()
+    output_data: Dict[str, Any] = {}
+    for index, frame in enumerate(frames):
+        start, end = output_offsets[index], output_offsets[index + 1]
+        output_data[frame] = {
+            "tracks": [
+                {"id": track_id, **dict(zip(keys, state))}
+                for track_id, state in zip(ids[start:end], states[start:end])
+            ]
+        }
+    return output_data
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+POSITION_KEYS = ("x", "y", "z")
+# Placeholders of objects without an id or an attribute that others carry.
+MISSING_ID = -1
+MISSING_ATTRIBUTE = math.nan
+
+
+class Sequence:
+    def __init__(
+        self,
+        frames: np.ndarray,
+        frame_offsets: np.ndarray,
+        positions: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+        attributes: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.frames = frames
+        self.frame_offsets = frame_offsets
+        self.positions = positions
+        self.ids = ids
+        self.attributes = attributes if attributes is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def num_objects(self) -> int:
+        return len(self.positions)
+
+    def frame_slice(self, index: int) -> slice:
+        return slice(self.frame_offsets[index], self.frame_offsets[index + 1])
+
+    def frame_positions(self, index: int) -> np.ndarray:
+        return self.positions[self.frame_slice(index)]
+
+    def frame_ids(self, index: int) -> np.ndarray:
+        return self.ids[self.frame_slice(index)]
+
+    def window(self, start: int, stop: int) -> "Sequence":
+        # Frames start to stop as views of the same arrays. Only the offsets
+        # of a window that does not begin at the first object are rebased.
+        first, last = self.frame_offsets[start], self.frame_offsets[stop]
+        frame_offsets = self.frame_offsets[start : stop + 1]
+        if first != 0:
+            frame_offsets = frame_offsets - first
+        return Sequence(
+            self.frames[start:stop],
+            frame_offsets,
+            self.positions[first:last],
+            self.ids[first:last] if self.ids is not None else None,
+            {key: values[first:last] for key, values in self.attributes.items()},
+        )
+
+    def digest(self) -> str:
+        # Content hash independent of the file format the sequence came from.
+        digest = hashlib.sha256()
+        arrays = [
+            ("frames", self.frames.astype(np.int64)),
+            ("frame_offsets", self.frame_offsets.astype(np.int64)),
+            ("positions", self.positions.astype(np.float64)),
+        ]
+        if self.ids is not None:
+            arrays.append(("ids", self.ids.astype(np.int64)))
+        arrays.extend(
+            (key, self.attributes[key].astype(np.float64))
+            for key in sorted(self.attributes)
+        )
+        for name, array in arrays:
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Sequence":
+        return cls.from_frames(data.items())
+
+    @classmethod
+    def from_frames(cls, data: Iterable[Tuple[str, Dict[str, Any]]]) -> "Sequence":
+        frames: List[int] = []
+        counts: List[int] = []
+        positions: List[List[float]] = []
+        ids: List[int] = []
+        attributes: Dict[str, List[float]] = {}
+        has_ids = False
+
+        for frame, content in data:
+            objects = content["tracks"]
+            frames.append(int(frame))
+            counts.append(len(objects))
+            for obj in objects:
+                # Id and attribute columns stay aligned with the positions.
+                ids.append(obj.get("id", MISSING_ID))
+                has_ids = has_ids or "id" in obj
+                for key, value in obj.items():
+                    if key != "id" and key not in POSITION_KEYS:
+                        attributes.setdefault(
+                            key, [MISSING_ATTRIBUTE] * len(positions)
+                        ).append(value)
+                positions.append([obj["x"], obj["y"], obj["z"]])
+                for values in attributes.values():
+                    if len(values) < len(positions):
+                        values.append(MISSING_ATTRIBUTE)
+
+        return cls(
+            frames=np.array(frames, dtype=np.int64),
+            frame_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            positions=np.array(positions, dtype=np.float64).reshape(-1, 3),
+            ids=np.array(ids, dtype=np.int64) if has_ids else None,
+            attributes={
+                key: np.array(values, dtype=np.float64)
+                for key, values in attributes.items()
+            },
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.iter_frames())
+
+    def iter_frames(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        positions = self.positions.tolist()
+        ids = self.ids.tolist() if self.ids is not None else None
+        attributes = {key: values.tolist() for key, values in self.attributes.items()}
+        offsets = self.frame_offsets.tolist()
+
+        for index, frame in enumerate(self.frames.tolist()):
+            objects = []
+            for i in range(offsets[index], offsets[index + 1]):
+                obj: Dict[str, Any] = {}
+                if ids is not None and ids[i] != MISSING_ID:
+                    obj["id"] = ids[i]
+                obj.update(zip(POSITION_KEYS, positions[i]))
+                for key, values in attributes.items():
+                    if not math.isnan(values[i]):
+                        obj[key] = values[i]
+                objects.append(obj)
+            yield str(frame), {"tracks": objects}
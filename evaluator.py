@@ -4,9 +4,10 @@ import statistics
 import argparse
 from pathlib import Path
 from tabulate import tabulate
-from typing import Any, Dict, Set
+from typing import Any, Dict, Set, Tuple
 
 import utilities
+from datatypes.sequence import Sequence
 
 
 class Statistics:
@@ -164,34 +165,138 @@ class Statistics:
             )
 
 
-def process_data(annotations: Dict[str, Any], tracks: Dict[str, Any]) -> Statistics:
+def _frame_pairs(
+    annotations: Sequence, tracks: Sequence
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Index of the tracks frame for every annotation frame, -1 if missing.
+    track_frames = {frame: index for index, frame in enumerate(tracks.frames.tolist())}
+    frame_map = np.array(
+        [track_frames.get(frame, -1) for frame in annotations.frames.tolist()],
+        dtype=np.int64,
+    )
+    track_counts = np.diff(tracks.frame_offsets)
+    frame_starts = np.where(frame_map >= 0, tracks.frame_offsets[:-1][frame_map], 0)
+    frame_counts = np.where(frame_map >= 0, track_counts[frame_map], 0)
+
+    # Every annotation row is paired with every track row of the same frame.
+    obj_frames = np.repeat(
+        np.arange(len(annotations)), np.diff(annotations.frame_offsets)
+    )
+    pair_counts = frame_counts[obj_frames]
+    pair_objs = np.repeat(np.arange(len(obj_frames)), pair_counts)
+    pair_offsets = np.arange(len(pair_objs)) - np.repeat(
+        np.cumsum(pair_counts) - pair_counts, pair_counts
+    )
+    pair_tracks = np.repeat(frame_starts[obj_frames], pair_counts) + pair_offsets
+
+    # Tracks only count as seen in frames that hold at least one annotation.
+    annotated = np.diff(annotations.frame_offsets)[frame_map >= 0] > 0
+    seen_frames = frame_map[frame_map >= 0][annotated]
+    seen_tracks = np.concatenate(
+        [np.zeros(0, dtype=np.int64)]
+        + [
+            np.arange(tracks.frame_offsets[index], tracks.frame_offsets[index + 1])
+            for index in seen_frames
+        ]
+    )
+    return pair_objs, pair_tracks, seen_tracks
+
+
+def _first_occurrence_order(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+    return unique[order], counts[order]
+
+
+def process_sequence(annotations: Sequence, tracks: Sequence) -> Statistics:
     stats = Statistics()
-    all_tracks = set()
-    matched_tracks = set()
-
-    for frame, annotation in annotations.items():
-        for obj in annotation["tracks"]:
-            obj_id = obj["id"]
-            obj_position = np.array([obj["x"], obj["y"], obj["z"]])
-            stats.add_annotation(frame, obj_id, obj_position)
-
-            for track in tracks.get(frame, {}).get("tracks", []):
-                track_id = track["id"]
-                all_tracks.add(track_id)
-                track_position = np.array([track["x"], track["y"], track["z"]])
-                if stats.add_track(
-                    frame, obj_id, track_id, track_position, obj_position
-                ):
-                    matched_tracks.add(track_id)
-
-    for track_id in all_tracks:
-        if track_id not in matched_tracks:
-            stats.update_false_positives(track_id)
+
+    obj_ids = (
+        annotations.ids if annotations.ids is not None else np.zeros(0, dtype=np.int64)
+    )
+    track_ids = tracks.ids if tracks.ids is not None else np.zeros(0, dtype=np.int64)
+
+    pair_objs, pair_tracks, seen_tracks = _frame_pairs(annotations, tracks)
+    distances = np.linalg.norm(
+        tracks.positions[pair_tracks] - annotations.positions[pair_objs], axis=1
+    )
+    matched = distances <= 4
+    matched_objs = obj_ids[pair_objs[matched]]
+    matched_tracks = track_ids[pair_tracks[matched]]
+
+    for obj_id, lifespan in zip(
+        *map(np.ndarray.tolist, _first_occurrence_order(obj_ids))
+    ):
+        stats.annotation_stats[obj_id] = {
+            "lifespan": lifespan,
+            "tracked": 0,
+            "id_switches": 0,
+            "last_track_id": None,
+            "associated_track_ids": set(),
+            "track_id_count": {},
+        }
+
+    for track_id, tracked in zip(
+        *map(np.ndarray.tolist, _first_occurrence_order(matched_tracks))
+    ):
+        stats.track_stats[track_id] = {
+            "lifespan": tracked,
+            "tracked": tracked,
+            "id_switches": 0,
+            "last_obj_id": None,
+            "associated_obj_ids": set(),
+        }
+
+    # Matches per (object, track) in the order they were first seen.
+    if len(matched_objs) > 0:
+        pair_keys = np.stack([matched_objs, matched_tracks], axis=1)
+        unique_pairs, first, counts = np.unique(
+            pair_keys, axis=0, return_index=True, return_counts=True
+        )
+        order = np.argsort(first, kind="stable")
+        for (obj_id, track_id), count in zip(
+            unique_pairs[order].tolist(), counts[order].tolist()
+        ):
+            obj_stats = stats.annotation_stats[obj_id]
+            obj_stats["tracked"] += count
+            obj_stats["track_id_count"][track_id] = count
+            obj_stats["associated_track_ids"].add(track_id)
+            stats.track_stats[track_id]["associated_obj_ids"].add(obj_id)
+
+        # An id switch is counted whenever an object is matched to another track
+        # than in its previous match, including the first match.
+        by_obj = np.argsort(matched_objs, kind="stable")
+        sorted_objs = matched_objs[by_obj]
+        sorted_tracks = matched_tracks[by_obj]
+        switches = np.ones(len(sorted_objs), dtype=bool)
+        switches[1:] = (sorted_objs[1:] != sorted_objs[:-1]) | (
+            sorted_tracks[1:] != sorted_tracks[:-1]
+        )
+        switched_objs, id_switches = np.unique(
+            sorted_objs[switches], return_counts=True
+        )
+        last = np.ones(len(sorted_objs), dtype=bool)
+        last[:-1] = sorted_objs[1:] != sorted_objs[:-1]
+
+        for obj_id, count in zip(switched_objs.tolist(), id_switches.tolist()):
+            stats.annotation_stats[obj_id]["id_switches"] = count
+        for obj_id, track_id in zip(
+            sorted_objs[last].tolist(), sorted_tracks[last].tolist()
+        ):
+            stats.annotation_stats[obj_id]["last_track_id"] = track_id
+
+    unmatched = np.setdiff1d(np.unique(track_ids[seen_tracks]), matched_tracks)
+    for track_id in unmatched.tolist():
+        stats.update_false_positives(track_id)
 
     stats.calculate_statistics()
     return stats
 
 
+def process_data(annotations: Dict[str, Any], tracks: Dict[str, Any]) -> Statistics:
+    return process_sequence(Sequence.from_dict(annotations), Sequence.from_dict(tracks))
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Evaluate references with tracked objects."
@@ -214,10 +319,10 @@ def parse_args():
 def main() -> None:
     args = parse_args()
 
-    annotations = utilities.load_json(args.input_references)
-    tracked = utilities.load_json(args.input_tracked)
+    annotations = utilities.load_sequence(args.input_references)
+    tracked = utilities.load_sequence(args.input_tracked)
 
-    stats = process_data(annotations, tracked)
+    stats = process_sequence(annotations, tracked)
     stats.print_statistics()
 
     performance_metric = stats.get_performance_metric()
@@ -1,57 +1,294 @@
+import argparse
+import queue
 import subprocess
-import time
+import sys
+import threading
+import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from flask import Flask, render_template, request, Response
-
-app = Flask(__name__)
+from typing import Dict, Iterator, List, Optional
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    abort,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+)
 
 PORT = 5000
 HOST = "0.0.0.0"
 TEMPLATE = "index.html"
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "main.py"
+MAX_JOBS = 1
+KEEPALIVE_INTERVAL = 15.0
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DONE_STATES = (FINISHED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    id: str
+    arguments: List[str]
+    status: str = QUEUED
+    returncode: Optional[int] = None
+    log: List[str] = field(default_factory=list)
+    process: Optional[subprocess.Popen] = None
+    closed: bool = False
+    changed: threading.Condition = field(default_factory=threading.Condition)
+
+    @property
+    def done(self) -> bool:
+        return self.status in DONE_STATES
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "arguments": self.arguments,
+            "status": self.status,
+            "returncode": self.returncode,
+            "lines": len(self.log),
+        }
+
+
+class JobScheduler:
+    def __init__(self, max_jobs: int = MAX_JOBS, script: Path = MAIN_SCRIPT):
+        if max_jobs < 1:
+            raise ValueError("max_jobs must be at least 1")
+        self.max_jobs = max_jobs
+        self.script = script
+        self.jobs: Dict[str, Job] = {}
+        self.queue: "queue.Queue[Job]" = queue.Queue()
+        self.workers: List[threading.Thread] = []
+        self.lock = threading.Lock()
+
+    def _ensure_workers(self) -> None:
+        with self.lock:
+            while len(self.workers) < self.max_jobs:
+                worker = threading.Thread(target=self._work, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _work(self) -> None:
+        while True:
+            self._run(self.queue.get())
+
+    def _run(self, job: Job) -> None:
+        with job.changed:
+            if job.done:
+                return
+            try:
+                job.process = subprocess.Popen(
+                    [sys.executable, "-u", str(self.script), *job.arguments],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    universal_newlines=True,
+                )
+            except OSError as e:
+                job.log.append(f"{e}\n")
+                job.status = FAILED
+                job.closed = True
+                job.changed.notify_all()
+                return
+            job.status = RUNNING
+            job.changed.notify_all()
+
+        for line in iter(job.process.stdout.readline, ""):
+            with job.changed:
+                job.log.append(line)
+                job.changed.notify_all()
+        job.process.stdout.close()
+        returncode = job.process.wait()
+
+        with job.changed:
+            job.returncode = returncode
+            if job.status == RUNNING:
+                job.status = FINISHED if returncode == 0 else FAILED
+            job.closed = True
+            job.changed.notify_all()
+
+    def submit(self, arguments: List[str]) -> Job:
+        job = Job(id=uuid.uuid4().hex, arguments=arguments)
+        self.jobs[job.id] = job
+        self._ensure_workers()
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with job.changed:
+            if not job.done:
+                job.status = CANCELLED
+                if job.process is None:
+                    job.closed = True
+                elif job.process.poll() is None:
+                    job.process.terminate()
+                job.changed.notify_all()
+        return job
+
+    def follow(
+        self, job: Job, offset: int = 0, timeout: Optional[float] = None
+    ) -> Iterator[Optional[str]]:
+        # Yields log lines from offset on and None whenever nothing arrived
+        # within timeout; returns once the job has closed its log.
+        while True:
+            with job.changed:
+                if offset >= len(job.log) and not job.closed:
+                    job.changed.wait(timeout)
+                lines = job.log[offset:]
+                closed = job.closed
+            if not lines and not closed:
+                yield None
+            yield from lines
+            offset += len(lines)
+            if closed:
+                return
+
+
+def _server_sent_event(
+    data: str, event: Optional[str] = None, event_id: Optional[int] = None
+) -> str:
+    message = ""
+    if event is not None:
+        message += f"event:{event}\n"
+    if event_id is not None:
+        message += f"id:{event_id}\n"
+    return message + "data:" + data.replace("\n", "\ndata:") + "\n\n"
+
 
+def build_arguments(parameters) -> List[str]:
+    root_name = parameters.get("root_name", "")
+    if not root_name:
+        raise ValueError("root_name is required")
+    n_files = int(parameters.get("n_files", 5))
+    trials = int(parameters.get("trials", 10))
+    if n_files < 1 or trials < 1:
+        raise ValueError("n_files and trials must be positive")
+    return [
+        "--root-name",
+        root_name,
+        "--sequences",
+        str(n_files),
+        "--trials",
+        str(trials),
+    ]
 
-@app.route("/")
+
+jobs = Blueprint("jobs", __name__)
+
+
+def _scheduler() -> JobScheduler:
+    return current_app.extensions["scheduler"]
+
+
+def _get_job(job_id: str) -> Job:
+    job = _scheduler().get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+
+@jobs.route("/")
 def index():
     return render_template(TEMPLATE)
 
 
-@app.route("/stream")
-def stream():
-    root_name = request.args.get("root_name", "")
-    n_files = request.args.get("n_files", "5")
-    trials = request.args.get("trials", "10")
+@jobs.route("/jobs", methods=["POST"])
+def submit_job():
+    parameters = request.get_json(silent=True) or request.form
+    try:
+        arguments = build_arguments(parameters)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    job = _scheduler().submit(arguments)
+    return jsonify(job.to_dict()), 202
+
+
+@jobs.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify([job.to_dict() for job in _scheduler().jobs.values()])
+
 
+@jobs.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    return jsonify(_get_job(job_id).to_dict())
+
+
+@jobs.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id: str):
+    _get_job(job_id)
+    return jsonify(_scheduler().cancel(job_id).to_dict())
+
+
+@jobs.route("/jobs/<job_id>/stream")
+def stream_job(job_id: str):
+    job = _get_job(job_id)
+    offset = request.headers.get("Last-Event-ID", request.args.get("offset", "0"))
+    if not offset.isdigit():
+        return jsonify({"error": "offset must be a non-negative integer"}), 400
+    offset = int(offset)
+    follow = _scheduler().follow(job, offset, timeout=KEEPALIVE_INTERVAL)
+
+    # The job runs in the scheduler, so a client disconnecting only closes
+    # this generator; reconnecting resumes from the last event id.
     def generate():
-        script_path = Path(__file__).resolve().parent / "../main.py"
-
-        process = subprocess.Popen(
-            [
-                "python",
-                script_path,
-                "--root-name",
-                root_name,
-                "--sequences",
-                n_files,
-                "--trials",
-                trials,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-        for line in iter(process.stdout.readline, ""):
-            time.sleep(0.1)
-            if line:
-                formatted = "data:" + line.replace("\n", "\ndata:")
-                yield f"{formatted}\n\n"
-        process.stdout.close()
-        process.wait()
-
-        yield "data:--- Job finished successfully ---\n\n"
-        yield "event:close\n\n"
+        line_number = offset
+        for line in follow:
+            if line is None:
+                yield ":keepalive\n\n"
+                continue
+            line_number += 1
+            yield _server_sent_event(line.rstrip("\n"), event_id=line_number)
+        yield _server_sent_event(f"--- Job {job.status} ---")
+        yield _server_sent_event(job.status, event="close")
 
     return Response(generate(), mimetype="text/event-stream")
 
 
+def create_app(scheduler: Optional[JobScheduler] = None) -> Flask:
+    app = Flask(__name__)
+    app.extensions["scheduler"] = scheduler or JobScheduler()
+    app.register_blueprint(jobs)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the tracker optimizer UI.")
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=HOST,
+        help="Host to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=PORT,
+        help="Port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=MAX_JOBS,
+        help="Number of jobs allowed to run at the same time; further jobs are queued (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    app = create_app(JobScheduler(max_jobs=args.max_jobs))
+    app.run(host=args.host, port=args.port, debug=True, threaded=True)
+
+
 if __name__ == "__main__":
-    app.run(host=HOST, port=PORT, debug=True)
+    main()
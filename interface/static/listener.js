@@ -1,32 +1,77 @@
-document.getElementById('runForm').addEventListener('submit', function(e) {
-  e.preventDefault();
+let evtSource = null;
 
+function attach(jobId) {
+  if (evtSource) {
+    evtSource.close();
+  }
   document.getElementById('output').textContent = "";
   document.getElementById('error').textContent = "";
+  document.getElementById('cancel').disabled = false;
+  sessionStorage.setItem('jobId', jobId);
 
-  const rootName = document.getElementById('root_name').value;
-  const nFiles = document.getElementById('n_files').value;
-  const trials = document.getElementById('trials').value;
-
-  const streamUrl = `/stream?root_name=${encodeURIComponent(rootName)}&n_files=${encodeURIComponent(nFiles)}&trials=${encodeURIComponent(trials)}`;
-
-  const evtSource = new EventSource(streamUrl);
+  // The job keeps running on the server; reattaching replays its log.
+  evtSource = new EventSource(`/jobs/${encodeURIComponent(jobId)}/stream`);
 
   evtSource.onmessage = function(event) {
-    document.getElementById('output').textContent += event.data;
+    document.getElementById('output').textContent += event.data + "\n";
   };
 
   evtSource.addEventListener('close', function(event) {
     console.log("Stream has closed successfully.");
+    document.getElementById('cancel').disabled = true;
+    sessionStorage.removeItem('jobId');
     evtSource.close();
   });
 
   evtSource.onerror = function(err) {
-    document.getElementById('error').textContent = "An error occurred while streaming output.";
-    evtSource.close();
+    if (evtSource.readyState === EventSource.CLOSED) {
+      document.getElementById('error').textContent = "An error occurred while streaming output.";
+      document.getElementById('cancel').disabled = true;
+      sessionStorage.removeItem('jobId');
+    } else {
+      document.getElementById('error').textContent = "Connection lost, reconnecting...";
+    }
   };
 
   evtSource.onopen = function() {
+    document.getElementById('error').textContent = "";
     console.log("Connection to stream opened.");
   };
-});
\ No newline at end of file
+}
+
+document.getElementById('runForm').addEventListener('submit', function(e) {
+  e.preventDefault();
+
+  fetch('/jobs', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({
+      root_name: document.getElementById('root_name').value,
+      n_files: document.getElementById('n_files').value,
+      trials: document.getElementById('trials').value,
+    }),
+  })
+    .then(response => response.json().then(job => ({ok: response.ok, job: job})))
+    .then(({ok, job}) => {
+      if (!ok) {
+        document.getElementById('error').textContent = job.error;
+        return;
+      }
+      attach(job.id);
+    })
+    .catch(() => {
+      document.getElementById('error').textContent = "An error occurred while submitting the job.";
+    });
+});
+
+document.getElementById('cancel').addEventListener('click', function() {
+  const jobId = sessionStorage.getItem('jobId');
+  if (jobId) {
+    fetch(`/jobs/${encodeURIComponent(jobId)}`, {method: 'DELETE'});
+  }
+});
+
+const runningJob = sessionStorage.getItem('jobId');
+if (runningJob) {
+  attach(runningJob);
+}
@@ -1,14 +1,85 @@
 import optuna
-import random
+import hashlib
+import json
 import argparse
 from pathlib import Path
-from typing import List, Dict
-
-from optimizer import Optimizer
-from annotator import TrackGenerator
-from tracker import TrackSettings, Tracker, run_tracker_with_parameters
-from visualizer import Visualizer, VisualizerInput
-from utilities import load_json, save_json, get_data_path, get_media_path
+from typing import Callable, List, Dict, Optional
+
+from optimizer import PRUNERS, Optimizer
+from annotator import generate_sequences
+from tracker import (
+    TRACKER_BACKENDS,
+    TrackSettings,
+    Tracker,
+    run_tracker_with_parameters,
+)
+from visualizer import VisualizerInput, visualize_clips
+from utilities import (
+    file_digest,
+    load_data,
+    load_json,
+    save_data,
+    save_json,
+    get_data_path,
+    get_media_path,
+)
+
+STAGES = ("generate", "optimize", "track", "visualize")
+STAGES_FILENAME = "stages.json"
+
+GENERATOR_SETTINGS = {
+    "num_frames": 100,
+    "num_tracks": 3,
+    "position_randomization": 0.05,
+    "delete_probability": 0.14,
+    "add_probability": 4.82,
+}
+
+
+class StageCache:
+    def __init__(self, root_dir: Path, from_stage: Optional[str] = None):
+        self.root_dir = root_dir
+        self.path = root_dir / STAGES_FILENAME
+        self.records = load_json(self.path) if self.path.exists() else {}
+        self.forced = set(STAGES[STAGES.index(from_stage) :]) if from_stage else set()
+
+    def _digests(self, paths: List[Path]) -> Dict[str, str]:
+        return {
+            path.relative_to(self.root_dir).as_posix(): file_digest(path)
+            for path in paths
+        }
+
+    def key(self, parameters: Dict, inputs: List[Path]) -> str:
+        content = {"parameters": parameters, "inputs": self._digests(inputs)}
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def is_up_to_date(self, stage: str, key: str, outputs: List[Path]) -> bool:
+        record = self.records.get(stage)
+        if stage in self.forced or record is None or record["key"] != key:
+            return False
+        if not all(path.exists() for path in outputs):
+            return False
+        return record["outputs"] == self._digests(outputs)
+
+    def run(
+        self,
+        stage: str,
+        parameters: Dict,
+        inputs: List[Path],
+        outputs: List[Path],
+        function: Callable[[str], None],
+    ) -> bool:
+        key = self.key(parameters, inputs)
+        if self.is_up_to_date(stage, key, outputs):
+            print(f"Stage {stage} is up to date, skipping.")
+            return False
+
+        function(key)
+        self.records[stage] = {"key": key, "outputs": self._digests(outputs)}
+        save_json(self.path, self.records, indent=4)
+        return True
 
 
 def _create_filelist(prefix: str, nr_files: int) -> List[str]:
@@ -16,26 +87,27 @@ def _create_filelist(prefix: str, nr_files: int) -> List[str]:
 
 
 def _generate_input_data(
-    references_dir: Path, detections_dir: Path, filelist: List[str], seed: int
+    references_dir: Path,
+    detections_dir: Path,
+    filelist: List[str],
+    seed: int,
+    extension: str = ".json",
+    workers: int = 1,
 ) -> None:
-    random.seed(seed)
-
-    for file in filelist:
-        references_path = references_dir / f"{file}.json"
-        detections_path = detections_dir / f"{file}.json"
-
-        track_generator = TrackGenerator(
-            num_frames=100,
-            num_tracks=3,
-            position_randomization=0.05,
-            delete_probability=0.14,
-            add_probability=4.82,
-        )
-        track_generator.save_data(references_path, detections_path)
+    paths = [
+        (references_dir / f"{file}{extension}", detections_dir / f"{file}{extension}")
+        for file in filelist
+    ]
+    generate_sequences(paths, GENERATOR_SETTINGS, seed=seed, workers=workers)
 
 
 def _run_tracker(
-    detections_dir: Path, tracked_dir: Path, filelist: List[str], parameters: Dict
+    detections_dir: Path,
+    tracked_dir: Path,
+    filelist: List[str],
+    parameters: Dict,
+    backend: str = "python",
+    extension: str = ".json",
 ) -> None:
     tracker_settings = TrackSettings(
         measurement_noise=parameters["measurement_noise"],
@@ -45,16 +117,19 @@ def _run_tracker(
         max_age=parameters["max_age"],
         min_hits=parameters["min_hits"],
         max_consecutive_misses=parameters["max_consecutive_misses"],
+        solver=parameters.get("solver", "hungarian"),
     )
 
     for file in filelist:
-        detections_path = detections_dir / f"{file}.json"
-        tracked_path = tracked_dir / f"{file}.json"
+        detections_path = detections_dir / f"{file}{extension}"
+        tracked_path = tracked_dir / f"{file}{extension}"
 
-        detections = load_json(detections_path)
+        detections = load_data(detections_path)
 
-        tracked_data = run_tracker_with_parameters(tracker_settings, detections)
-        save_json(tracked_path, tracked_data)
+        tracked_data = run_tracker_with_parameters(
+            tracker_settings, detections, backend=backend
+        )
+        save_data(tracked_path, tracked_data)
 
 
 def _visualize(
@@ -63,16 +138,23 @@ def _visualize(
     tracked_dir: Path,
     visualization_path: Path,
     filelist: List[str],
+    extension: str = ".json",
+    workers: int = 1,
 ):
-    for file in filelist:
-        input_files = [
-            VisualizerInput(references_dir / f"{file}.json", title="references"),
-            # VisualizerInput(detections_dir / f"{file}.json", title="detections", ignore_id=True),
-            VisualizerInput(tracked_dir / f"{file}.json", title="tracked"),
-        ]
-
-        visualizer = Visualizer(input_files)
-        visualizer.visualize(visualization_path / f"{file}.png")
+    clips = [
+        (
+            [
+                VisualizerInput(
+                    references_dir / f"{file}{extension}", title="references"
+                ),
+                # VisualizerInput(detections_dir / f"{file}{extension}", title="detections", ignore_id=True),
+                VisualizerInput(tracked_dir / f"{file}{extension}", title="tracked"),
+            ],
+            visualization_path / f"{file}.png",
+        )
+        for file in filelist
+    ]
+    visualize_clips(clips, workers=workers)
 
 
 def parse_args():
@@ -95,6 +177,85 @@ def parse_args():
         type=int,
         help="Number of optuna trials",
     )
+    parser.add_argument(
+        "--data-format",
+        type=str,
+        choices=["json", "ndjson", "npz"],
+        default="json",
+        help="File format of references, detections and tracks. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=TRACKER_BACKENDS,
+        default="python",
+        help="Tracker implementation, python or the C++ library in target/. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes generating, evaluating and rendering the sequences. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="Optimizer processes running trials in parallel. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--study-storage",
+        type=Path,
+        default=None,
+        help="Study storage file, an interrupted study resumes from it. (default: study.log in the study folder)",
+    )
+    parser.add_argument(
+        "--pruner",
+        type=str,
+        choices=list(PRUNERS),
+        default="none",
+        help="Prune trials on the running mean metric after every sequence. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lockstep",
+        action="store_true",
+        help="Track all sequences of an optimizer trial together in one batched pass.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Optimizer trials tracked together in one lockstep pass. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fidelity-levels",
+        type=int,
+        default=1,
+        help="Optimizer rungs of growing clip subsets and frame windows, requires a halving or hyperband pruner. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Optimizer result cache shared between studies, defaults to results_cache.sqlite in the data folder.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Track every optimizer trial without consulting the result cache.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an existing study, skipping stages whose outputs are up to date.",
+    )
+    parser.add_argument(
+        "--from-stage",
+        type=str,
+        choices=STAGES,
+        default=None,
+        help="Rerun this stage and all following ones even when up to date, implies --resume.",
+    )
 
     return parser.parse_args()
 
@@ -103,10 +264,13 @@ def main() -> None:
     args = parse_args()
 
     root_dir = get_data_path() / args.root_name
+    resume = args.resume or args.from_stage is not None
 
-    assert not root_dir.exists(), f"Study with name {args.root_name} already exists..."
+    assert (
+        resume or not root_dir.exists()
+    ), f"Study with name {args.root_name} already exists, use --resume to continue it..."
 
-    root_dir.mkdir()
+    root_dir.mkdir(exist_ok=resume)
 
     filelist = _create_filelist("clip", args.sequences)
 
@@ -116,20 +280,108 @@ def main() -> None:
     parameters_path = root_dir / "parameters.json"
     visualization_path = root_dir / "visualization"
 
+    extension = f".{args.data_format}"
+
+    references = [references_dir / f"{file}{extension}" for file in filelist]
+    detections = [detections_dir / f"{file}{extension}" for file in filelist]
+    tracked = [tracked_dir / f"{file}{extension}" for file in filelist]
+    visualizations = [visualization_path / f"{file}.png" for file in filelist]
+
+    seed = 42
+    stages = StageCache(root_dir, args.from_stage)
+
     # Create input data
-    _generate_input_data(references_dir, detections_dir, filelist, seed=42)
+    stages.run(
+        "generate",
+        {"filelist": filelist, "seed": seed, "settings": GENERATOR_SETTINGS},
+        [],
+        references + detections,
+        lambda key: _generate_input_data(
+            references_dir,
+            detections_dir,
+            filelist,
+            seed=seed,
+            extension=extension,
+            workers=args.workers,
+        ),
+    )
 
     # Optimize tracker parameters
-    optimizer = Optimizer(references_dir, detections_dir, filelist)
-    parameters = optimizer.optimize(n_trials=args.trials)
-    save_json(parameters_path, parameters)
+    study_storage = args.study_storage or root_dir / "study.log"
+    # Results are keyed by content, one cache can serve every study.
+    cache_path = args.cache or get_data_path() / "results_cache.sqlite"
+    if args.no_cache:
+        cache_path = None
+
+    def optimize(key: str) -> None:
+        # Naming the study after the stage key lets an interrupted run pick up
+        # its trials from storage while changed inputs start a fresh study.
+        # A forced rerun drops the stored study, resuming it would track nothing.
+        optimizer = Optimizer(
+            references_dir,
+            detections_dir,
+            filelist,
+            backend=args.backend,
+            workers=args.workers,
+            study_storage=study_storage,
+            study_name=f"tracktuner-{key[:16]}",
+            n_jobs=args.n_jobs,
+            pruner=args.pruner,
+            lockstep=args.lockstep,
+            batch_size=args.batch_size,
+            cache_path=cache_path,
+            fidelity_levels=args.fidelity_levels,
+            restart="optimize" in stages.forced,
+        )
+        parameters = optimizer.optimize(n_trials=args.trials)
+        save_json(parameters_path, parameters, indent=4)
+
+    stages.run(
+        "optimize",
+        {
+            "trials": args.trials,
+            "backend": args.backend,
+            "pruner": args.pruner,
+            "lockstep": args.lockstep,
+            "batch_size": args.batch_size,
+            "fidelity_levels": args.fidelity_levels,
+        },
+        references + detections,
+        [parameters_path],
+        optimize,
+    )
 
     # Run tracker
-    _run_tracker(detections_dir, tracked_dir, filelist, parameters)
+    stages.run(
+        "track",
+        {"backend": args.backend},
+        detections + [parameters_path],
+        tracked,
+        lambda key: _run_tracker(
+            detections_dir,
+            tracked_dir,
+            filelist,
+            load_json(parameters_path),
+            args.backend,
+            extension,
+        ),
+    )
 
     # Visualize
-    _visualize(
-        references_dir, detections_dir, tracked_dir, visualization_path, filelist
+    stages.run(
+        "visualize",
+        {},
+        references + tracked,
+        visualizations,
+        lambda key: _visualize(
+            references_dir,
+            detections_dir,
+            tracked_dir,
+            visualization_path,
+            filelist,
+            extension,
+            workers=args.workers,
+        ),
     )
 
 
@@ -1,15 +1,321 @@
+import hashlib
 import json
+import math
 import numpy as np
 import optuna
+import sqlite3
 import statistics
 import argparse
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
 from optuna.visualization import plot_optimization_history, plot_param_importances
-from typing import Any, Dict, List, Tuple
+from tabulate import tabulate
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from tracker import Tracker, TrackSettings, run_tracker_with_parameters
-from evaluator import process_data, Statistics
-from utilities import load_json, save_json
+from tracker import (
+    ASSIGNMENT_SOLVERS,
+    DISTANCE_METRICS,
+    TRACKER_BACKENDS,
+    TRACKER_ENGINES,
+    Tracker,
+    TrackSettings,
+    run_tracker_on_sequence,
+    run_trackers_on_sequences,
+)
+from evaluator import process_sequence, Statistics
+from profiling import (
+    NULL_PROFILER,
+    PROFILE_COUNTS,
+    PROFILE_STAGES,
+    FrameProfiler,
+    aggregate_profiles,
+)
+from datatypes.sequence import Sequence
+from utilities import find_data_file, load_sequence, save_json
+
+_worker_input_data: List[Tuple[Sequence, Sequence]] = []
+
+# A sequence index and the window of its detection frames that is evaluated.
+Unit = Tuple[int, int, int]
+
+# Solver choice that lets the trials pick the association solver.
+SOLVER_SEARCH = "search"
+# Bump when tracker or evaluator changes invalidate previously cached metrics.
+CACHE_VERSION = 1
+CACHE_SIZE = 100_000
+# SQLite limits the number of variables of a single statement.
+_CACHE_QUERY_CHUNK = 500
+
+
+class ResultCache:
+    # Performance metrics keyed by tracker settings and sequence content, stored
+    # in SQLite and bounded to max_entries by evicting least recently used ones.
+    def __init__(self, path: Path, max_entries: int = CACHE_SIZE):
+        if max_entries < 1:
+            raise ValueError("The result cache needs room for at least one entry.")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=60.0)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, metric REAL NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        found: Dict[str, float] = {}
+        for start in range(0, len(keys), _CACHE_QUERY_CHUNK):
+            chunk = keys[start : start + _CACHE_QUERY_CHUNK]
+            found.update(
+                self.connection.execute(
+                    "SELECT key, metric FROM results WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+
+        if found:
+            now = time.time_ns()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, metrics: Dict[str, float]) -> None:
+        if not metrics:
+            return
+
+        now = time.time_ns()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                [(key, metric, now) for key, metric in metrics.items()],
+            )
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"Result cache {self.path}: {self.hits} hits, {self.misses} misses "
+            f"({rate:.0%} hit rate), {len(self)} entries."
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _load_input_data(
+    references_dir: Path, detections_dir: Path, filelist: List[str]
+) -> List[Tuple[Sequence, Sequence]]:
+    input_data = []
+    for file in filelist:
+        ref_path = find_data_file(references_dir, file)
+        det_path = find_data_file(detections_dir, file)
+
+        if ref_path is not None and det_path is not None:
+            references = load_sequence(ref_path)
+            detections = load_sequence(det_path)
+
+            input_data.append((references, detections))
+    return input_data
+
+
+def _window(
+    references: Sequence, detections: Sequence, start: int, stop: int
+) -> Tuple[Sequence, Sequence]:
+    # Detection frames start to stop and the references of the same frames,
+    # as views of the loaded arrays.
+    if start == 0 and stop >= len(detections):
+        return references, detections
+    first, last = detections.frames[[start, stop - 1]]
+    return (
+        references.window(
+            int(np.searchsorted(references.frames, first)),
+            int(np.searchsorted(references.frames, last, "right")),
+        ),
+        detections.window(start, stop),
+    )
+
+
+def _level_window(
+    references: Sequence, detections: Sequence, fraction: float
+) -> Tuple[int, int]:
+    # Low rungs skip the frames before the first annotation, where there is
+    # nothing to compare against, and track a fraction of the annotated rest.
+    if fraction >= 1.0:
+        return 0, len(detections)
+    annotated = np.flatnonzero(np.diff(references.frame_offsets))
+    start = 0
+    if len(annotated) > 0:
+        start = int(np.searchsorted(detections.frames, references.frames[annotated[0]]))
+    start = max(0, min(start, len(detections) - 1))
+    stop = start + max(1, math.ceil(fraction * (len(detections) - start)))
+    return start, min(stop, len(detections))
+
+
+def _sequence_performance(
+    references: Sequence,
+    detections: Sequence,
+    tracker_settings: TrackSettings,
+    engine: str,
+    backend: str,
+    profile: bool = False,
+) -> Tuple[float, Optional[Dict[str, float]]]:
+    profiler = FrameProfiler() if profile else NULL_PROFILER
+    tracks = run_tracker_on_sequence(
+        tracker_settings, detections, engine=engine, backend=backend, profiler=profiler
+    )
+    metric = process_sequence(references, tracks).get_performance_metric()
+    return metric, profiler.summary() if profile else None
+
+
+def _batch_performance(
+    input_data: List[Tuple[Sequence, Sequence]],
+    settings_batch: List[TrackSettings],
+    profile: bool = False,
+) -> List[List[Tuple[float, Optional[Dict[str, float]]]]]:
+    # All settings and sequences are tracked in one lockstep pass, the profile
+    # of the pass is reported with the first sequence of the first settings.
+    profiler = FrameProfiler() if profile else NULL_PROFILER
+    tracks = run_trackers_on_sequences(
+        settings_batch, [detections for _, detections in input_data], profiler
+    )
+    results = [
+        [
+            (
+                process_sequence(references, sequence_tracks).get_performance_metric(),
+                None,
+            )
+            for (references, _), sequence_tracks in zip(input_data, settings_tracks)
+        ]
+        for settings_tracks in tracks
+    ]
+    if profile and results and results[0]:
+        results[0][0] = (results[0][0][0], profiler.summary())
+    return results
+
+
+def _initialize_worker(
+    references_dir: Path, detections_dir: Path, filelist: List[str]
+) -> None:
+    global _worker_input_data
+    _worker_input_data = _load_input_data(references_dir, detections_dir, filelist)
+
+
+def _worker_performance(
+    unit: Unit,
+    tracker_settings: TrackSettings,
+    engine: str,
+    backend: str,
+    profile: bool = False,
+) -> Tuple[float, Optional[Dict[str, float]]]:
+    index, start, stop = unit
+    references, detections = _window(*_worker_input_data[index], start, stop)
+    return _sequence_performance(
+        references, detections, tracker_settings, engine, backend, profile
+    )
+
+
+def _worker_batch_performance(
+    units: List[Unit],
+    settings_batch: List[TrackSettings],
+    profile: bool = False,
+) -> List[List[Tuple[float, Optional[Dict[str, float]]]]]:
+    return _batch_performance(
+        [
+            _window(*_worker_input_data[index], start, stop)
+            for index, start, stop in units
+        ],
+        settings_batch,
+        profile,
+    )
+
+
+def _create_storage(
+    study_storage: Optional[Path],
+) -> Optional[optuna.storages.BaseStorage]:
+    if study_storage is None:
+        return None
+
+    study_storage.parent.mkdir(parents=True, exist_ok=True)
+    if study_storage.suffix in (".db", ".sqlite", ".sqlite3"):
+        return optuna.storages.RDBStorage(f"sqlite:///{study_storage}")
+    return optuna.storages.JournalStorage(
+        optuna.storages.journal.JournalFileBackend(str(study_storage))
+    )
+
+
+PRUNERS = {
+    "none": optuna.pruners.NopPruner,
+    "median": optuna.pruners.MedianPruner,
+    "halving": optuna.pruners.SuccessiveHalvingPruner,
+    "hyperband": optuna.pruners.HyperbandPruner,
+}
+
+
+def _level_step(level: int, fidelity_eta: int) -> int:
+    # Rungs are reported at their budget in units of the cheapest rung.
+    return fidelity_eta**level
+
+
+def _create_pruner(
+    pruner: str, fidelity_levels: int, fidelity_eta: int
+) -> optuna.pruners.BasePruner:
+    # Halving and hyperband rungs fall on the fidelity rungs.
+    if fidelity_levels == 1 or pruner not in ("halving", "hyperband"):
+        return PRUNERS[pruner]()
+    if pruner == "halving":
+        return optuna.pruners.SuccessiveHalvingPruner(
+            min_resource=1, reduction_factor=fidelity_eta
+        )
+    return optuna.pruners.HyperbandPruner(
+        min_resource=1,
+        max_resource=_level_step(fidelity_levels - 1, fidelity_eta),
+        reduction_factor=fidelity_eta,
+    )
+
+
+def _sequence_cost(detections: Sequence) -> int:
+    return detections.num_objects
+
+
+def _run_study_process(
+    optimizer_kwargs: Dict[str, Any], n_trials: int
+) -> Tuple[int, int, int]:
+    optimizer = Optimizer(**optimizer_kwargs)
+    optimizer._load_data()
+    optimizer._run_trials(n_trials)
+    if optimizer.cache is None:
+        return 0, 0, optimizer.tracked_frames
+    return optimizer.cache.hits, optimizer.cache.misses, optimizer.tracked_frames
 
 
 class Optimizer:
@@ -18,34 +324,164 @@ class Optimizer:
         references_dir: Path,
         detections_dir: Path,
         filelist: List[str],
+        engine: str = "object",
+        backend: str = "python",
+        gating: bool = False,
+        metric: str = "euclidean",
+        solver: str = "hungarian",
+        workers: int = 1,
+        study_storage: Optional[Path] = None,
+        study_name: str = "tracktuner",
+        n_jobs: int = 1,
+        pruner: str = "none",
+        profile: bool = False,
+        lockstep: bool = False,
+        batch_size: int = 1,
+        cache_path: Optional[Path] = None,
+        cache_size: int = CACHE_SIZE,
+        fidelity_levels: int = 1,
+        fidelity_eta: int = 3,
+        restart: bool = False,
     ):
+        if n_jobs > 1 and study_storage is None:
+            raise ValueError("Running more than one job requires a study storage.")
+        if profile and backend == "cpp":
+            raise ValueError("Profiling is only available for the python backend.")
+        if (lockstep or batch_size > 1) and backend == "cpp":
+            raise ValueError(
+                "Lockstep tracking is only available for the python backend."
+            )
+        if fidelity_levels < 1 or fidelity_eta < 2:
+            raise ValueError(
+                "Fidelity needs at least one level and an eta of 2 or more."
+            )
+        if fidelity_levels > 1 and pruner == "none":
+            raise ValueError(
+                "Multi-fidelity optimization needs a pruner to stop trials early."
+            )
+        if solver not in (*ASSIGNMENT_SOLVERS, SOLVER_SEARCH):
+            raise ValueError(f"Unknown assignment solver {solver}.")
+        if solver != "hungarian" and backend == "cpp":
+            raise ValueError("Only the hungarian solver is available for cpp.")
+
         self.references_dir = references_dir
         self.detections_dir = detections_dir
         self.filelist = filelist
-        self.study = optuna.create_study(direction="minimize")
-        self.input_data: List[Tuple] = []
+        self.engine = engine
+        self.backend = backend
+        self.gating = gating
+        self.metric = metric
+        self.solver = solver
+        self.workers = workers
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.study_storage = study_storage
+        self.study_name = study_name
+        self.n_jobs = n_jobs
+        self.pruner = pruner
+        self.profile = profile
+        self.lockstep = lockstep
+        self.batch_size = batch_size
+        self.fidelity_levels = fidelity_levels
+        self.fidelity_eta = fidelity_eta
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.cache = (
+            ResultCache(cache_path, cache_size) if cache_path is not None else None
+        )
+        storage = _create_storage(study_storage)
+        if restart and storage is not None:
+            # Drop the stored study so a forced rerun tracks new trials instead
+            # of resuming a finished one.
+            try:
+                optuna.delete_study(study_name=study_name, storage=storage)
+            except KeyError:
+                pass
+        self.study = optuna.create_study(
+            study_name=study_name,
+            storage=storage,
+            direction="minimize",
+            pruner=_create_pruner(pruner, fidelity_levels, fidelity_eta),
+            load_if_exists=True,
+        )
+        self.input_data: List[Tuple[Sequence, Sequence]] = []
+        self.sequence_order: List[int] = []
+        self.sequence_digests: List[str] = []
+        self.levels: List[List[Unit]] = []
+        self.tracked_frames = 0
 
     def _load_data(self):
-        for file in self.filelist:
-            ref_path = self.references_dir / f"{file}.json"
-            det_path = self.detections_dir / f"{file}.json"
+        self.input_data = _load_input_data(
+            self.references_dir, self.detections_dir, self.filelist
+        )
 
-            if ref_path.exists() and det_path.exists():
-                references = load_json(ref_path)
-                detections = load_json(det_path)
+        # Cheap sequences first so that pruning can stop bad trials early.
+        self.sequence_order = sorted(
+            range(len(self.input_data)),
+            key=lambda index: _sequence_cost(self.input_data[index][1]),
+        )
+        if self.cache is not None:
+            self.sequence_digests = [
+                hashlib.sha256(
+                    (references.digest() + detections.digest()).encode()
+                ).hexdigest()
+                for references, detections in self.input_data
+            ]
 
-                self.input_data.append((references, detections))
+        # Rung i gets about eta^-(levels - 1 - i) of the frames of all clips,
+        # split evenly between the number of clips and the length of their
+        # windows, cheapest windows first. The last rung is the full data.
+        self.levels = []
+        for level in range(self.fidelity_levels):
+            fraction = self.fidelity_eta ** ((level + 1 - self.fidelity_levels) / 2)
+            # Clips without frames have nothing to track before the last rung.
+            candidates = self.sequence_order
+            if fraction < 1.0:
+                candidates = [
+                    index
+                    for index in self.sequence_order
+                    if len(self.input_data[index][1]) > 0
+                ] or candidates
+            windows = {
+                index: _level_window(*self.input_data[index], fraction)
+                for index in candidates
+            }
+            order = sorted(
+                candidates,
+                key=lambda index: _sequence_cost(
+                    self.input_data[index][1].window(*windows[index])
+                ),
+            )
+            num_clips = max(1, math.ceil(fraction * len(order)))
+            self.levels.append(
+                [(index, *windows[index]) for index in order[:num_clips]]
+            )
 
         print(f"Loaded data for {len(self.input_data)} files.")
 
-    def _evaluator_performance(
-        self, annotations: Dict[str, Any], tracks: Dict[str, Any]
-    ) -> float:
-        stats = process_data(annotations, tracks)
-        return stats.get_performance_metric()
+    def _unit_data(self, unit: Unit) -> Tuple[Sequence, Sequence]:
+        index, start, stop = unit
+        return _window(*self.input_data[index], start, stop)
 
-    def objective(self, trial: optuna.trial.Trial) -> float:
-        tracker_settings = TrackSettings(
+    @contextmanager
+    def _worker_pool(self) -> Iterator[None]:
+        if self.workers <= 1:
+            yield
+            return
+
+        # Every worker loads the sequences once, trials only send the settings.
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_initialize_worker,
+            initargs=(self.references_dir, self.detections_dir, self.filelist),
+        ) as pool:
+            self.pool = pool
+            try:
+                yield
+            finally:
+                self.pool = None
+
+    def _suggest_settings(self, trial: optuna.trial.BaseTrial) -> TrackSettings:
+        return TrackSettings(
             measurement_noise=trial.suggest_float("measurement_noise", 0.001, 10.0),
             process_noise=trial.suggest_float("process_noise", 0.0001, 0.1),
             covariance=trial.suggest_float("covariance", 0.001, 20.0),
@@ -53,23 +489,406 @@ class Optimizer:
             max_age=trial.suggest_int("max_age", 1, 10),
             min_hits=trial.suggest_int("min_hits", 1, 10),
             max_consecutive_misses=trial.suggest_int("max_consecutive_misses", 1, 10),
+            gating=self.gating,
+            metric=self.metric,
+            solver=(
+                trial.suggest_categorical("solver", ASSIGNMENT_SOLVERS)
+                if self.solver == SOLVER_SEARCH
+                else self.solver
+            ),
         )
 
-        performance = [
-            self._evaluator_performance(
-                references, run_tracker_with_parameters(tracker_settings, detections)
+    def _settings_key(self, tracker_settings: TrackSettings) -> str:
+        # Lockstep and batch mode produce the same tracks, other engines and
+        # backends differ in floating point details and are cached separately.
+        if self.lockstep or self.batch_size > 1:
+            tracker = "lockstep"
+        else:
+            tracker = f"{self.backend}-{self.engine}"
+        return hashlib.sha256(
+            json.dumps(
+                {
+                    "settings": vars(tracker_settings),
+                    "tracker": tracker,
+                    "version": CACHE_VERSION,
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+    def _result_keys(
+        self, tracker_settings: TrackSettings, units: List[Unit]
+    ) -> List[str]:
+        if self.cache is None:
+            return [f"{index}:{start}:{stop}" for index, start, stop in units]
+
+        settings_key = self._settings_key(tracker_settings)
+        return [
+            (
+                f"{settings_key}:{self.sequence_digests[index]}"
+                if start == 0 and stop >= len(self.input_data[index][1])
+                else f"{settings_key}:{self.sequence_digests[index]}:{start}:{stop}"
             )
-            for references, detections in self.input_data
+            for index, start, stop in units
         ]
 
+    def _cached_results(
+        self,
+        units: List[Unit],
+        keys: List[str],
+        cached: Dict[str, float],
+        compute: Callable[[Unit], Tuple[float, Optional[Dict[str, float]]]],
+    ) -> Iterator[Tuple[float, Optional[Dict[str, float]]]]:
+        computed: Dict[str, float] = {}
+        try:
+            for unit, key in zip(units, keys):
+                if key in cached:
+                    yield cached[key], None
+                    continue
+                result = compute(unit)
+                computed[key] = result[0]
+                self.tracked_frames += unit[2] - unit[1]
+                yield result
+        finally:
+            if self.cache is not None:
+                self.cache.put_many(computed)
+
+    def _unit_results(
+        self, tracker_settings: TrackSettings, units: List[Unit]
+    ) -> Tuple[Iterator[Tuple[float, Optional[Dict[str, float]]]], List[Future]]:
+        keys = self._result_keys(tracker_settings, units)
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = [unit for unit, key in zip(units, keys) if key not in cached]
+
+        futures: Dict[Unit, Future] = {}
+        if self.lockstep:
+            batch = dict(
+                zip(missing, self._batch_results([tracker_settings], missing)[0])
+            )
+            compute = batch.__getitem__
+        elif self.pool is not None:
+            futures = {
+                unit: self.pool.submit(
+                    _worker_performance,
+                    unit,
+                    tracker_settings,
+                    self.engine,
+                    self.backend,
+                    self.profile,
+                )
+                for unit in missing
+            }
+
+            def compute(
+                unit: Unit,
+            ) -> Tuple[float, Optional[Dict[str, float]]]:
+                return futures[unit].result()
+
+        else:
+
+            def compute(
+                unit: Unit,
+            ) -> Tuple[float, Optional[Dict[str, float]]]:
+                return _sequence_performance(
+                    *self._unit_data(unit),
+                    tracker_settings,
+                    self.engine,
+                    self.backend,
+                    self.profile,
+                )
+
+        return self._cached_results(units, keys, cached, compute), list(
+            futures.values()
+        )
+
+    def objective(self, trial: optuna.trial.BaseTrial) -> float:
+        tracker_settings = self._suggest_settings(trial)
+
+        if len(self.levels) == 1:
+            results, futures = self._unit_results(tracker_settings, self.levels[0])
+            try:
+                return self._score(trial, results, futures)
+            finally:
+                results.close()
+
+        # The pruner promotes the trials that do well on the cheap rungs to the
+        # more expensive ones.
+        profiles: List[Dict[str, float]] = []
+        for level, units in enumerate(self.levels):
+            results, _ = self._unit_results(tracker_settings, units)
+            value = self._level_score(trial, list(results), profiles)
+            if self._pruned_on_level(trial, value, level):
+                raise optuna.TrialPruned()
+        return value
+
+    def _pruned_on_level(
+        self, trial: optuna.trial.BaseTrial, value: float, level: int
+    ) -> bool:
+        trial.report(value, _level_step(level, self.fidelity_eta))
+        # The last rung is the full data, its value is final.
+        return level < len(self.levels) - 1 and trial.should_prune()
+
+    def _level_score(
+        self,
+        trial: optuna.trial.BaseTrial,
+        results: List[Tuple[float, Optional[Dict[str, float]]]],
+        profiles: List[Dict[str, float]],
+    ) -> float:
+        profiles.extend(profile for _, profile in results if profile is not None)
+        if profiles:
+            trial.set_user_attr("profile", aggregate_profiles(profiles))
+        return statistics.mean(result for result, _ in results)
+
+    def _score(
+        self,
+        trial: optuna.trial.BaseTrial,
+        results: Iterator[Tuple[float, Optional[Dict[str, float]]]],
+        futures: List[Future],
+    ) -> float:
+        performance = []
+        profiles = []
+        for step, (result, profile) in enumerate(results):
+            performance.append(result)
+            if profile is not None:
+                profiles.append(profile)
+                trial.set_user_attr("profile", aggregate_profiles(profiles))
+
+            trial.report(statistics.mean(performance), step)
+            if trial.should_prune():
+                for future in futures:
+                    future.cancel()
+                raise optuna.TrialPruned()
+
         return statistics.mean(performance)
 
+    def _batch_results(
+        self, settings_batch: List[TrackSettings], units: List[Unit]
+    ) -> List[List[Tuple[float, Optional[Dict[str, float]]]]]:
+        if not settings_batch or not units:
+            return [[] for _ in settings_batch]
+        self.tracked_frames += len(settings_batch) * sum(
+            stop - start for _, start, stop in units
+        )
+        if self.pool is None:
+            input_data = [self._unit_data(unit) for unit in units]
+            return _batch_performance(input_data, settings_batch, self.profile)
+
+        # Every worker advances a contiguous share of the ordered sequences.
+        chunks = [
+            chunk.tolist()
+            for chunk in np.array_split(np.arange(len(units)), self.workers)
+        ]
+        futures = [
+            self.pool.submit(
+                _worker_batch_performance,
+                [units[position] for position in chunk],
+                settings_batch,
+                self.profile,
+            )
+            for chunk in chunks
+            if len(chunk) > 0
+        ]
+        chunk_results = [future.result() for future in futures]
+        return [
+            [result for results in chunk_results for result in results[nr]]
+            for nr in range(len(settings_batch))
+        ]
+
+    def _run_batch(self, batch_size: int) -> None:
+        trials = [self.study.ask() for _ in range(batch_size)]
+        try:
+            settings_batch = [self._suggest_settings(trial) for trial in trials]
+            if len(self.levels) == 1:
+                values = self._batch_values(
+                    trials, self._cached_batch_results(settings_batch, self.levels[0])
+                )
+            else:
+                values = self._batch_level_values(trials, settings_batch)
+        except BaseException:
+            for trial in trials:
+                self.study.tell(trial, state=TrialState.FAIL)
+            raise
+
+        for trial, value in zip(trials, values):
+            if value is None:
+                self.study.tell(trial, state=TrialState.PRUNED)
+            else:
+                self.study.tell(trial, value)
+
+    def _batch_values(
+        self,
+        trials: List[optuna.trial.Trial],
+        results: List[List[Tuple[float, Optional[Dict[str, float]]]]],
+    ) -> List[Optional[float]]:
+        values: List[Optional[float]] = []
+        for trial, trial_results in zip(trials, results):
+            try:
+                values.append(self._score(trial, iter(trial_results), []))
+            except optuna.TrialPruned:
+                values.append(None)
+        return values
+
+    def _batch_level_values(
+        self, trials: List[optuna.trial.Trial], settings_batch: List[TrackSettings]
+    ) -> List[Optional[float]]:
+        # Successive halving within the batch, the trials left on a rung are
+        # tracked together in one lockstep pass.
+        values: List[Optional[float]] = [None] * len(trials)
+        profiles: List[List[Dict[str, float]]] = [[] for _ in trials]
+        alive = list(range(len(trials)))
+        for level, units in enumerate(self.levels):
+            results = self._cached_batch_results(
+                [settings_batch[nr] for nr in alive], units
+            )
+            survivors = []
+            for nr, trial_results in zip(alive, results):
+                values[nr] = self._level_score(trials[nr], trial_results, profiles[nr])
+                if self._pruned_on_level(trials[nr], values[nr], level):
+                    values[nr] = None
+                else:
+                    survivors.append(nr)
+            alive = survivors
+        return values
+
+    def _cached_batch_results(
+        self, settings_batch: List[TrackSettings], units: List[Unit]
+    ) -> List[List[Tuple[float, Optional[Dict[str, float]]]]]:
+        if self.cache is None:
+            return self._batch_results(settings_batch, units)
+
+        keys = [self._result_keys(settings, units) for settings in settings_batch]
+        cached = self.cache.get_many([key for batch in keys for key in batch])
+
+        # Only settings with a miss are tracked, on the union of their missing
+        # sequences so that they still share one lockstep pass.
+        pending = [
+            nr
+            for nr, settings_keys in enumerate(keys)
+            if any(key not in cached for key in settings_keys)
+        ]
+        missing = [
+            unit
+            for position, unit in enumerate(units)
+            if any(keys[nr][position] not in cached for nr in pending)
+        ]
+        computed = dict(
+            zip(
+                pending,
+                self._batch_results([settings_batch[nr] for nr in pending], missing),
+            )
+        )
+
+        results = []
+        new_metrics: Dict[str, float] = {}
+        for nr, settings_keys in enumerate(keys):
+            settings_results = dict(zip(missing, computed.get(nr, [])))
+            trial_results = []
+            for unit, key in zip(units, settings_keys):
+                if key in cached:
+                    trial_results.append((cached[key], None))
+                else:
+                    trial_results.append(settings_results[unit])
+                    new_metrics[key] = settings_results[unit][0]
+            results.append(trial_results)
+        self.cache.put_many(new_metrics)
+        return results
+
+    def _finished_trials(self) -> int:
+        return len(
+            self.study.get_trials(
+                deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)
+            )
+        )
+
+    def _run_trials(self, n_trials: int) -> None:
+        # Trials already finished in the storage count towards n_trials, an
+        # interrupted study therefore resumes instead of starting over.
+        remaining = n_trials - self._finished_trials()
+        if remaining <= 0:
+            return
+
+        with self._worker_pool():
+            if self.batch_size > 1:
+                # Ask a batch of trials, track them together and tell the
+                # results, until the study holds n_trials finished trials.
+                while remaining > 0:
+                    self._run_batch(min(self.batch_size, remaining))
+                    remaining = n_trials - self._finished_trials()
+                return
+
+            self.study.optimize(
+                self.objective,
+                n_trials=remaining,
+                callbacks=[
+                    MaxTrialsCallback(
+                        n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED)
+                    )
+                ],
+            )
+
+    def _process_kwargs(self) -> Dict[str, Any]:
+        return {
+            "references_dir": self.references_dir,
+            "detections_dir": self.detections_dir,
+            "filelist": self.filelist,
+            "engine": self.engine,
+            "backend": self.backend,
+            "gating": self.gating,
+            "metric": self.metric,
+            "solver": self.solver,
+            "workers": self.workers,
+            "study_storage": self.study_storage,
+            "study_name": self.study_name,
+            "pruner": self.pruner,
+            "profile": self.profile,
+            "lockstep": self.lockstep,
+            "batch_size": self.batch_size,
+            "cache_path": self.cache_path,
+            "cache_size": self.cache_size,
+            "fidelity_levels": self.fidelity_levels,
+            "fidelity_eta": self.fidelity_eta,
+        }
+
     def optimize(self, n_trials: int) -> Dict:
-        self._load_data()
-        self.study.optimize(self.objective, n_trials=n_trials)
+        if self.n_jobs <= 1:
+            self._load_data()
+            self._run_trials(n_trials)
+        else:
+            print(f"Running {self.n_jobs} optimizer processes on {self.study_storage}.")
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+                futures = [
+                    pool.submit(_run_study_process, self._process_kwargs(), n_trials)
+                    for _ in range(self.n_jobs)
+                ]
+                for future in futures:
+                    hits, misses, tracked_frames = future.result()
+                    self.tracked_frames += tracked_frames
+                    if self.cache is not None:
+                        self.cache.hits += hits
+                        self.cache.misses += misses
 
+        print(f"Tracked {self.tracked_frames} sequence frames.")
+        if self.cache is not None:
+            print(self.cache.report())
         return self.study.best_params
 
+    def profile_report(self) -> str:
+        headers = ["Trial", "Frames", *PROFILE_STAGES, *PROFILE_COUNTS]
+        table = []
+        for trial in self.study.get_trials(deepcopy=False):
+            profile = trial.user_attrs.get("profile")
+            if profile is None:
+                continue
+            table.append(
+                [
+                    trial.number,
+                    profile["frames"],
+                    *(f"{profile[stage] * 1000:.1f}ms" for stage in PROFILE_STAGES),
+                    *(profile[key] for key in PROFILE_COUNTS),
+                ]
+            )
+        return tabulate(table, headers=headers, tablefmt="grid")
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -107,6 +926,110 @@ def parse_args():
         default=50,
         help="Resolution of the plots. (default: %(default)s)",
     )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=sorted(TRACKER_ENGINES),
+        default="object",
+        help="Tracker engine used for the trials. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=TRACKER_BACKENDS,
+        default="python",
+        help="Tracker implementation used for the trials. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--gating",
+        action="store_true",
+        help="Gate association with a spatial index during the trials.",
+    )
+    parser.add_argument(
+        "--metric",
+        type=str,
+        choices=DISTANCE_METRICS,
+        default="euclidean",
+        help="Association distance used for the trials, distance_threshold is the chi-square gate for mahalanobis. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--solver",
+        type=str,
+        choices=[*ASSIGNMENT_SOLVERS, SOLVER_SEARCH],
+        default="hungarian",
+        help="Association solver used for the trials, search lets every trial pick one. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes evaluating the sequences of a trial. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--study-storage",
+        type=Path,
+        default=None,
+        help="Study storage file, sqlite for .db/.sqlite suffixes and a journal file otherwise. An existing study is resumed.",
+    )
+    parser.add_argument(
+        "--study-name",
+        type=str,
+        default="tracktuner",
+        help="Name of the study in the storage. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="Optimizer processes running trials against the shared study storage. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pruner",
+        type=str,
+        choices=list(PRUNERS),
+        default="none",
+        help="Prune trials on the running mean metric reported after every sequence. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record tracker stage timings per trial and print them after the study.",
+    )
+    parser.add_argument(
+        "--lockstep",
+        action="store_true",
+        help="Track all sequences of a trial together in one batched pass, --engine is ignored.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Ask this many trials at once and track all their settings and sequences in one lockstep pass. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="SQLite file caching the metric of every settings and sequence pair across runs.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_SIZE,
+        help="Maximum number of cached results, least recently used ones are evicted. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fidelity-levels",
+        type=int,
+        default=1,
+        help="Rungs of growing clip subsets and frame windows per trial, the last one is the full data, requires a pruner. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fidelity-eta",
+        type=int,
+        default=3,
+        help="Factor of tracked frames between consecutive rungs. (default: %(default)s)",
+    )
 
     return parser.parse_args()
 
@@ -114,9 +1037,33 @@ def parse_args():
 def main() -> None:
     args = parse_args()
 
-    optimizer = Optimizer(args.references_dir, args.detections_dir, args.filelist)
+    optimizer = Optimizer(
+        args.references_dir,
+        args.detections_dir,
+        args.filelist,
+        engine=args.engine,
+        backend=args.backend,
+        gating=args.gating,
+        metric=args.metric,
+        solver=args.solver,
+        workers=args.workers,
+        study_storage=args.study_storage,
+        study_name=args.study_name,
+        n_jobs=args.n_jobs,
+        pruner=args.pruner,
+        profile=args.profile,
+        lockstep=args.lockstep,
+        batch_size=args.batch_size,
+        cache_path=args.cache,
+        cache_size=args.cache_size,
+        fidelity_levels=args.fidelity_levels,
+        fidelity_eta=args.fidelity_eta,
+    )
     parameters = optimizer.optimize(n_trials=args.trials)
-    save_json(args.output_parameters, parameters)
+    save_json(args.output_parameters, parameters, indent=4)
+
+    if args.profile:
+        print(optimizer.profile_report())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import json
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Tuple
+
+PROFILE_STAGES = (
+    "predict",
+    "cost_matrix",
+    "assignment",
+    "update",
+    "birth_death",
+    "serialization",
+)
+PROFILE_COUNTS = ("detections", "tracks", "confirmed")
+PROFILE_FORMATS = ("json", "chrome")
+
+_NULL_STAGE = nullcontext()
+
+
+class NullProfiler:
+    enabled = False
+
+    def begin_frame(self) -> None:
+        pass
+
+    def stage(self, name: str) -> ContextManager:
+        return _NULL_STAGE
+
+    def count(self, **counts: int) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler(NullProfiler):
+    enabled = True
+
+    def __init__(self) -> None:
+        self.origin = perf_counter_ns()
+        self.frames: List[Dict[str, int]] = []
+        self.events: List[Tuple[str, int, int, int]] = []
+
+    def begin_frame(self) -> None:
+        self.frames.append(
+            {
+                "frame": len(self.frames),
+                **dict.fromkeys(PROFILE_STAGES, 0),
+                **dict.fromkeys(PROFILE_COUNTS, 0),
+            }
+        )
+
+    def _current(self) -> Dict[str, int]:
+        if not self.frames:
+            self.begin_frame()
+        return self.frames[-1]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = perf_counter_ns() - start
+            frame = self._current()
+            frame[name] += duration
+            self.events.append((name, frame["frame"], start - self.origin, duration))
+
+    def count(self, **counts: int) -> None:
+        self._current().update(counts)
+
+    def summary(self) -> Dict[str, float]:
+        summary: Dict[str, float] = {"frames": len(self.frames)}
+        for stage in PROFILE_STAGES:
+            summary[stage] = sum(frame[stage] for frame in self.frames) * 1e-9
+        for key in PROFILE_COUNTS:
+            summary[key] = sum(frame[key] for frame in self.frames)
+        return summary
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "unit": "ns",
+            "summary": self.summary(),
+            "frames": self.frames,
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        # Complete events per stage and counter events per frame, timestamps in
+        # microseconds as expected by chrome://tracing and Perfetto.
+        events = [
+            {
+                "name": name,
+                "cat": "tracker",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": 0,
+                "tid": 0,
+                "args": {"frame": frame},
+            }
+            for name, frame, start, duration in self.events
+        ]
+        frame_starts: Dict[int, float] = {}
+        for _, frame, start, _ in self.events:
+            frame_starts.setdefault(frame, start / 1000)
+        events.extend(
+            {
+                "name": "objects",
+                "ph": "C",
+                "ts": frame_starts.get(frame["frame"], 0.0),
+                "pid": 0,
+                "args": {key: frame[key] for key in PROFILE_COUNTS},
+            }
+            for frame in self.frames
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, filepath: Path, format: str = "json") -> None:
+        if format not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format {format}.")
+        data = self.to_chrome_trace() if format == "chrome" else self.to_json()
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "w") as f:
+            json.dump(data, f)
+
+
+def aggregate_profiles(summaries: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    total: Dict[str, float] = {}
+    for summary in summaries:
+        for key, value in summary.items():
+            total[key] = total.get(key, 0) + value
+    return total
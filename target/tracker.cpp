@@ -1,5 +1,6 @@
 #include <algorithm>
 #include <cmath>
+#include <cstdint>
 #include <fstream>
 #include <iostream>
 #include <limits>
@@ -9,9 +10,14 @@
 #include <vector>
 
 #include <Eigen/Dense>
+
+// Building with TRACKER_LIBRARY defined produces the C ABI used by the python
+// bindings (cpp_tracker.py) and drops the json command line interface.
+#ifndef TRACKER_LIBRARY
 #include <nlohmann/json.hpp>
 
 using json = nlohmann::ordered_json;
+#endif
 
 std::vector<int>
 hungarianAlgorithm(const std::vector<std::vector<double>> &costMatrix) {
@@ -22,7 +28,9 @@ hungarianAlgorithm(const std::vector<std::vector<double>> &costMatrix) {
   int n = std::max(nRows, nCols);
   const double INF = 1e9;
 
-  std::vector<std::vector<double>> a(n, std::vector<double>(n, INF));
+  // Dummy rows and columns of a rectangular problem cost nothing, a large
+  // padding value would cost precision in the potentials u and v.
+  std::vector<std::vector<double>> a(n, std::vector<double>(n, 0.0));
   for (int i = 0; i < nRows; i++) {
     for (int j = 0; j < nCols; j++) {
       a[i][j] = costMatrix[i][j];
@@ -124,7 +132,8 @@ public:
         Eigen::MatrixXd K = P * H.transpose() * S.inverse();
         x = x + K * y;
         Eigen::MatrixXd I = Eigen::MatrixXd::Identity(dimX, dimX);
-        P = (I - K * H) * P;
+        Eigen::MatrixXd I_KH = I - K * H;
+        P = I_KH * P * I_KH.transpose() + K * R * K.transpose();
     }
 };
 
@@ -347,6 +356,7 @@ public:
   std::vector<Track> &getTracks() { return tracks; }
 };
 
+#ifndef TRACKER_LIBRARY
 json runTrackerWithParameters(const TrackSettings &trackerSettings,
                               const json &detectionsJson) {
   Tracker tracker(trackerSettings);
@@ -459,3 +469,81 @@ int main(int argc, char* argv[]) {
 
   return 0;
 }
+#endif
+
+struct TrackerHandle {
+  Tracker tracker;
+  std::vector<int64_t> outputOffsets;
+  std::vector<int64_t> outputIds;
+  std::vector<double> outputStates;
+};
+
+extern "C" {
+
+void *tracker_create(double measurementNoise, double processNoise,
+                     double covariance, double distanceThreshold, int maxAge,
+                     int minHits, int maxConsecutiveMisses) {
+  TrackSettings settings = {measurementNoise,  processNoise, covariance,
+                            distanceThreshold, maxAge,       minHits,
+                            maxConsecutiveMisses};
+  return new TrackerHandle{Tracker(settings)};
+}
+
+void tracker_destroy(void *handle) {
+  delete static_cast<TrackerHandle *>(handle);
+}
+
+// Runs the tracker over numFrames frames. Detections of frame f are the rows
+// frameOffsets[f] to frameOffsets[f + 1] of the row-major (N x 3) detections
+// array. Returns the total number of confirmed track outputs, which are read
+// back with tracker_get_output.
+int64_t tracker_run(void *handle, const double *detections,
+                    const int64_t *frameOffsets, int64_t numFrames) {
+  TrackerHandle *state = static_cast<TrackerHandle *>(handle);
+  state->outputOffsets.assign(1, 0);
+  state->outputIds.clear();
+  state->outputStates.clear();
+
+  for (int64_t frame = 0; frame < numFrames; frame++) {
+    std::vector<Eigen::Vector3d> frameDetections;
+    for (int64_t i = frameOffsets[frame]; i < frameOffsets[frame + 1]; i++) {
+      frameDetections.emplace_back(detections[3 * i], detections[3 * i + 1],
+                                   detections[3 * i + 2]);
+    }
+
+    state->tracker.predictTracks();
+    state->tracker.updateTracks(frameDetections);
+
+    for (const auto &track : state->tracker.getTracks()) {
+      if (track.stage == TrackStage::CONFIRMED) {
+        Eigen::Vector3d smoothed = track.getSmoothedPosition();
+        Eigen::Vector3d velocity = track.getVelocity();
+        Eigen::Vector3d acceleration = track.getAcceleration();
+
+        state->outputIds.push_back(track.id);
+        state->outputStates.insert(state->outputStates.end(),
+                                   smoothed.data(), smoothed.data() + 3);
+        state->outputStates.insert(state->outputStates.end(),
+                                   velocity.data(), velocity.data() + 3);
+        state->outputStates.insert(state->outputStates.end(),
+                                   acceleration.data(),
+                                   acceleration.data() + 3);
+      }
+    }
+    state->outputOffsets.push_back(state->outputIds.size());
+  }
+  return state->outputIds.size();
+}
+
+// Copies the output of the last tracker_run call. frameOffsets holds
+// numFrames + 1 entries, ids one entry and states nine entries (position,
+// velocity, acceleration) per confirmed track output.
+void tracker_get_output(void *handle, int64_t *frameOffsets, int64_t *ids,
+                        double *states) {
+  TrackerHandle *state = static_cast<TrackerHandle *>(handle);
+  std::copy(state->outputOffsets.begin(), state->outputOffsets.end(),
+            frameOffsets);
+  std::copy(state->outputIds.begin(), state->outputIds.end(), ids);
+  std::copy(state->outputStates.begin(), state->outputStates.end(), states);
+}
+}
@@ -0,0 +1,33 @@
+import pytest
+
+from datatypes.sequence import Sequence
+from tracker import TrackSettings
+
+
+@pytest.fixture
+def track_settings():
+    return TrackSettings(
+        measurement_noise=0.1,
+        process_noise=0.1,
+        covariance=1.0,
+        distance_threshold=2.0,
+        max_age=10,
+        min_hits=3,
+        max_consecutive_misses=5,
+    )
+
+
+@pytest.fixture
+def detections():
+    # Two drifting objects, the second one only seen on odd frames.
+    return Sequence.from_dict(
+        {
+            str(frame): {
+                "tracks": [
+                    {"x": 0.1 * frame, "y": 0.0, "z": 0.0},
+                    {"x": 5.0, "y": 0.2 * frame, "z": 0.0},
+                ][: 1 + frame % 2]
+            }
+            for frame in range(1, 21)
+        }
+    )
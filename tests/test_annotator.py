@@ -1,9 +1,9 @@
 import pytest
 import numpy as np
 
-from annotator import TrackGenerator
-from datatypes.reference import Reference, ReferenceTrack
-from datatypes.detection import Detection
+from annotator import TrackGenerator, generate_sequences
+from datatypes.sequence import Sequence
+from utilities import load_data
 
 
 @pytest.fixture
@@ -14,18 +14,23 @@ def track_generator():
         position_randomization=0.1,
         delete_probability=1.0,
         add_probability=0.0,
+        seed=0,
     )
 
 
 def test_generate_annotations(track_generator):
     annotations = track_generator.generate_annotations()
-    assert isinstance(annotations, dict)
+    assert isinstance(annotations, Sequence)
     assert len(annotations) == track_generator.num_frames
-    for frame, tracks in annotations.items():
-        assert isinstance(frame, int)
-        assert isinstance(tracks, list)
-        for track in tracks:
-            assert isinstance(track, Reference)
+    assert annotations.frames.tolist() == list(range(1, 101))
+    assert annotations.positions.shape == (annotations.num_objects, 3)
+    for index in range(len(annotations)):
+        ids = annotations.frame_ids(index)
+        assert np.all(np.diff(ids) > 0)
+        assert np.all((ids >= 0) & (ids < track_generator.num_tracks))
+
+    _, counts = np.unique(annotations.ids, return_counts=True)
+    assert np.all(counts >= track_generator.min_track_length + 1)
 
 
 def test_get_min_max_ranges(track_generator):
@@ -42,22 +47,51 @@ def test_get_min_max_ranges(track_generator):
 
 
 def test_generate_false_positives(track_generator):
-    new_tracks = []
-    false_positives = track_generator.generate_false_positives(new_tracks)
-    assert isinstance(false_positives, list)
-    for track in false_positives:
-        assert isinstance(track, Detection)
+    track_generator.add_probability = 3.0
+    frames, positions = track_generator.generate_false_positives()
+    assert len(frames) == len(positions)
+    assert np.all(np.diff(frames) >= 0)
+    for i, (low, high) in enumerate(track_generator.min_max_ranges.values()):
+        assert np.all((positions[:, i] >= low) & (positions[:, i] <= high))
 
 
 def test_modify_tracks(track_generator):
     modified_tracks = track_generator.modify_tracks()
-    assert isinstance(modified_tracks, dict)
+    assert isinstance(modified_tracks, Sequence)
     assert len(modified_tracks) == track_generator.num_frames
-    for frame, tracks in modified_tracks.items():
-        assert isinstance(frame, int)
-        assert isinstance(tracks, list)
-        for track in tracks:
-            assert isinstance(track, Detection)
+    assert modified_tracks.ids is None
+    assert modified_tracks.num_objects == 0
+
+    track_generator.delete_probability = 0.0
+    modified_tracks = track_generator.modify_tracks()
+    assert np.array_equal(
+        modified_tracks.frame_offsets, track_generator.annotations.frame_offsets
+    )
+    assert np.all(
+        np.abs(modified_tracks.positions - track_generator.annotations.positions)
+        <= track_generator.position_randomization
+    )
+
+
+def test_generate_sequences_is_reproducible_across_workers(tmp_path):
+    settings = {"num_frames": 40, "num_tracks": 3, "add_probability": 1.0}
+    outputs = {}
+    for workers in (1, 2):
+        paths = [
+            (
+                tmp_path / f"{workers}" / f"ref_{nr}.json",
+                tmp_path / f"{workers}" / f"det_{nr}.json",
+            )
+            for nr in range(3)
+        ]
+        generate_sequences(paths, settings, seed=7, workers=workers)
+        outputs[workers] = [
+            (load_data(references), load_data(detections))
+            for references, detections in paths
+        ]
+
+    assert outputs[1] == outputs[2]
+    assert outputs[1][0] != outputs[1][1]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import pytest
+import numpy as np
+
+import cpp_tracker
+from tracker import TrackSettings, run_tracker_with_parameters
+
+pytestmark = pytest.mark.skipif(
+    not cpp_tracker.is_available(), reason="C++ tracker library is not built"
+)
+
+
+def _detections(seed: int, num_frames: int = 60):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(-10, 10, size=(4, 3))
+    velocities = rng.uniform(-0.3, 0.3, size=(4, 3))
+    detections = {}
+    for frame in range(1, num_frames + 1):
+        objects = starts + frame * velocities
+        objects = objects[rng.random(len(objects)) > 0.15]
+        objects = objects + rng.uniform(-0.05, 0.05, size=objects.shape)
+        false_positives = rng.uniform(-10, 10, size=(rng.poisson(2.0), 3))
+        detections[str(frame)] = {
+            "tracks": [
+                {"x": x, "y": y, "z": z}
+                for x, y, z in np.concatenate([objects, false_positives])
+            ]
+        }
+    return detections
+
+
+@pytest.mark.parametrize(
+    "track_settings",
+    [
+        TrackSettings(0.5, 0.01, 5.0, 2.0, 3, 2, 3),
+        TrackSettings(3.0, 0.1, 10.0, 15.0, 10, 1, 10),
+        TrackSettings(0.01, 0.0001, 0.01, 0.5, 1, 5, 1),
+    ],
+)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_cpp_backend_matches_python_backend(track_settings, seed):
+    detections = _detections(seed)
+
+    expected = run_tracker_with_parameters(track_settings, detections)
+    actual = run_tracker_with_parameters(track_settings, detections, backend="cpp")
+
+    assert list(expected.keys()) == list(actual.keys())
+    for frame in expected:
+        expected_tracks = expected[frame]["tracks"]
+        actual_tracks = actual[frame]["tracks"]
+        assert [t["id"] for t in expected_tracks] == [t["id"] for t in actual_tracks]
+        for expected_track, actual_track in zip(expected_tracks, actual_tracks):
+            assert expected_track.keys() == actual_track.keys()
+            for key, value in expected_track.items():
+                assert actual_track[key] == pytest.approx(value, abs=1e-9)
+
+
+def test_run_tracker_arrays_empty_frames():
+    track_settings = TrackSettings(0.5, 0.01, 5.0, 2.0, 3, 1, 3)
+    detections = np.array([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0]])
+    frame_offsets = np.array([0, 0, 1, 1, 2])
+
+    output_offsets, ids, states = cpp_tracker.run_tracker_arrays(
+        track_settings, detections, frame_offsets
+    )
+
+    assert output_offsets.tolist() == [0, 0, 1, 2, 3]
+    assert ids.tolist() == [0, 0, 0]
+    assert states.shape == (3, 9)
+
+
+def test_cpp_backend_rejects_gating():
+    track_settings = TrackSettings(0.5, 0.01, 5.0, 2.0, 3, 1, 3, gating=True)
+    with pytest.raises(ValueError):
+        cpp_tracker.run_tracker_arrays(
+            track_settings, np.zeros((0, 3)), np.array([0, 0])
+        )
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -76,5 +76,62 @@ def test_process_data():
     assert stats.annotation_stats[42]["tracked_percentage"] == 100.0
 
 
+def _process_data_loop(annotations, tracks):
+    stats = Statistics()
+    all_tracks = set()
+    matched_tracks = set()
+    for frame, annotation in annotations.items():
+        for obj in annotation["tracks"]:
+            obj_position = np.array([obj["x"], obj["y"], obj["z"]])
+            stats.add_annotation(frame, obj["id"], obj_position)
+            for track in tracks.get(frame, {}).get("tracks", []):
+                all_tracks.add(track["id"])
+                track_position = np.array([track["x"], track["y"], track["z"]])
+                if stats.add_track(
+                    frame, obj["id"], track["id"], track_position, obj_position
+                ):
+                    matched_tracks.add(track["id"])
+    for track_id in all_tracks - matched_tracks:
+        stats.update_false_positives(track_id)
+    stats.calculate_statistics()
+    return stats
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_process_data_matches_nested_loop(seed):
+    rng = np.random.default_rng(seed)
+    annotations = {}
+    tracks = {}
+    for frame in range(1, 31):
+        obj_ids = np.flatnonzero(rng.random(6) < 0.7)
+        positions = rng.uniform(-10, 10, size=(len(obj_ids), 3))
+        annotations[str(frame)] = {
+            "tracks": [
+                {"id": int(obj_id), "x": x, "y": y, "z": z}
+                for obj_id, (x, y, z) in zip(obj_ids, positions)
+            ]
+        }
+        track_ids = rng.integers(0, 10, size=rng.integers(0, 8))
+        track_positions = rng.uniform(-10, 10, size=(len(track_ids), 3))
+        tracks[str(frame)] = {
+            "tracks": [
+                {"id": int(track_id), "x": x, "y": y, "z": z}
+                for track_id, (x, y, z) in zip(track_ids, track_positions)
+            ]
+        }
+
+    expected = _process_data_loop(annotations, tracks)
+    actual = process_data(annotations, tracks)
+
+    assert actual.annotation_stats == expected.annotation_stats
+    assert list(actual.annotation_stats) == list(expected.annotation_stats)
+    assert actual.track_stats == expected.track_stats
+    assert actual.false_positives == expected.false_positives
+    assert actual.get_performance_metric() == expected.get_performance_metric()
+    assert (
+        actual.get_performance_multi_metric() == expected.get_performance_multi_metric()
+    )
+
+
 if __name__ == "__main__":
     pytest.main()
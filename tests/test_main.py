@@ -0,0 +1,52 @@
+import pytest
+
+from main import StageCache
+
+
+def _touch(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def test_stage_cache_skips_up_to_date_stages(tmp_path):
+    source = tmp_path / "inputs" / "clip_0.json"
+    output = tmp_path / "outputs" / "clip_0.json"
+    _touch(source, "a")
+    runs = []
+
+    def write_output(key):
+        runs.append(key)
+        _touch(output, source.read_text())
+
+    def run(stages, parameters):
+        return stages.run("track", parameters, [source], [output], write_output)
+
+    assert run(StageCache(tmp_path), {"backend": "python"})
+    assert not run(StageCache(tmp_path), {"backend": "python"})
+    assert run(StageCache(tmp_path), {"backend": "cpp"})
+
+    _touch(source, "b")
+    assert run(StageCache(tmp_path), {"backend": "cpp"})
+    assert len(set(runs)) == 3
+
+    output.unlink()
+    assert run(StageCache(tmp_path), {"backend": "cpp"})
+    assert runs[-1] == runs[-2]
+
+
+def test_stage_cache_forces_stages_from_override(tmp_path):
+    output = tmp_path / "parameters.json"
+    stages = StageCache(tmp_path)
+    for stage in ("generate", "optimize", "track"):
+        stages.run(stage, {}, [], [output], lambda key: _touch(output, "{}"))
+
+    stages = StageCache(tmp_path, from_stage="optimize")
+    reran = [
+        stages.run(stage, {}, [], [output], lambda key: None)
+        for stage in ("generate", "optimize", "track")
+    ]
+    assert reran == [False, True, True]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,240 @@
+import pytest
+import optuna
+from optuna.trial import FixedTrial, TrialState
+
+from annotator import TrackGenerator
+from optimizer import Optimizer, ResultCache, _level_window
+
+
+@pytest.fixture
+def parameters():
+    return {
+        "measurement_noise": 0.5,
+        "process_noise": 0.01,
+        "covariance": 5.0,
+        "distance_threshold": 2.0,
+        "max_age": 3,
+        "min_hits": 2,
+        "max_consecutive_misses": 3,
+    }
+
+
+@pytest.fixture
+def data_dirs(tmp_path):
+    references_dir = tmp_path / "references"
+    detections_dir = tmp_path / "detections"
+    filelist = [f"clip_{nr}" for nr in range(3)]
+    for nr, file in enumerate(filelist):
+        TrackGenerator(
+            num_frames=30, num_tracks=2, add_probability=1.0, seed=nr
+        ).save_data(references_dir / f"{file}.json", detections_dir / f"{file}.json")
+    return references_dir, detections_dir, filelist
+
+
+def test_load_data(data_dirs):
+    optimizer = Optimizer(*data_dirs)
+    optimizer._load_data()
+    assert len(optimizer.input_data) == 3
+
+
+def test_objective_workers_match_serial(data_dirs, parameters):
+    serial = Optimizer(*data_dirs)
+    serial._load_data()
+    expected = serial.objective(FixedTrial(parameters))
+
+    parallel = Optimizer(*data_dirs, workers=2)
+    parallel._load_data()
+    with parallel._worker_pool():
+        assert parallel.pool is not None
+        actual = parallel.objective(FixedTrial(parameters))
+    assert parallel.pool is None
+
+    assert actual == expected
+
+
+def test_objective_lockstep_matches_serial(data_dirs, parameters):
+    serial = Optimizer(*data_dirs, engine="batch")
+    serial._load_data()
+    expected = serial.objective(FixedTrial(parameters))
+
+    lockstep = Optimizer(*data_dirs, lockstep=True)
+    lockstep._load_data()
+    assert lockstep.objective(FixedTrial(parameters)) == expected
+
+    parallel = Optimizer(*data_dirs, lockstep=True, workers=2)
+    parallel._load_data()
+    with parallel._worker_pool():
+        assert parallel.objective(FixedTrial(parameters)) == expected
+
+
+def test_batch_mode_tells_lockstep_objective_values(data_dirs):
+    optimizer = Optimizer(*data_dirs, batch_size=3)
+    optimizer.optimize(n_trials=5)
+    trials = optimizer.study.trials
+    assert len(trials) == 5
+    assert all(trial.state == TrialState.COMPLETE for trial in trials)
+
+    serial = Optimizer(*data_dirs, lockstep=True)
+    serial._load_data()
+    for trial in trials:
+        assert serial.objective(FixedTrial(trial.params)) == trial.value
+
+
+def test_optimize_resumes_study_from_storage(data_dirs, tmp_path):
+    study_storage = tmp_path / "study.log"
+
+    Optimizer(*data_dirs, study_storage=study_storage).optimize(n_trials=2)
+    resumed = Optimizer(*data_dirs, study_storage=study_storage)
+    assert len(resumed.study.trials) == 2
+
+    resumed.optimize(n_trials=3)
+    assert len(resumed.study.trials) == 3
+
+
+def test_restart_runs_new_trials_on_finished_study(data_dirs, tmp_path):
+    study_storage = tmp_path / "study.log"
+
+    finished = Optimizer(*data_dirs, study_storage=study_storage)
+    finished.optimize(n_trials=2)
+    finished_numbers = {trial._trial_id for trial in finished.study.trials}
+
+    restarted = Optimizer(*data_dirs, study_storage=study_storage, restart=True)
+    assert len(restarted.study.trials) == 0
+    restarted.optimize(n_trials=2)
+    assert restarted.tracked_frames > 0
+    assert len(restarted.study.trials) == 2
+    assert not finished_numbers & {trial._trial_id for trial in restarted.study.trials}
+
+
+def test_objective_reports_running_mean_in_cost_order(data_dirs):
+    optimizer = Optimizer(*data_dirs, pruner="median")
+    optimizer._load_data()
+    costs = [
+        optimizer.input_data[index][1].num_objects for index in optimizer.sequence_order
+    ]
+    assert costs == sorted(costs)
+
+    optimizer.study.optimize(optimizer.objective, n_trials=1)
+    trial = optimizer.study.trials[0]
+    assert sorted(trial.intermediate_values) == [0, 1, 2]
+    assert trial.intermediate_values[2] == pytest.approx(trial.value)
+
+
+def test_objective_aggregates_profile_per_trial(data_dirs):
+    optimizer = Optimizer(*data_dirs, profile=True)
+    optimizer._load_data()
+    optimizer.study.optimize(optimizer.objective, n_trials=1)
+
+    profile = optimizer.study.trials[0].user_attrs["profile"]
+    assert profile["frames"] == sum(len(dets) for _, dets in optimizer.input_data)
+    assert profile["detections"] == sum(
+        dets.num_objects for _, dets in optimizer.input_data
+    )
+    assert "Trial" in optimizer.profile_report()
+
+
+@pytest.mark.parametrize("options", [{}, {"lockstep": True}])
+def test_objective_reads_results_from_cache(data_dirs, parameters, tmp_path, options):
+    cache_path = tmp_path / "cache.sqlite"
+    first = Optimizer(*data_dirs, cache_path=cache_path, **options)
+    first._load_data()
+    expected = first.objective(FixedTrial(parameters))
+    assert (first.cache.hits, first.cache.misses) == (0, 3)
+
+    second = Optimizer(*data_dirs, cache_path=cache_path, **options)
+    second._load_data()
+    assert second.objective(FixedTrial(parameters)) == expected
+    assert (second.cache.hits, second.cache.misses) == (3, 0)
+
+
+def test_batch_mode_reads_results_from_cache(data_dirs, tmp_path):
+    values = []
+    for _ in range(2):
+        optimizer = Optimizer(
+            *data_dirs, batch_size=2, cache_path=tmp_path / "cache.sqlite"
+        )
+        optimizer.study.sampler = optuna.samplers.RandomSampler(seed=0)
+        optimizer.optimize(n_trials=4)
+        values.append([trial.value for trial in optimizer.study.trials])
+    assert values[0] == values[1]
+    assert (optimizer.cache.hits, optimizer.cache.misses) == (12, 0)
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", max_entries=2)
+    cache.put_many({"a": 1.0, "b": 2.0})
+    assert cache.get_many(["a", "c"]) == {"a": 1.0}
+    cache.put_many({"c": 3.0})
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1.0, "c": 3.0}
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_solver_search_suggests_solver(data_dirs):
+    optimizer = Optimizer(*data_dirs, solver="search", batch_size=3)
+    optimizer.optimize(n_trials=6)
+    assert all("solver" in trial.params for trial in optimizer.study.trials)
+
+
+def test_fidelity_levels_grow_to_full_data(data_dirs, parameters):
+    optimizer = Optimizer(*data_dirs, pruner="halving", fidelity_levels=3)
+    optimizer._load_data()
+    budgets = [
+        sum(stop - start for _, start, stop in units) for units in optimizer.levels
+    ]
+    assert budgets == sorted(budgets) and budgets[0] < budgets[-1]
+    assert optimizer.levels[-1] == [
+        (index, 0, len(optimizer.input_data[index][1]))
+        for index in optimizer.sequence_order
+    ]
+
+    # The last rung reports the plain objective of the full data.
+    serial = Optimizer(*data_dirs)
+    serial._load_data()
+    assert optimizer.objective(FixedTrial(parameters)) == serial.objective(
+        FixedTrial(parameters)
+    )
+
+
+def test_fidelity_levels_skip_empty_clips(data_dirs):
+    references_dir, detections_dir, filelist = data_dirs
+    (references_dir / "clip_empty.json").write_text("{}")
+    (detections_dir / "clip_empty.json").write_text("{}")
+    filelist = filelist + ["clip_empty"]
+
+    optimizer = Optimizer(
+        references_dir, detections_dir, filelist, pruner="halving", fidelity_levels=3
+    )
+    optimizer._load_data()
+    empty = filelist.index("clip_empty")
+    for units in optimizer.levels[:-1]:
+        for unit in units:
+            index, start, stop = unit
+            assert index != empty and 0 <= start < stop
+            assert len(optimizer._unit_data(unit)[1]) == stop - start
+    assert (empty, 0, 0) in optimizer.levels[-1]
+    assert _level_window(*optimizer.input_data[empty], 0.5) == (0, 0)
+
+
+@pytest.mark.parametrize("options", [{}, {"lockstep": True}, {"batch_size": 4}])
+def test_fidelity_reports_level_budgets_as_steps(data_dirs, options):
+    optimizer = Optimizer(*data_dirs, pruner="halving", fidelity_levels=3, **options)
+    optimizer.optimize(n_trials=8)
+    for trial in optimizer.study.trials:
+        assert set(trial.intermediate_values) <= {1, 3, 9}
+        if trial.state == TrialState.COMPLETE:
+            assert trial.intermediate_values[9] == trial.value
+
+
+def test_fidelity_requires_pruner(data_dirs):
+    with pytest.raises(ValueError):
+        Optimizer(*data_dirs, fidelity_levels=3)
+
+
+def test_multiple_jobs_require_storage(data_dirs):
+    with pytest.raises(ValueError):
+        Optimizer(*data_dirs, n_jobs=2)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,66 @@
+import pytest
+
+from profiling import (
+    NULL_PROFILER,
+    PROFILE_COUNTS,
+    PROFILE_STAGES,
+    FrameProfiler,
+    aggregate_profiles,
+)
+from tracker import run_tracker_on_sequence
+
+
+@pytest.mark.parametrize("engine", ["object", "batch"])
+def test_profiler_records_every_frame(track_settings, detections, engine):
+    profiler = FrameProfiler()
+    tracks = run_tracker_on_sequence(
+        track_settings, detections, engine=engine, profiler=profiler
+    )
+    expected = run_tracker_on_sequence(track_settings, detections, engine=engine)
+    assert tracks.to_dict() == expected.to_dict()
+
+    assert len(profiler.frames) == len(detections)
+    for index, frame in enumerate(profiler.frames):
+        assert frame["detections"] == len(detections.frame_positions(index))
+        assert (
+            frame["confirmed"]
+            == tracks.frame_offsets[index + 1] - tracks.frame_offsets[index]
+        )
+        assert frame["predict"] > 0 and frame["serialization"] > 0
+
+    summary = profiler.summary()
+    assert summary["frames"] == len(detections)
+    assert summary["detections"] == detections.num_objects
+    assert set(PROFILE_STAGES + PROFILE_COUNTS) < set(summary)
+
+
+def test_profiler_exports(track_settings, detections, tmp_path):
+    profiler = FrameProfiler()
+    run_tracker_on_sequence(track_settings, detections, profiler=profiler)
+
+    trace = profiler.to_chrome_trace()["traceEvents"]
+    stages = [event for event in trace if event["ph"] == "X"]
+    counters = [event for event in trace if event["ph"] == "C"]
+    assert {event["name"] for event in stages} <= set(PROFILE_STAGES)
+    assert len(counters) == len(detections)
+    assert all(event["dur"] >= 0 for event in stages)
+
+    profiler.save(tmp_path / "profile.json")
+    profiler.save(tmp_path / "trace.json", format="chrome")
+    with pytest.raises(ValueError):
+        profiler.save(tmp_path / "profile.txt", format="txt")
+
+
+def test_null_profiler_and_aggregation():
+    assert not NULL_PROFILER.enabled
+    with NULL_PROFILER.stage("predict"):
+        NULL_PROFILER.count(tracks=1)
+
+    total = aggregate_profiles(
+        [{"frames": 2, "predict": 0.5}, {"frames": 3, "predict": 0.25}]
+    )
+    assert total == {"frames": 5, "predict": 0.75}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,106 @@
+import time
+import pytest
+
+pytest.importorskip("flask")
+
+from interface.scheduler import (
+    CANCELLED,
+    FINISHED,
+    QUEUED,
+    RUNNING,
+    JobScheduler,
+    create_app,
+)
+
+JOB_SCRIPT = """
+import sys
+import time
+from pathlib import Path
+
+print(" ".join(sys.argv[1:]))
+release = Path(__file__).with_name("release")
+while not release.exists():
+    time.sleep(0.01)
+print("done")
+"""
+
+ARGUMENTS = {"root_name": "study", "n_files": 2, "trials": 3}
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    (tmp_path / "job.py").write_text(JOB_SCRIPT)
+    return tmp_path
+
+
+@pytest.fixture
+def client(job_dir):
+    scheduler = JobScheduler(max_jobs=1, script=job_dir / "job.py")
+    return create_app(scheduler).test_client()
+
+
+def _wait_for_status(client, job_id, status, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+
+def _events(response):
+    return [event for event in response.get_data(as_text=True).split("\n\n") if event]
+
+
+def test_submit_runs_job_and_streams_log(client, job_dir):
+    response = client.post("/jobs", json=ARGUMENTS)
+    assert response.status_code == 202
+    job_id = response.get_json()["id"]
+
+    _wait_for_status(client, job_id, RUNNING)
+    (job_dir / "release").touch()
+    events = _events(client.get(f"/jobs/{job_id}/stream"))
+
+    assert events[0] == "id:1\ndata:--root-name study --sequences 2 --trials 3"
+    assert events[1] == "id:2\ndata:done"
+    assert events[-1] == f"event:close\ndata:{FINISHED}"
+    assert client.get(f"/jobs/{job_id}").get_json()["returncode"] == 0
+
+
+def test_stream_resumes_from_last_event_id(client, job_dir):
+    (job_dir / "release").touch()
+    job_id = client.post("/jobs", json=ARGUMENTS).get_json()["id"]
+    _wait_for_status(client, job_id, FINISHED)
+
+    events = _events(
+        client.get(f"/jobs/{job_id}/stream", headers={"Last-Event-ID": "1"})
+    )
+    assert events[0] == "id:2\ndata:done"
+    assert client.get(f"/jobs/{job_id}/stream?offset=x").status_code == 400
+
+
+def test_jobs_beyond_pool_size_are_queued_and_cancellable(client, job_dir):
+    first = client.post("/jobs", json=ARGUMENTS).get_json()["id"]
+    second = client.post("/jobs", json=ARGUMENTS).get_json()["id"]
+    _wait_for_status(client, first, RUNNING)
+    assert client.get(f"/jobs/{second}").get_json()["status"] == QUEUED
+
+    assert client.delete(f"/jobs/{second}").get_json()["status"] == CANCELLED
+    assert client.delete(f"/jobs/{first}").get_json()["status"] == CANCELLED
+
+    events = _events(client.get(f"/jobs/{first}/stream"))
+    assert events[-1] == f"event:close\ndata:{CANCELLED}"
+    assert client.get(f"/jobs/{first}").get_json()["returncode"] != 0
+    assert client.get(f"/jobs/{second}").get_json()["lines"] == 0
+
+
+def test_invalid_requests(client):
+    assert client.post("/jobs", json={"n_files": 2}).status_code == 400
+    assert client.post("/jobs", json={**ARGUMENTS, "trials": 0}).status_code == 400
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.delete("/jobs/unknown").status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,19 +1,45 @@
+import io
+import argparse
+import json
 import pytest
 import numpy as np
-from tracker import TrackSettings, Track, Tracker, TrackStage
+from tracker import (
+    AUCTION_EPSILON,
+    HISTORY_LENGTH,
+    NULL_PROFILER,
+    BatchTracker,
+    TrackSettings,
+    Track,
+    Tracker,
+    TrackStage,
+    _run,
+    compute_cost_matrix,
+    compute_mahalanobis_cost_matrix,
+    innovation_covariance_inverses,
+    match_detections,
+    run_tracker_on_sequence,
+    run_tracker_on_sequences,
+    run_trackers_on_sequences,
+    run_tracker_stream,
+    run_tracker_with_parameters,
+)
+from datatypes.sequence import Sequence
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import mahalanobis
 
 
-@pytest.fixture
-def track_settings():
-    return TrackSettings(
-        measurement_noise=0.1,
-        process_noise=0.1,
-        covariance=1.0,
-        distance_threshold=2.0,
-        max_age=10,
-        min_hits=3,
-        max_consecutive_misses=5,
-    )
+def _drifting_detections(rng: np.random.Generator, num_frames: int):
+    # Two objects drifting along x and y, plus Poisson clutter.
+    detections = {}
+    for frame in range(1, num_frames + 1):
+        objects = [
+            np.array([0.1 * frame, 0.0, 0.0]),
+            np.array([5.0, 0.2 * frame, 0.0]),
+        ] + list(rng.uniform(-10, 10, size=(rng.poisson(2), 3)))
+        detections[str(frame)] = {
+            "tracks": [{"x": x, "y": y, "z": z} for x, y, z in objects]
+        }
+    return detections
 
 
 @pytest.fixture
@@ -71,6 +97,34 @@ def test_track_update(track):
     assert np.allclose(track.position_history[-1], new_measurement)
 
 
+def test_track_history_keeps_last_measurements(track):
+    for step in range(1, 10):
+        track.update(np.full(3, float(step)))
+    assert len(track.position_history) == HISTORY_LENGTH
+    assert np.allclose(track.get_smoothed_position(), np.full(3, 7.0))
+
+
+def test_track_filter_matches_filterpy(track_settings, track):
+    kalman = pytest.importorskip("filterpy.kalman")
+    kf = kalman.KalmanFilter(dim_x=9, dim_z=3)
+    kf.F = track.kf.model.F.copy()
+    kf.H = track.kf.model.H.copy()
+    kf.R *= track_settings.measurement_noise
+    kf.P *= track_settings.covariance
+    kf.Q *= track_settings.process_noise
+    kf.x = track.kf.x.copy()
+
+    rng = np.random.default_rng(4)
+    for _ in range(5):
+        measurement = rng.normal(size=3)
+        kf.predict()
+        kf.update(measurement)
+        track.predict()
+        track.update(measurement)
+        assert np.array_equal(track.kf.x, kf.x)
+        assert np.array_equal(track.kf.P, kf.P)
+
+
 def test_tracker_initialization(track_settings):
     tracker = Tracker(track_settings)
     assert tracker.tracks == []
@@ -118,3 +172,304 @@ def test_tracker_update_tracks(
     assert np.linalg.norm(state_after_second_update - new_detection) < np.linalg.norm(
         state_after_first_update - new_detection
     )
+
+
+def test_batch_tracker_update_tracks(track_settings, initial_position):
+    tracker = BatchTracker(track_settings)
+    tracker.predict_tracks()
+    tracker.update_tracks([initial_position])
+    assert tracker.size == 1
+    assert np.allclose(tracker.x[0, :3], initial_position)
+
+    new_detection = np.array([1.0, 1.0, 1.0])
+    tracker.predict_tracks()
+    tracker.update_tracks([new_detection])
+    assert tracker.size == 1
+    assert tracker.hits[0] == 2
+    assert np.linalg.norm(tracker.x[0, :3] - new_detection) < np.linalg.norm(
+        initial_position - new_detection
+    )
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "mahalanobis"])
+def test_batch_engine_matches_object_engine(track_settings, metric):
+    track_settings.metric = metric
+    detections = _drifting_detections(np.random.default_rng(0), num_frames=40)
+
+    expected = run_tracker_with_parameters(track_settings, detections)
+    actual = run_tracker_with_parameters(track_settings, detections, engine="batch")
+
+    assert expected.keys() == actual.keys()
+    for frame in expected:
+        expected_tracks = expected[frame]["tracks"]
+        actual_tracks = actual[frame]["tracks"]
+        assert [t["id"] for t in expected_tracks] == [t["id"] for t in actual_tracks]
+        for expected_track, actual_track in zip(expected_tracks, actual_tracks):
+            for key, value in expected_track.items():
+                assert actual_track[key] == pytest.approx(value)
+
+
+def test_match_detections_gating_matches_dense_on_clusters():
+    rng = np.random.default_rng(1)
+    centers = np.array([[0.0, 0.0, 0.0], [50.0, 0.0, 0.0], [0.0, 50.0, 0.0]])
+    states = np.concatenate([center + rng.normal(size=(4, 3)) for center in centers])
+    detections = states + rng.normal(scale=0.1, size=states.shape)
+    detections = np.concatenate([detections, [[100.0, 100.0, 100.0]]])
+
+    dense = match_detections(states, detections, distance_threshold=1.0)
+    gated = match_detections(states, detections, distance_threshold=1.0, gating=True)
+
+    assert set(zip(*dense)) == set(zip(*gated))
+    assert len(gated[0]) == len(states)
+
+
+def test_mahalanobis_cost_matrix_matches_scipy():
+    rng = np.random.default_rng(2)
+    states = rng.normal(size=(4, 3))
+    detections = rng.normal(size=(5, 3))
+    factors = rng.normal(size=(4, 3, 3))
+    inverse_covariances = innovation_covariance_inverses(
+        factors @ factors.transpose(0, 2, 1), np.eye(3) * 0.5
+    )
+
+    cost_matrix = compute_mahalanobis_cost_matrix(
+        states, detections, inverse_covariances
+    )
+
+    for i, state in enumerate(states):
+        for j, detection in enumerate(detections):
+            expected = mahalanobis(state, detection, inverse_covariances[i]) ** 2
+            assert cost_matrix[i, j] == pytest.approx(expected)
+
+
+def test_match_detections_mahalanobis_gating_matches_dense():
+    rng = np.random.default_rng(3)
+    states = rng.uniform(-20, 20, size=(30, 3))
+    detections = np.concatenate(
+        [
+            states + rng.normal(scale=0.5, size=states.shape),
+            rng.uniform(-20, 20, size=(10, 3)),
+        ]
+    )
+    factors = rng.normal(scale=0.5, size=(30, 3, 3))
+    inverse_covariances = innovation_covariance_inverses(
+        factors @ factors.transpose(0, 2, 1), np.eye(3) * 0.1
+    )
+
+    dense = match_detections(
+        states, detections, 7.8, inverse_covariances=inverse_covariances
+    )
+    gated = match_detections(
+        states, detections, 7.8, gating=True, inverse_covariances=inverse_covariances
+    )
+
+    assert set(zip(*dense)) == set(zip(*gated))
+    assert len(gated[0]) > 0
+
+
+def _crowded_frame(seed):
+    rng = np.random.default_rng(seed)
+    states = rng.uniform(-5, 5, size=(60, 3))
+    detections = np.concatenate(
+        [
+            states + rng.normal(scale=1.0, size=states.shape),
+            rng.uniform(-5, 5, size=(20, 3)),
+        ]
+    )
+    return states, detections
+
+
+def _gated_cost(cost_matrix, track_indices, detection_indices, threshold):
+    unmatched = len(cost_matrix) - len(track_indices)
+    return cost_matrix[track_indices, detection_indices].sum() + threshold * unmatched
+
+
+def _greedy_reference(cost_matrix, threshold):
+    expected = set()
+    tracks, detections_taken = set(), set()
+    for index in np.argsort(cost_matrix, axis=None, kind="stable"):
+        track, detection = np.unravel_index(index, cost_matrix.shape)
+        if cost_matrix[track, detection] >= threshold:
+            break
+        if track not in tracks and detection not in detections_taken:
+            expected.add((track, detection))
+            tracks.add(track)
+            detections_taken.add(detection)
+    return expected
+
+
+@pytest.mark.parametrize("threshold", [1.5, 6.0])
+@pytest.mark.parametrize("gating", [False, True])
+def test_greedy_solver_takes_cheapest_pairs_first(gating, threshold):
+    # The wide gate holds many more pairs than one sorted greedy chunk.
+    states, detections = _crowded_frame(4)
+    cost_matrix = compute_cost_matrix(states, detections)
+
+    greedy = match_detections(states, detections, threshold, gating, solver="greedy")
+    assert set(zip(*greedy)) == _greedy_reference(cost_matrix, threshold)
+
+
+def test_greedy_solver_breaks_ties_by_index():
+    rng = np.random.default_rng(6)
+    states = rng.integers(0, 4, size=(40, 3)).astype(float)
+    detections = rng.integers(0, 4, size=(50, 3)).astype(float)
+    cost_matrix = compute_cost_matrix(states, detections)
+
+    greedy = match_detections(states, detections, 3.0, solver="greedy")
+    assert set(zip(*greedy)) == _greedy_reference(cost_matrix, 3.0)
+
+
+@pytest.mark.parametrize("gating", [False, True])
+def test_auction_solver_is_epsilon_optimal(gating):
+    states, detections = _crowded_frame(5)
+    threshold = 1.5
+    cost_matrix = compute_cost_matrix(states, detections)
+
+    # Exact gated optimum, every track may take a private unmatched column.
+    num_tracks = len(states)
+    augmented = np.full((num_tracks, len(detections) + num_tracks), 1e9)
+    augmented[:, : len(detections)] = np.where(
+        cost_matrix < threshold, cost_matrix, 1e9
+    )
+    augmented[np.arange(num_tracks), len(detections) + np.arange(num_tracks)] = (
+        threshold
+    )
+    rows, cols = linear_sum_assignment(augmented)
+    optimum = augmented[rows, cols].sum()
+
+    auction = match_detections(states, detections, threshold, gating, solver="auction")
+    assert len(set(auction[1])) == len(auction[1])
+    assert np.all(cost_matrix[auction] < threshold)
+    cost = _gated_cost(cost_matrix, *auction, threshold)
+    assert optimum - 1e-9 <= cost <= optimum + num_tracks * AUCTION_EPSILON * threshold
+
+
+def test_unknown_solver_raises():
+    with pytest.raises(ValueError):
+        TrackSettings(0.1, 0.1, 1.0, 2.0, 3, 2, 3, solver="simplex")
+
+
+@pytest.mark.parametrize("gating", [False, True])
+@pytest.mark.parametrize("metric", ["euclidean", "mahalanobis"])
+def test_run_tracker_on_sequences_matches_single_runs(track_settings, gating, metric):
+    track_settings.gating = gating
+    track_settings.metric = metric
+    rng = np.random.default_rng(5)
+    sequences = [
+        Sequence.from_dict(_drifting_detections(rng, num_frames))
+        for num_frames in (30, 12, 0, 25)
+    ]
+
+    outputs = run_tracker_on_sequences(track_settings, sequences)
+
+    assert len(outputs) == len(sequences)
+    for sequence, output in zip(sequences, outputs):
+        expected = run_tracker_on_sequence(track_settings, sequence, engine="batch")
+        assert np.array_equal(output.frames, expected.frames)
+        assert np.array_equal(output.frame_offsets, expected.frame_offsets)
+        assert np.array_equal(output.ids, expected.ids)
+        assert np.array_equal(output.positions, expected.positions)
+        for key, values in expected.attributes.items():
+            assert np.array_equal(output.attributes[key], values)
+
+
+@pytest.mark.parametrize("gating", [False, True])
+def test_run_trackers_on_sequences_matches_separate_settings(gating):
+    rng = np.random.default_rng(6)
+    sequences = [
+        Sequence.from_dict(
+            {
+                str(frame): {
+                    "tracks": [
+                        {"x": x, "y": y, "z": z}
+                        for x, y, z in rng.uniform(-5, 5, size=(rng.poisson(4), 3))
+                    ]
+                }
+                for frame in range(1, 21)
+            }
+        )
+        for _ in range(3)
+    ]
+    settings_batch = [
+        TrackSettings(0.1, 0.1, 1.0, 2.0, 10, 3, 5, gating=gating),
+        TrackSettings(2.0, 0.01, 5.0, 4.0, 2, 1, 2, gating=gating),
+        TrackSettings(0.1, 0.1, 1.0, 2.0, 10, 3, 5, gating=gating, solver="auction"),
+    ]
+
+    outputs = run_trackers_on_sequences(settings_batch, sequences)
+
+    for settings, settings_outputs in zip(settings_batch, outputs):
+        expected = run_tracker_on_sequences(settings, sequences)
+        for output, sequence_expected in zip(settings_outputs, expected):
+            assert np.array_equal(output.ids, sequence_expected.ids)
+            assert np.array_equal(output.positions, sequence_expected.positions)
+    assert not np.array_equal(outputs[0][0].ids, outputs[1][0].ids)
+
+
+def test_track_settings_rejects_unknown_metric():
+    with pytest.raises(ValueError):
+        TrackSettings(0.1, 0.1, 1.0, 2.0, 10, 3, 5, metric="cosine")
+
+
+def test_match_detections_gating_without_tracks():
+    tracks, detections = match_detections(
+        np.zeros((0, 3)), np.ones((2, 3)), distance_threshold=1.0, gating=True
+    )
+    assert len(tracks) == 0
+    assert len(detections) == 0
+
+
+@pytest.mark.parametrize("engine", ["object", "batch"])
+def test_run_tracker_on_sequence_matches_dict_path(track_settings, detections, engine):
+    expected = run_tracker_with_parameters(
+        track_settings, detections.to_dict(), engine=engine
+    )
+    tracks = run_tracker_on_sequence(track_settings, detections, engine=engine)
+
+    actual = tracks.to_dict()
+    assert actual.keys() == expected.keys()
+    for frame in expected:
+        assert [t["id"] for t in actual[frame]["tracks"]] == [
+            t["id"] for t in expected[frame]["tracks"]
+        ]
+        for actual_track, expected_track in zip(
+            actual[frame]["tracks"], expected[frame]["tracks"]
+        ):
+            for key, value in expected_track.items():
+                assert actual_track[key] == pytest.approx(value)
+
+
+@pytest.mark.parametrize("engine", ["object", "batch"])
+def test_run_tracker_stream_matches_batch_run(track_settings, engine):
+    detections = {
+        str(frame): {"tracks": [{"x": 0.1 * frame, "y": 0.0, "z": 0.0}]}
+        for frame in range(1, 11)
+    }
+    lines = [
+        json.dumps({"frame": frame, **content}) for frame, content in detections.items()
+    ]
+    output = io.StringIO()
+
+    run_tracker_stream(track_settings, lines + [""], output, engine=engine)
+
+    streamed = [json.loads(line) for line in output.getvalue().splitlines()]
+    expected = run_tracker_with_parameters(track_settings, detections, engine=engine)
+    assert [content.pop("frame") for content in streamed] == list(expected.keys())
+    for content, expected_content in zip(streamed, expected.values()):
+        assert [t["id"] for t in content["tracks"]] == [
+            t["id"] for t in expected_content["tracks"]
+        ]
+
+
+def test_stream_mode_rejects_cpp_backend(track_settings):
+    args = argparse.Namespace(stream=True, backend="cpp")
+    with pytest.raises(ValueError, match="python backend"):
+        _run(args, track_settings, NULL_PROFILER)
+
+
+def test_tracker_step_returns_confirmed_tracks(track_settings, initial_position):
+    tracker = Tracker(track_settings)
+    for _ in range(track_settings.min_hits - 1):
+        assert tracker.step([initial_position]) == []
+    frame_tracks = tracker.step([initial_position])
+    assert [track["id"] for track in frame_tracks] == [0]
@@ -0,0 +1,167 @@
+import pytest
+import numpy as np
+
+from datatypes.sequence import Sequence
+from utilities import (
+    find_data_file,
+    format_frame_line,
+    iter_frames,
+    load_columnar,
+    load_data,
+    load_sequence,
+    parse_frame_line,
+    save_data,
+    save_json,
+)
+
+
+@pytest.fixture
+def references():
+    return {
+        "1": {"tracks": [{"id": 0, "x": 0.0, "y": 1.0, "z": 2.0}]},
+        "2": {"tracks": []},
+        "3": {
+            "tracks": [
+                {"id": 0, "x": 0.5, "y": 1.0, "z": 2.0},
+                {"id": 3, "x": -1.0, "y": 4.0, "z": 0.25},
+            ]
+        },
+    }
+
+
+def test_sequence_round_trip(references):
+    sequence = Sequence.from_dict(references)
+    assert len(sequence) == 3
+    assert sequence.num_objects == 3
+    assert sequence.frame_offsets.tolist() == [0, 1, 1, 3]
+    assert sequence.frame_ids(2).tolist() == [0, 3]
+    assert np.array_equal(
+        sequence.frame_positions(2), [[0.5, 1.0, 2.0], [-1.0, 4.0, 0.25]]
+    )
+    assert sequence.to_dict() == references
+
+
+def test_columnar_round_trip_is_memory_mapped(tmp_path, references):
+    filepath = tmp_path / "clip.npz"
+    save_data(filepath, references)
+
+    sequence = load_columnar(filepath)
+    assert isinstance(sequence.positions, np.memmap)
+    assert load_data(filepath) == references
+
+
+def test_columnar_keeps_attributes_and_missing_ids(tmp_path):
+    tracks = {
+        "1": {"tracks": [{"id": 2, "x": 0.0, "y": 0.0, "z": 0.0, "vx": 1.0}]},
+    }
+    detections = {
+        "1": {"tracks": [{"x": 0.0, "y": 0.0, "z": 0.0}]},
+        "2": {"tracks": []},
+    }
+
+    save_data(tmp_path / "tracks.npz", tracks)
+    save_data(tmp_path / "detections.npz", detections)
+
+    assert load_data(tmp_path / "tracks.npz") == tracks
+    assert load_data(tmp_path / "detections.npz") == detections
+
+
+@pytest.mark.parametrize("extension", [".json", ".npz"])
+def test_mixed_ids_and_attributes_round_trip(tmp_path, extension):
+    # Only some objects carry an id or an attribute.
+    mixed = {
+        "1": {
+            "tracks": [
+                {"x": 0.0, "y": 0.0, "z": 0.0},
+                {"id": 4, "x": 1.0, "y": 0.0, "z": 0.0, "vx": 0.5},
+            ]
+        },
+        "2": {
+            "tracks": [
+                {"id": 4, "x": 2.0, "y": 0.0, "z": 0.0},
+                {"x": 3.0, "y": 0.0, "z": 0.0, "vx": -1.0, "vy": 2.0},
+            ]
+        },
+    }
+
+    sequence = Sequence.from_dict(mixed)
+    assert len(sequence.ids) == len(sequence.positions)
+    assert all(len(values) == 4 for values in sequence.attributes.values())
+    assert sequence.frame_ids(1).tolist() == [4, -1]
+    assert sequence.to_dict() == mixed
+
+    save_data(tmp_path / f"clip{extension}", mixed)
+    assert load_data(tmp_path / f"clip{extension}") == mixed
+
+
+def test_find_data_file_prefers_columnar(tmp_path, references):
+    assert find_data_file(tmp_path, "clip") is None
+    save_data(tmp_path / "clip.json", references)
+    assert find_data_file(tmp_path, "clip") == tmp_path / "clip.json"
+    save_data(tmp_path / "clip.npz", references)
+    assert find_data_file(tmp_path, "clip") == tmp_path / "clip.npz"
+
+
+def test_frame_line_round_trip(references):
+    line = format_frame_line("3", references["3"])
+    assert line.endswith("\n") and "\n" not in line[:-1]
+    assert parse_frame_line(line) == ("3", references["3"])
+    assert parse_frame_line("  \n") == (None, {})
+
+
+def test_ndjson_round_trip(tmp_path, references):
+    filepath = tmp_path / "clip.ndjson"
+    save_data(filepath, references)
+
+    lines = filepath.read_text().splitlines()
+    assert len(lines) == len(references)
+    assert load_data(filepath) == references
+    assert load_sequence(filepath).to_dict() == references
+
+
+@pytest.mark.parametrize("extension", [".json", ".ndjson", ".npz"])
+def test_iter_frames_matches_across_formats(tmp_path, references, extension):
+    filepath = tmp_path / f"clip{extension}"
+    save_data(filepath, references)
+    assert list(iter_frames(filepath)) == list(references.items())
+
+
+def test_sequence_window_is_a_view(references):
+    sequence = Sequence.from_dict(references)
+    head = sequence.window(0, 2)
+    assert head.to_dict() == {"1": references["1"], "2": references["2"]}
+    assert np.shares_memory(head.positions, sequence.positions)
+    assert np.shares_memory(head.frame_offsets, sequence.frame_offsets)
+
+    tail = sequence.window(1, 3)
+    assert tail.to_dict() == {"2": references["2"], "3": references["3"]}
+    assert tail.frame_offsets.tolist() == [0, 0, 2]
+    assert np.shares_memory(tail.ids, sequence.ids)
+    assert sequence.window(0, len(sequence)).to_dict() == references
+
+
+def test_sequence_digest_depends_on_content_only(tmp_path, references):
+    digests = set()
+    for extension in (".json", ".ndjson", ".npz"):
+        save_data(tmp_path / f"clip{extension}", references)
+        digests.add(load_sequence(tmp_path / f"clip{extension}").digest())
+    assert len(digests) == 1
+
+    references["3"]["tracks"][1]["x"] = -1.5
+    assert Sequence.from_dict(references).digest() not in digests
+
+
+def test_save_json_is_compact_unless_indented(tmp_path, references):
+    save_json(tmp_path / "compact.json", references)
+    save_json(tmp_path / "indented.json", references, indent=4)
+    assert " " not in (tmp_path / "compact.json").read_text()
+    assert "\n    " in (tmp_path / "indented.json").read_text()
+
+    save_data(tmp_path / "frames.json", references)
+    assert (tmp_path / "frames.json").read_text() == (
+        tmp_path / "compact.json"
+    ).read_text()
+
+
+if __name__ == "__main__":
+    pytest.main()
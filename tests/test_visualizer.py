@@ -0,0 +1,56 @@
+import pytest
+import numpy as np
+
+from annotator import TrackGenerator
+from utilities import load_sequence, save_data
+from visualizer import Visualizer, VisualizerInput, _figure_template, visualize_clips
+
+
+def test_visualize_clips_reuses_figure_template(tmp_path):
+    clips = []
+    for nr in range(2):
+        references = tmp_path / f"references_{nr}.npz"
+        detections = tmp_path / f"detections_{nr}.npz"
+        TrackGenerator(num_frames=30, num_tracks=2, seed=nr).save_data(
+            references, detections
+        )
+        clips.append(
+            (
+                [
+                    VisualizerInput(references, title="references"),
+                    VisualizerInput(detections, title="detections", ignore_id=True),
+                ],
+                tmp_path / f"clip_{nr}.png",
+            )
+        )
+
+    visualize_clips(clips)
+    fig, axes = _figure_template(2)
+    assert len(fig.axes) == 2
+    assert [len(ax.collections) for ax in axes] == [1, 1]
+
+    visualize_clips(clips, workers=2)
+    for _, output in clips:
+        assert output.read_bytes().startswith(b"\x89PNG")
+
+
+def test_ndjson_is_read_frame_by_frame_into_plot_columns(tmp_path):
+    TrackGenerator(num_frames=30, num_tracks=2, seed=0).save_data(
+        tmp_path / "references.npz", tmp_path / "detections.npz"
+    )
+    for name in ("references", "detections"):
+        expected = load_sequence(tmp_path / f"{name}.npz")
+        save_data(tmp_path / f"{name}.ndjson", expected)
+
+        sequence = Visualizer([])._load_data(tmp_path / f"{name}.ndjson")
+        assert np.array_equal(sequence.frames, expected.frames)
+        assert np.array_equal(sequence.frame_offsets, expected.frame_offsets)
+        assert np.array_equal(sequence.positions, expected.positions)
+        assert (sequence.ids is None) == (expected.ids is None)
+        if expected.ids is not None:
+            assert np.array_equal(sequence.ids, expected.ids)
+        assert sequence.attributes == {}
+
+
+if __name__ == "__main__":
+    pytest.main()
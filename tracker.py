@@ -1,12 +1,425 @@
 import json
 import numpy as np
+import sys
 import argparse
+from collections import deque
+from contextlib import ExitStack
 from pathlib import Path
 from enum import Enum
-from filterpy.kalman import KalmanFilter
-from typing import Any, Dict, List, Tuple
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 from scipy.optimize import linear_sum_assignment
-from utilities import get_data_path, load_json, save_json
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+from datatypes.sequence import Sequence
+from profiling import NULL_PROFILER, PROFILE_FORMATS, FrameProfiler, NullProfiler
+from utilities import (
+    NDJSON_EXTENSION,
+    content_positions,
+    format_frame_line,
+    get_data_path,
+    iter_frames,
+    load_data,
+    load_json,
+    parse_frame_line,
+    save_data,
+    save_ndjson,
+)
+
+TRANSITION_MATRIX = np.array(
+    [
+        [1, 0, 0, 1, 0, 0, 0.5, 0, 0],
+        [0, 1, 0, 0, 1, 0, 0, 0.5, 0],
+        [0, 0, 1, 0, 0, 1, 0, 0, 0.5],
+        [0, 0, 0, 1, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 1, 0, 0, 1],
+        [0, 0, 0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 1],
+    ]
+)
+MEASUREMENT_MATRIX = np.array(
+    [
+        [1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 1, 0, 0, 0, 0, 0, 0],
+    ]
+)
+HISTORY_LENGTH = 5
+TRACK_ATTRIBUTES = ("vx", "vy", "vz", "ax", "ay", "az")
+DISTANCE_METRICS = ("euclidean", "mahalanobis")
+ASSIGNMENT_SOLVERS = ("hungarian", "greedy", "auction")
+GROUP_SPACING = 1e12
+# Edges sorted per greedy chunk, relative to the largest possible matching.
+GREEDY_CHUNK = 8
+# Auction bid increment relative to the largest gate.
+AUCTION_EPSILON = 1e-3
+
+
+def compute_cost_matrix(states: np.ndarray, detections: np.ndarray) -> np.ndarray:
+    return cdist(states.reshape(-1, 3), detections.reshape(-1, 3))
+
+
+def innovation_covariance_inverses(
+    position_covariances: np.ndarray, measurement_noise: np.ndarray
+) -> np.ndarray:
+    # S = HPH^T + R, H selects the position block of the state covariance.
+    return np.linalg.inv(position_covariances.reshape(-1, 3, 3) + measurement_noise)
+
+
+def compute_mahalanobis_cost_matrix(
+    states: np.ndarray, detections: np.ndarray, inverse_covariances: np.ndarray
+) -> np.ndarray:
+    # Squared Mahalanobis distances, chi-square distributed with 3 degrees of
+    # freedom for detections of the track.
+    residuals = detections[np.newaxis, :, :] - states[:, np.newaxis, :]
+    return np.einsum("tdj,tdj->td", residuals @ inverse_covariances, residuals)
+
+
+def _track_thresholds(
+    distance_threshold: Union[float, np.ndarray], num_tracks: int
+) -> np.ndarray:
+    # One threshold for all tracks or one per track.
+    return np.broadcast_to(distance_threshold, (num_tracks,))
+
+
+def _greedy_assignment(
+    edge_tracks: np.ndarray,
+    edge_detections: np.ndarray,
+    edge_costs: np.ndarray,
+    num_tracks: int,
+    num_detections: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # One pass over the edges by increasing cost, ties broken by index, takes
+    # every edge whose track and detection are both still free. Only the
+    # cheapest edges are sorted at a time, once every track or detection is
+    # taken the remaining edges never need sorting.
+    track_free = bytearray(b"\x01") * num_tracks
+    detection_free = bytearray(b"\x01") * num_detections
+    matched_tracks: List[int] = []
+    matched_detections: List[int] = []
+    limit = min(num_tracks, num_detections)
+    chunk_size = GREEDY_CHUNK * max(limit, 1)
+    while len(edge_costs) > 0:
+        chunk = np.ones(len(edge_costs), dtype=bool)
+        if len(edge_costs) > chunk_size:
+            # Every edge as cheap as the boundary one joins, so ties keep their
+            # index order across chunks.
+            chunk = edge_costs <= np.partition(edge_costs, chunk_size)[chunk_size]
+        indices = np.flatnonzero(chunk)
+        tracks, detections = edge_tracks[indices], edge_detections[indices]
+        order = np.lexsort((detections, tracks, edge_costs[indices]))
+        for track, detection in zip(tracks[order].tolist(), detections[order].tolist()):
+            if track_free[track] and detection_free[detection]:
+                track_free[track] = detection_free[detection] = 0
+                matched_tracks.append(track)
+                matched_detections.append(detection)
+        if len(matched_tracks) == limit:
+            break
+
+        remaining = np.flatnonzero(
+            ~chunk
+            & np.frombuffer(track_free, dtype=bool)[edge_tracks]
+            & np.frombuffer(detection_free, dtype=bool)[edge_detections]
+        )
+        edge_tracks, edge_detections, edge_costs = (
+            edge_tracks[remaining],
+            edge_detections[remaining],
+            edge_costs[remaining],
+        )
+
+    return (
+        np.array(matched_tracks, dtype=np.int64),
+        np.array(matched_detections, dtype=np.int64),
+    )
+
+
+def _auction_assignment(
+    cost_matrix: np.ndarray, thresholds: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    num_tracks, num_detections = cost_matrix.shape
+    scale = float(thresholds.max()) if num_tracks > 0 else 0.0
+    if num_detections == 0 or scale <= 0.0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Tracks bid for detections inside their gate. The last column is a private
+    # option to stay unmatched at the cost of the gate, nobody else bids for it
+    # and its price stays zero. Detections without a bid keep price zero, so the
+    # result is within num_tracks * epsilon of the optimal gated cost.
+    values = np.column_stack(
+        [
+            np.where(cost_matrix < thresholds[:, np.newaxis], -cost_matrix, -np.inf),
+            -thresholds,
+        ]
+    )
+    prices = np.zeros(num_detections + 1)
+    epsilon = AUCTION_EPSILON * scale
+    owners = np.full(num_detections, -1)
+    assignment = np.full(num_tracks, -1)
+    bidders = np.arange(num_tracks)
+    while len(bidders) > 0:
+        net_values = values[bidders] - prices
+        best = np.argmax(net_values, axis=1)
+        rows = np.arange(len(bidders))
+        best_values = net_values[rows, best]
+        net_values[rows, best] = -np.inf
+        increments = best_values - net_values.max(axis=1) + epsilon
+
+        unmatched = best == num_detections
+        assignment[bidders[unmatched]] = num_detections
+        bidders, best = bidders[~unmatched], best[~unmatched]
+        bids = prices[best] + increments[~unmatched]
+
+        # The highest bid wins every detection, its previous owner bids again.
+        order = np.lexsort((-bids, best))
+        winners = order[np.unique(best[order], return_index=True)[1]]
+        won = best[winners]
+        outbid = owners[won]
+        assignment[outbid[outbid >= 0]] = -1
+        owners[won] = bidders[winners]
+        assignment[bidders[winners]] = won
+        prices[won] = bids[winners]
+        bidders = np.flatnonzero(assignment == -1)
+
+    track_indices = np.flatnonzero(assignment < num_detections)
+    return track_indices, assignment[track_indices]
+
+
+def _assign(
+    cost_matrix: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    solver: str = "hungarian",
+) -> Tuple[np.ndarray, np.ndarray]:
+    thresholds = np.asarray(distance_threshold)
+    if solver == "greedy":
+        gated = cost_matrix < (
+            thresholds[:, np.newaxis] if thresholds.ndim else thresholds
+        )
+        # Flat indices come out row by row, the track of an edge follows from
+        # the number of gated detections per track.
+        edges = np.flatnonzero(gated)
+        edge_tracks = np.repeat(
+            np.arange(len(cost_matrix)), np.count_nonzero(gated, axis=1)
+        )
+        return _greedy_assignment(
+            edge_tracks,
+            edges - edge_tracks * cost_matrix.shape[1],
+            cost_matrix.ravel()[edges],
+            *cost_matrix.shape,
+        )
+    if solver == "auction":
+        return _auction_assignment(
+            cost_matrix, _track_thresholds(distance_threshold, len(cost_matrix))
+        )
+
+    track_indices, detection_indices = linear_sum_assignment(cost_matrix)
+    valid = cost_matrix[track_indices, detection_indices] < (
+        thresholds[track_indices] if thresholds.ndim else thresholds
+    )
+    return track_indices[valid], detection_indices[valid]
+
+
+def _match_dense(
+    states: np.ndarray,
+    detections: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    profiler: NullProfiler = NULL_PROFILER,
+    inverse_covariances: Optional[np.ndarray] = None,
+    solver: str = "hungarian",
+) -> Tuple[np.ndarray, np.ndarray]:
+    with profiler.stage("cost_matrix"):
+        if inverse_covariances is None:
+            cost_matrix = compute_cost_matrix(states, detections)
+        else:
+            cost_matrix = compute_mahalanobis_cost_matrix(
+                states, detections, inverse_covariances
+            )
+    with profiler.stage("assignment"):
+        return _assign(cost_matrix, distance_threshold, solver)
+
+
+def _grouped(points: np.ndarray, groups: Optional[np.ndarray]) -> np.ndarray:
+    # Groups lie far apart along a fourth axis. Within a group that coordinate
+    # is equal, so spatial index distances are exactly the 3D ones.
+    if groups is None:
+        return points
+    return np.column_stack([points, groups * GROUP_SPACING])
+
+
+def _mahalanobis_pairs(
+    states: np.ndarray,
+    detections: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    inverse_covariances: np.ndarray,
+    groups: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    num_tracks = len(states)
+    thresholds = _track_thresholds(distance_threshold, num_tracks)
+
+    # The gate ellipsoid of a track lies inside the ball whose radius follows
+    # from the largest eigenvalue of S, the smallest one of its inverse.
+    radii = np.sqrt(thresholds / np.linalg.eigvalsh(inverse_covariances)[:, 0])
+    track_groups, detection_groups = groups if groups is not None else (None, None)
+    neighbours = cKDTree(_grouped(detections, detection_groups)).query_ball_point(
+        _grouped(states, track_groups), radii
+    )
+    counts = np.fromiter(map(len, neighbours), dtype=np.int64, count=num_tracks)
+    edge_tracks = np.repeat(np.arange(num_tracks), counts)
+    edge_detections = np.fromiter(
+        chain.from_iterable(neighbours), dtype=np.int64, count=counts.sum()
+    )
+
+    residuals = detections[edge_detections] - states[edge_tracks]
+    distances = np.einsum(
+        "ni,nij,nj->n", residuals, inverse_covariances[edge_tracks], residuals
+    )
+    inside = distances < thresholds[edge_tracks]
+    return edge_tracks[inside], edge_detections[inside], distances[inside]
+
+
+def _match_gated(
+    states: np.ndarray,
+    detections: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    profiler: NullProfiler = NULL_PROFILER,
+    inverse_covariances: Optional[np.ndarray] = None,
+    groups: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    solver: str = "hungarian",
+) -> Tuple[np.ndarray, np.ndarray]:
+    num_tracks, num_detections = len(states), len(detections)
+    if num_tracks == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Feasible (track, detection) pairs within the gate, optionally only
+    # between tracks and detections of the same group.
+    with profiler.stage("cost_matrix"):
+        if inverse_covariances is None:
+            track_groups, detection_groups = (
+                groups if groups is not None else (None, None)
+            )
+            pairs = cKDTree(
+                _grouped(detections, detection_groups)
+            ).sparse_distance_matrix(
+                cKDTree(_grouped(states, track_groups)),
+                np.max(distance_threshold),
+                output_type="ndarray",
+            )
+            thresholds = _track_thresholds(distance_threshold, num_tracks)
+            pairs = pairs[pairs["v"] < thresholds[pairs["j"]]]
+            edge_tracks, edge_detections, edge_costs = (
+                pairs["j"],
+                pairs["i"],
+                pairs["v"],
+            )
+        else:
+            edge_tracks, edge_detections, edge_costs = _mahalanobis_pairs(
+                states, detections, distance_threshold, inverse_covariances, groups
+            )
+    with profiler.stage("assignment"):
+        # Greedy only ever looks at feasible pairs, it needs no components.
+        if solver == "greedy":
+            return _greedy_assignment(
+                edge_tracks, edge_detections, edge_costs, num_tracks, num_detections
+            )
+        return _solve_gated(
+            states,
+            detections,
+            distance_threshold,
+            edge_tracks,
+            edge_detections,
+            inverse_covariances,
+            solver,
+        )
+
+
+def _solve_gated(
+    states: np.ndarray,
+    detections: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    edge_tracks: np.ndarray,
+    edge_detections: np.ndarray,
+    inverse_covariances: Optional[np.ndarray] = None,
+    solver: str = "hungarian",
+) -> Tuple[np.ndarray, np.ndarray]:
+    num_tracks, num_detections = len(states), len(detections)
+    thresholds = _track_thresholds(distance_threshold, num_tracks)
+
+    # Tracks are nodes 0..T-1 and detections nodes T..T+D-1 of a bipartite graph,
+    # every connected component is an independent assignment problem.
+    graph = coo_matrix(
+        (np.ones(len(edge_tracks)), (edge_tracks, num_tracks + edge_detections)),
+        shape=(num_tracks + num_detections, num_tracks + num_detections),
+    )
+    _, labels = connected_components(graph, directed=False)
+    track_labels = labels[:num_tracks]
+    detection_labels = labels[num_tracks:]
+
+    tracks_per_component = np.bincount(track_labels, minlength=labels.max() + 1)
+    detections_per_component = np.bincount(detection_labels, minlength=labels.max() + 1)
+
+    # Components with a single feasible pair need no solver.
+    edge_labels = track_labels[edge_tracks]
+    trivial = (tracks_per_component[edge_labels] == 1) & (
+        detections_per_component[edge_labels] == 1
+    )
+    matched_tracks = [edge_tracks[trivial]]
+    matched_detections = [edge_detections[trivial]]
+
+    shared = np.unique(edge_labels[~trivial])
+    if len(shared) > 0:
+        track_order = np.argsort(track_labels, kind="stable")
+        detection_order = np.argsort(detection_labels, kind="stable")
+        track_starts = np.searchsorted(track_labels[track_order], shared)
+        detection_starts = np.searchsorted(detection_labels[detection_order], shared)
+
+        for label, track_start, detection_start in zip(
+            shared, track_starts, detection_starts
+        ):
+            rows = track_order[track_start : track_start + tracks_per_component[label]]
+            cols = detection_order[
+                detection_start : detection_start + detections_per_component[label]
+            ]
+            track_indices, detection_indices = _match_dense(
+                states[rows],
+                detections[cols],
+                thresholds[rows],
+                inverse_covariances=(
+                    None if inverse_covariances is None else inverse_covariances[rows]
+                ),
+                solver=solver,
+            )
+            matched_tracks.append(rows[track_indices])
+            matched_detections.append(cols[detection_indices])
+
+    return np.concatenate(matched_tracks), np.concatenate(matched_detections)
+
+
+def match_detections(
+    states: np.ndarray,
+    detections: np.ndarray,
+    distance_threshold: Union[float, np.ndarray],
+    gating: bool = False,
+    profiler: NullProfiler = NULL_PROFILER,
+    inverse_covariances: Optional[np.ndarray] = None,
+    solver: str = "hungarian",
+) -> Tuple[np.ndarray, np.ndarray]:
+    states = states.reshape(-1, 3)
+    detections = detections.reshape(-1, 3)
+    if gating:
+        return _match_gated(
+            states,
+            detections,
+            distance_threshold,
+            profiler,
+            inverse_covariances,
+            solver=solver,
+        )
+    return _match_dense(
+        states, detections, distance_threshold, profiler, inverse_covariances, solver
+    )
 
 
 class TrackStage(Enum):
@@ -24,7 +437,15 @@ class TrackSettings:
         max_age: int,
         min_hits: int,
         max_consecutive_misses: int,
+        gating: bool = False,
+        metric: str = "euclidean",
+        solver: str = "hungarian",
     ) -> None:
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unknown distance metric {metric}.")
+        if solver not in ASSIGNMENT_SOLVERS:
+            raise ValueError(f"Unknown assignment solver {solver}.")
+
         self.measurement_noise = measurement_noise
         self.process_noise = process_noise
         self.covariance = covariance
@@ -32,9 +453,61 @@ class TrackSettings:
         self.max_age = max_age
         self.min_hits = min_hits
         self.max_consecutive_misses = max_consecutive_misses
+        self.gating = gating
+        self.metric = metric
+        self.solver = solver
+
+
+class KalmanModel:
+    __slots__ = ("F", "H", "Q", "R", "I")
+
+    def __init__(self, settings: TrackSettings) -> None:
+        self.F = TRANSITION_MATRIX.astype(float)
+        self.H = MEASUREMENT_MATRIX.astype(float)
+        self.Q = np.eye(9) * settings.process_noise
+        self.R = np.eye(3) * settings.measurement_noise
+        self.I = np.eye(9)
+
+
+class TrackFilter:
+    # Linear Kalman filter with a Joseph form update, numerically identical to
+    # filterpy's KalmanFilter but holding only its state and a shared model.
+    __slots__ = ("x", "P", "model")
+
+    def __init__(self, x: np.ndarray, P: np.ndarray, model: KalmanModel) -> None:
+        self.x = x
+        self.P = P
+        self.model = model
+
+    def predict(self) -> None:
+        F = self.model.F
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + self.model.Q
+
+    def update(self, z: np.ndarray) -> None:
+        H, R = self.model.H, self.model.R
+        y = z.reshape((3, 1)) - H @ self.x
+        PHT = self.P @ H.T
+        S = H @ PHT + R
+        K = PHT @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        I_KH = self.model.I - K @ H
+        self.P = I_KH @ self.P @ I_KH.T + K @ R @ K.T
 
 
 class Track:
+    __slots__ = (
+        "id",
+        "kf",
+        "stage",
+        "age",
+        "hits",
+        "hit_streak",
+        "time_since_update",
+        "consecutive_misses",
+        "position_history",
+    )
+
     def __init__(
         self,
         id: int,
@@ -42,13 +515,15 @@ class Track:
         initial_velocity: np.ndarray,
         initial_acceleration: np.ndarray,
         settings: TrackSettings,
+        model: Optional[KalmanModel] = None,
     ) -> None:
-        self.measurement_noise = settings.measurement_noise
-        self.covariance = settings.covariance
-        self.process_noise = settings.process_noise
         self.id = id
         self.kf = self.initialize_kalman_filter(
-            initial_position, initial_velocity, initial_acceleration
+            initial_position,
+            initial_velocity,
+            initial_acceleration,
+            settings.covariance,
+            model if model is not None else KalmanModel(settings),
         )
         self.stage = TrackStage.INITIALIZED
         self.age = 0
@@ -56,42 +531,21 @@ class Track:
         self.hit_streak = 0
         self.time_since_update = 0
         self.consecutive_misses = 0
-        self.position_history = [initial_position]
+        self.position_history = deque([initial_position], maxlen=HISTORY_LENGTH)
 
     def initialize_kalman_filter(
         self,
         initial_position: np.ndarray,
         initial_velocity: np.ndarray,
         initial_acceleration: np.ndarray,
-    ) -> KalmanFilter:
-        kf = KalmanFilter(dim_x=9, dim_z=3)
-        kf.F = np.array(
-            [
-                [1, 0, 0, 1, 0, 0, 0.5, 0, 0],
-                [0, 1, 0, 0, 1, 0, 0, 0.5, 0],
-                [0, 0, 1, 0, 0, 1, 0, 0, 0.5],
-                [0, 0, 0, 1, 0, 0, 1, 0, 0],
-                [0, 0, 0, 0, 1, 0, 0, 1, 0],
-                [0, 0, 0, 0, 0, 1, 0, 0, 1],
-                [0, 0, 0, 0, 0, 0, 1, 0, 0],
-                [0, 0, 0, 0, 0, 0, 0, 1, 0],
-                [0, 0, 0, 0, 0, 0, 0, 0, 1],
-            ]
-        )
-        kf.H = np.array(
-            [
-                [1, 0, 0, 0, 0, 0, 0, 0, 0],
-                [0, 1, 0, 0, 0, 0, 0, 0, 0],
-                [0, 0, 1, 0, 0, 0, 0, 0, 0],
-            ]
-        )
-        kf.R *= self.measurement_noise
-        kf.P *= self.covariance
-        kf.Q *= self.process_noise
-        kf.x[:3] = initial_position.reshape((3, 1))
-        kf.x[3:6] = initial_velocity.reshape((3, 1))
-        kf.x[6:] = initial_acceleration.reshape((3, 1))
-        return kf
+        covariance: float,
+        model: KalmanModel,
+    ) -> TrackFilter:
+        x = np.zeros((9, 1))
+        x[:3] = initial_position.reshape((3, 1))
+        x[3:6] = initial_velocity.reshape((3, 1))
+        x[6:] = initial_acceleration.reshape((3, 1))
+        return TrackFilter(x, np.eye(9) * covariance, model)
 
     def predict(self) -> np.ndarray:
         self.kf.predict()
@@ -106,8 +560,6 @@ class Track:
         self.hit_streak += 1
         self.consecutive_misses = 0
         self.position_history.append(measurement)
-        if len(self.position_history) > 5:
-            self.position_history.pop(0)
 
     def get_state(self) -> np.ndarray:
         return self.kf.x[:3].reshape((3,))
@@ -118,6 +570,9 @@ class Track:
     def get_acceleration(self) -> np.ndarray:
         return self.kf.x[6:].reshape((3,))
 
+    def get_position_covariance(self) -> np.ndarray:
+        return self.kf.P[:3, :3]
+
     def get_smoothed_position(self) -> np.ndarray:
         return np.mean(self.position_history, axis=0)
 
@@ -136,124 +591,787 @@ class Track:
 
 
 class Tracker:
-    def __init__(self, settings: TrackSettings) -> None:
+    def __init__(
+        self, settings: TrackSettings, profiler: NullProfiler = NULL_PROFILER
+    ) -> None:
         self.tracks: List[Track] = []
         self.track_id = 0
         self.distance_threshold = settings.distance_threshold
         self.max_age = settings.max_age
         self.min_hits = settings.min_hits
         self.max_consecutive_misses = settings.max_consecutive_misses
+        self.gating = settings.gating
+        self.metric = settings.metric
+        self.solver = settings.solver
+        self.model = KalmanModel(settings)
         self.settings = settings
+        self.profiler = profiler
 
     def associate_detections_to_tracks(
         self, detections: List[np.ndarray]
     ) -> Tuple[List[int], List[int], List[int]]:
-        assigned_tracks: List[int] = []
-        unassigned_tracks: List[int] = list(range(len(self.tracks)))
-        assigned_detections: List[int] = []
-
         if len(detections) == 0:
-            return assigned_tracks, unassigned_tracks, list(range(len(detections)))
-
-        cost_matrix = np.zeros((len(self.tracks), len(detections)))
+            return [], list(range(len(self.tracks))), []
 
-        for i, track in enumerate(self.tracks):
-            predicted_state = track.get_state()
-            for j, detection in enumerate(detections):
-                cost_matrix[i, j] = np.linalg.norm(predicted_state - detection)
-
-        track_indices, detection_indices = linear_sum_assignment(cost_matrix)
+        with self.profiler.stage("cost_matrix"):
+            states = np.array([track.get_state() for track in self.tracks])
+            inverse_covariances = None
+            if self.metric == "mahalanobis":
+                inverse_covariances = innovation_covariance_inverses(
+                    np.array(
+                        [track.get_position_covariance() for track in self.tracks]
+                    ),
+                    self.model.R,
+                )
+        track_indices, detection_indices = match_detections(
+            states,
+            np.asarray(detections),
+            self.distance_threshold,
+            self.gating,
+            self.profiler,
+            inverse_covariances,
+            self.solver,
+        )
 
-        for track_index, detection_index in zip(track_indices, detection_indices):
-            if cost_matrix[track_index, detection_index] < self.distance_threshold:
+        with self.profiler.stage("update"):
+            for track_index, detection_index in zip(track_indices, detection_indices):
                 self.tracks[track_index].update(detections[detection_index])
-                assigned_tracks.append(track_index)
-                assigned_detections.append(detection_index)
 
-        unassigned_tracks = [
-            i for i in range(len(self.tracks)) if i not in assigned_tracks
-        ]
-        unassigned_detections = [
-            i for i in range(len(detections)) if i not in assigned_detections
-        ]
+        track_assigned = np.zeros(len(self.tracks), dtype=bool)
+        track_assigned[track_indices] = True
+        detection_assigned = np.zeros(len(detections), dtype=bool)
+        detection_assigned[detection_indices] = True
 
-        return assigned_tracks, unassigned_tracks, unassigned_detections
+        return (
+            track_indices.tolist(),
+            np.flatnonzero(~track_assigned).tolist(),
+            np.flatnonzero(~detection_assigned).tolist(),
+        )
 
     def predict_tracks(self) -> None:
-        for track in self.tracks:
-            track.predict()
+        self.profiler.begin_frame()
+        with self.profiler.stage("predict"):
+            for track in self.tracks:
+                track.predict()
 
     def update_tracks(self, detections: List[np.ndarray]) -> None:
         assigned_tracks, unassigned_tracks, unassigned_detections = (
             self.associate_detections_to_tracks(detections)
         )
 
-        for i in unassigned_detections:
-            initial_velocity = np.zeros(3)
-            initial_acceleration = np.zeros(3)
-            self.tracks.append(
+        with self.profiler.stage("birth_death"):
+            # Only tracks touched this frame change their counters, so the
+            # bookkeeping visits the assigned, unassigned and new tracks once
+            # and expired tracks are dropped in a single order-preserving pass.
+            expired = set()
+            for i in unassigned_tracks:
+                track = self.tracks[i]
+                track.time_since_update += 1
+                if (
+                    track.time_since_update > self.max_age
+                    or track.consecutive_misses > self.max_consecutive_misses
+                ):
+                    expired.add(i)
+                elif track.time_since_update > 1:
+                    track.hit_streak = 0
+
+            new_tracks = [
                 Track(
-                    self.track_id,
+                    self.track_id + n,
                     detections[i],
-                    initial_velocity,
-                    initial_acceleration,
+                    np.zeros(3),
+                    np.zeros(3),
                     self.settings,
+                    self.model,
                 )
-            )
-            self.track_id += 1
-
-        for i in reversed(unassigned_tracks):
-            self.tracks[i].time_since_update += 1
-            if (
-                self.tracks[i].time_since_update > self.max_age
-                or self.tracks[i].consecutive_misses > self.max_consecutive_misses
-            ):
-                self.tracks.pop(i)
-
-        for track in self.tracks:
-            if track.hits >= self.min_hits and track.stage == TrackStage.INITIALIZED:
-                track.stage = TrackStage.CONFIRMED
-            if track.time_since_update > 1:
-                track.hit_streak = 0
+                for n, i in enumerate(unassigned_detections)
+            ]
+            self.track_id += len(new_tracks)
+
+            for track in chain((self.tracks[i] for i in assigned_tracks), new_tracks):
+                if (
+                    track.hits >= self.min_hits
+                    and track.stage == TrackStage.INITIALIZED
+                ):
+                    track.stage = TrackStage.CONFIRMED
+
+            if expired:
+                self.tracks = [
+                    track for i, track in enumerate(self.tracks) if i not in expired
+                ]
+            self.tracks.extend(new_tracks)
+
+        self.profiler.count(detections=len(detections), tracks=len(self.tracks))
 
     def get_tracks(self) -> List[Track]:
         return self.tracks
 
+    def step(self, detections: List[np.ndarray]) -> List[Dict[str, Any]]:
+        self.predict_tracks()
+        self.update_tracks(detections)
+        return self.get_output_tracks()
+
+    def get_output_tracks(self) -> List[Dict[str, Any]]:
+        with self.profiler.stage("serialization"):
+            frame_tracks = []
+            for track in self.tracks:
+                if track.stage == TrackStage.CONFIRMED:
+                    frame_tracks.append(
+                        {
+                            "id": track.id,
+                            "x": track.get_smoothed_position()[0],
+                            "y": track.get_smoothed_position()[1],
+                            "z": track.get_smoothed_position()[2],
+                            "vx": track.get_velocity()[0],
+                            "vy": track.get_velocity()[1],
+                            "vz": track.get_velocity()[2],
+                            "ax": track.get_acceleration()[0],
+                            "ay": track.get_acceleration()[1],
+                            "az": track.get_acceleration()[2],
+                        }
+                    )
+        self.profiler.count(confirmed=len(frame_tracks))
+        return frame_tracks
+
+    def get_output_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self.profiler.stage("serialization"):
+            confirmed = [
+                track for track in self.tracks if track.stage == TrackStage.CONFIRMED
+            ]
+            ids = np.array([track.id for track in confirmed], dtype=np.int64)
+            states = np.array(
+                [
+                    np.concatenate(
+                        [
+                            track.get_smoothed_position(),
+                            track.get_velocity(),
+                            track.get_acceleration(),
+                        ]
+                    )
+                    for track in confirmed
+                ]
+            ).reshape(-1, 9)
+        self.profiler.count(confirmed=len(ids))
+        return ids, states
+
+
+class BatchTracker:
+    ARRAYS = (
+        "ids",
+        "x",
+        "P",
+        "confirmed",
+        "age",
+        "hits",
+        "hit_streak",
+        "time_since_update",
+        "consecutive_misses",
+        "history",
+        "history_length",
+    )
+
+    def __init__(
+        self,
+        settings: TrackSettings,
+        profiler: NullProfiler = NULL_PROFILER,
+        capacity: int = 64,
+    ) -> None:
+        self.track_id = 0
+        self.distance_threshold = settings.distance_threshold
+        self.max_age = settings.max_age
+        self.min_hits = settings.min_hits
+        self.max_consecutive_misses = settings.max_consecutive_misses
+        self.gating = settings.gating
+        self.metric = settings.metric
+        self.solver = settings.solver
+        self.settings = settings
+        self.profiler = profiler
+
+        self.F = TRANSITION_MATRIX.astype(float)
+        self.H = MEASUREMENT_MATRIX.astype(float)
+        self.R = np.eye(3) * settings.measurement_noise
+        self.Q = np.eye(9) * settings.process_noise
+        self.P0 = np.eye(9) * settings.covariance
+        self.I = np.eye(9)
+
+        self.size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros((capacity, 9))
+        self.P = np.zeros((capacity, 9, 9))
+        self.confirmed = np.zeros(capacity, dtype=bool)
+        self.age = np.zeros(capacity, dtype=np.int64)
+        self.hits = np.zeros(capacity, dtype=np.int64)
+        self.hit_streak = np.zeros(capacity, dtype=np.int64)
+        self.time_since_update = np.zeros(capacity, dtype=np.int64)
+        self.consecutive_misses = np.zeros(capacity, dtype=np.int64)
+        self.history = np.zeros((capacity, HISTORY_LENGTH, 3))
+        self.history_length = np.zeros(capacity, dtype=np.int64)
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self.ids):
+            return
+        old = {name: getattr(self, name) for name in self.ARRAYS}
+        self._allocate(max(capacity, 2 * len(self.ids)))
+        for name, array in old.items():
+            getattr(self, name)[: self.size] = array[: self.size]
+
+    def _compact(self, keep: np.ndarray) -> None:
+        n = int(np.count_nonzero(keep))
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[:n] = array[: self.size][keep]
+        self.size = n
+
+    def _add_tracks(self, positions: np.ndarray) -> None:
+        n = len(positions)
+        if n == 0:
+            return
+        self._reserve(self.size + n)
+        new = slice(self.size, self.size + n)
+
+        self.ids[new] = np.arange(self.track_id, self.track_id + n)
+        self.x[new] = 0.0
+        self.x[new, :3] = positions
+        self.P[new] = self._track_values(self.P0, new)
+        self.confirmed[new] = False
+        self.age[new] = 0
+        self.hits[new] = 1
+        self.hit_streak[new] = 0
+        self.time_since_update[new] = 0
+        self.consecutive_misses[new] = 0
+        self.history[new] = 0.0
+        self.history[new, 0] = positions
+        self.history_length[new] = 1
+
+        self.size += n
+        self.track_id += n
+
+    def _update_kalman(
+        self,
+        indices: np.ndarray,
+        measurements: np.ndarray,
+        inverse_covariances: Optional[np.ndarray] = None,
+    ) -> None:
+        x = self.x[indices]
+        P = self.P[indices]
+
+        y = measurements - x[:, :3]
+        PHT = P[:, :, :3]
+        if inverse_covariances is None:
+            inverse_covariances = innovation_covariance_inverses(
+                PHT[:, :3, :], self._track_values(self.R, indices)
+            )
+        K = PHT @ inverse_covariances
+
+        I_KH = self.I - K @ self.H
+        self.x[indices] = x + np.einsum("nij,nj->ni", K, y)
+        R = self._track_values(self.R, indices)
+        self.P[indices] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(
+            0, 2, 1
+        )
+
+    def _push_history(self, indices: np.ndarray, measurements: np.ndarray) -> None:
+        full = self.history_length[indices] == HISTORY_LENGTH
+        shifted = indices[full]
+        self.history[shifted, :-1] = self.history[shifted, 1:]
+        self.history_length[shifted] -= 1
+
+        self.history[indices, self.history_length[indices]] = measurements
+        self.history_length[indices] += 1
+
+    def _track_values(self, values: Any, indices: Any) -> Any:
+        # All tracks share the settings.
+        return values
+
+    def _match(
+        self, detections: np.ndarray, inverse_covariances: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return match_detections(
+            self.x[: self.size, :3],
+            detections,
+            self.distance_threshold,
+            self.gating,
+            self.profiler,
+            inverse_covariances,
+            self.solver,
+        )
+
+    def _birth(self, detections: np.ndarray, indices: np.ndarray) -> None:
+        self._add_tracks(detections[indices])
+
+    def associate_detections_to_tracks(
+        self, detections: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if len(detections) == 0:
+            return (
+                np.zeros(0, dtype=np.int64),
+                np.arange(self.size),
+                np.zeros(0, dtype=np.int64),
+            )
+
+        # The innovation covariances of the gate are reused by the update.
+        inverse_covariances = None
+        if self.metric == "mahalanobis":
+            with self.profiler.stage("cost_matrix"):
+                inverse_covariances = innovation_covariance_inverses(
+                    self.P[: self.size, :3, :3],
+                    self._track_values(self.R, slice(0, self.size)),
+                )
+
+        track_indices, detection_indices = self._match(detections, inverse_covariances)
+
+        if len(track_indices) > 0:
+            with self.profiler.stage("update"):
+                measurements = detections[detection_indices]
+                self._update_kalman(
+                    track_indices,
+                    measurements,
+                    (
+                        None
+                        if inverse_covariances is None
+                        else inverse_covariances[track_indices]
+                    ),
+                )
+                self.time_since_update[track_indices] = 0
+                self.hits[track_indices] += 1
+                self.hit_streak[track_indices] += 1
+                self.consecutive_misses[track_indices] = 0
+                self._push_history(track_indices, measurements)
+
+        track_assigned = np.zeros(self.size, dtype=bool)
+        track_assigned[track_indices] = True
+        detection_assigned = np.zeros(len(detections), dtype=bool)
+        detection_assigned[detection_indices] = True
+
+        return (
+            track_indices,
+            np.flatnonzero(~track_assigned),
+            np.flatnonzero(~detection_assigned),
+        )
+
+    def predict_tracks(self) -> None:
+        self.profiler.begin_frame()
+        with self.profiler.stage("predict"):
+            live = slice(0, self.size)
+            self.x[live] = self.x[live] @ self.F.T
+            self.P[live] = self.F @ self.P[live] @ self.F.T + self._track_values(
+                self.Q, live
+            )
+            self.age[live] += 1
+            self.consecutive_misses[live] += 1
+
+    def update_tracks(self, detections: List[np.ndarray]) -> None:
+        detections = np.asarray(detections, dtype=float).reshape(-1, 3)
+        _, unassigned_tracks, unassigned_detections = (
+            self.associate_detections_to_tracks(detections)
+        )
+
+        with self.profiler.stage("birth_death"):
+            self._birth(detections, unassigned_detections)
+
+            self.time_since_update[unassigned_tracks] += 1
+            expired = (
+                self.time_since_update[unassigned_tracks]
+                > self._track_values(self.max_age, unassigned_tracks)
+            ) | (
+                self.consecutive_misses[unassigned_tracks]
+                > self._track_values(self.max_consecutive_misses, unassigned_tracks)
+            )
+            if np.any(expired):
+                keep = np.ones(self.size, dtype=bool)
+                keep[unassigned_tracks[expired]] = False
+                self._compact(keep)
+
+            live = slice(0, self.size)
+            self.confirmed[live] |= self.hits[live] >= self._track_values(
+                self.min_hits, live
+            )
+            self.hit_streak[live][self.time_since_update[live] > 1] = 0
+
+        self.profiler.count(detections=len(detections), tracks=self.size)
+
+    def step(self, detections: List[np.ndarray]) -> List[Dict[str, Any]]:
+        self.predict_tracks()
+        self.update_tracks(detections)
+        return self.get_output_tracks()
+
+    def get_smoothed_positions(self) -> np.ndarray:
+        live = slice(0, self.size)
+        return self.history[live].sum(axis=1) / self.history_length[live, np.newaxis]
+
+    def get_output_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self.profiler.stage("serialization"):
+            confirmed = np.flatnonzero(self.confirmed[: self.size])
+            states = np.concatenate(
+                [self.get_smoothed_positions()[confirmed], self.x[confirmed, 3:]],
+                axis=1,
+            )
+        self.profiler.count(confirmed=len(confirmed))
+        return self.ids[confirmed], states
+
+    def get_output_tracks(self) -> List[Dict[str, Any]]:
+        ids, states = self.get_output_arrays()
+        keys = ("x", "y", "z") + TRACK_ATTRIBUTES
+        with self.profiler.stage("serialization"):
+            return [
+                {"id": track_id, **dict(zip(keys, state))}
+                for track_id, state in zip(ids.tolist(), states.tolist())
+            ]
+
+
+LANE_SETTINGS = (
+    "measurement_noise",
+    "process_noise",
+    "covariance",
+    "distance_threshold",
+    "max_age",
+    "min_hits",
+    "max_consecutive_misses",
+)
+
+
+def _control_settings(settings: TrackSettings) -> Tuple[bool, str, str]:
+    # Settings that select code paths rather than values.
+    return settings.gating, settings.metric, settings.solver
+
+
+class LockstepTracker(BatchTracker):
+    # Tracks of many independent lanes, a sequence tracked with one set of
+    # settings, share one set of arrays and are predicted and updated together.
+    # Every track remembers its lane and is only associated with detections of
+    # that lane. Settings that change control flow must be equal in all lanes.
+    ARRAYS = BatchTracker.ARRAYS + ("lane",)
+
+    def __init__(
+        self,
+        lane_settings: List[TrackSettings],
+        profiler: NullProfiler = NULL_PROFILER,
+        capacity: int = 64,
+    ) -> None:
+        super().__init__(lane_settings[0], profiler, capacity)
+        if any(
+            _control_settings(settings) != _control_settings(self.settings)
+            for settings in lane_settings
+        ):
+            raise ValueError("Gating, metric and solver must be equal in all lanes.")
+
+        self.num_lanes = len(lane_settings)
+        self.next_ids = np.zeros(self.num_lanes, dtype=np.int64)
+        self.detection_lanes = np.zeros(0, dtype=np.int64)
+
+        values = {
+            name: np.array([getattr(settings, name) for settings in lane_settings])
+            for name in LANE_SETTINGS
+        }
+        self.uniform = all(np.all(array == array[0]) for array in values.values())
+        self.distance_threshold = values["distance_threshold"]
+        self.max_age = values["max_age"]
+        self.min_hits = values["min_hits"]
+        self.max_consecutive_misses = values["max_consecutive_misses"]
+        self.R = np.eye(3) * values["measurement_noise"][:, np.newaxis, np.newaxis]
+        self.Q = np.eye(9) * values["process_noise"][:, np.newaxis, np.newaxis]
+        self.P0 = np.eye(9) * values["covariance"][:, np.newaxis, np.newaxis]
+
+    def _allocate(self, capacity: int) -> None:
+        super()._allocate(capacity)
+        self.lane = np.zeros(capacity, dtype=np.int64)
+
+    def _track_values(self, values: Any, indices: Any) -> Any:
+        if self.uniform:
+            return values[0]
+        return values[self.lane[indices]]
+
+    def _add_tracks(self, positions: np.ndarray, lanes: np.ndarray) -> None:
+        n = len(positions)
+        if n == 0:
+            return
+        self._reserve(self.size + n)
+        self.lane[self.size : self.size + n] = lanes
+        super()._add_tracks(positions)
+        new = slice(self.size - n, self.size)
+
+        # Births arrive grouped by lane, ids count up within each lane.
+        counts = np.bincount(lanes, minlength=self.num_lanes)
+        ranks = np.arange(n) - (np.cumsum(counts) - counts)[lanes]
+        self.ids[new] = self.next_ids[lanes] + ranks
+        self.next_ids += counts
+
+    def _birth(self, detections: np.ndarray, indices: np.ndarray) -> None:
+        self._add_tracks(detections[indices], self.detection_lanes[indices])
+
+    def _match(
+        self, detections: np.ndarray, inverse_covariances: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        states = self.x[: self.size, :3]
+        track_lanes = self.lane[: self.size]
+        if self.gating:
+            return _match_gated(
+                states,
+                detections,
+                self._track_values(self.distance_threshold, slice(0, self.size)),
+                self.profiler,
+                inverse_covariances,
+                (track_lanes, self.detection_lanes),
+                self.solver,
+            )
+
+        order = np.argsort(track_lanes, kind="stable")
+        bounds = np.arange(self.num_lanes + 1)
+        track_offsets = np.searchsorted(track_lanes[order], bounds)
+        detection_offsets = np.searchsorted(self.detection_lanes, bounds)
+
+        matched_tracks = [np.zeros(0, dtype=np.int64)]
+        matched_detections = [np.zeros(0, dtype=np.int64)]
+        occupied = (np.diff(track_offsets) > 0) & (np.diff(detection_offsets) > 0)
+        for lane in np.flatnonzero(occupied):
+            rows = order[track_offsets[lane] : track_offsets[lane + 1]]
+            start = detection_offsets[lane]
+            track_indices, detection_indices = _match_dense(
+                states[rows],
+                detections[start : detection_offsets[lane + 1]],
+                self.distance_threshold[lane],
+                self.profiler,
+                None if inverse_covariances is None else inverse_covariances[rows],
+                self.solver,
+            )
+            matched_tracks.append(rows[track_indices])
+            matched_detections.append(start + detection_indices)
+
+        return np.concatenate(matched_tracks), np.concatenate(matched_detections)
+
+    def update_tracks(
+        self, detections: np.ndarray, detection_lanes: np.ndarray
+    ) -> None:
+        self.detection_lanes = detection_lanes
+        super().update_tracks(detections)
+
+    def remove_lanes(self, finished: np.ndarray) -> None:
+        keep = ~finished[self.lane[: self.size]]
+        if not np.all(keep):
+            self._compact(keep)
+
+    def get_output_records(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ids, states = self.get_output_arrays()
+        confirmed = np.flatnonzero(self.confirmed[: self.size])
+        return self.lane[confirmed], ids, states
+
+
+TRACKER_ENGINES = {"object": Tracker, "batch": BatchTracker}
+TRACKER_BACKENDS = ("python", "cpp")
+
 
 def run_tracker_with_parameters(
-    tracker_settings: TrackSettings, detections: Dict[str, Any]
+    tracker_settings: TrackSettings,
+    detections: Dict[str, Any],
+    engine: str = "object",
+    backend: str = "python",
+    profiler: NullProfiler = NULL_PROFILER,
 ) -> Dict[str, Any]:
-    tracker = Tracker(tracker_settings)
-    output_data: Dict[str, Any] = {}
+    if backend == "cpp":
+        if profiler.enabled:
+            raise ValueError("Profiling is only available for the python backend.")
+        import cpp_tracker
 
-    for frame, content in detections.items():
-        frame_detections = [
-            np.array([obj["x"], obj["y"], obj["z"]]) for obj in content["tracks"]
-        ]
+        return cpp_tracker.run_tracker_with_parameters(tracker_settings, detections)
+
+    frames = (
+        (
+            frame,
+            [np.array([obj["x"], obj["y"], obj["z"]]) for obj in content["tracks"]],
+        )
+        for frame, content in detections.items()
+    )
+    return {
+        frame: {"tracks": frame_tracks}
+        for frame, frame_tracks in stream_tracker(
+            tracker_settings, frames, engine, profiler
+        )
+    }
+
+
+def stream_tracker(
+    tracker_settings: TrackSettings,
+    frames: Iterable[Tuple[str, List[np.ndarray]]],
+    engine: str = "object",
+    profiler: NullProfiler = NULL_PROFILER,
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    tracker = TRACKER_ENGINES[engine](tracker_settings, profiler)
+    for frame, frame_detections in frames:
+        yield frame, tracker.step(frame_detections)
+
+
+def run_tracker_stream(
+    tracker_settings: TrackSettings,
+    lines: Iterable[str],
+    output: TextIO,
+    engine: str = "object",
+    profiler: NullProfiler = NULL_PROFILER,
+) -> None:
+    frames = (
+        (frame, content_positions(content))
+        for frame, content in map(parse_frame_line, lines)
+        if frame is not None
+    )
+    for frame, frame_tracks in stream_tracker(
+        tracker_settings, frames, engine, profiler
+    ):
+        output.write(format_frame_line(frame, {"tracks": frame_tracks}))
+        output.flush()
+
+
+def run_tracker_on_sequence(
+    tracker_settings: TrackSettings,
+    detections: Sequence,
+    engine: str = "object",
+    backend: str = "python",
+    profiler: NullProfiler = NULL_PROFILER,
+) -> Sequence:
+    if backend == "cpp":
+        if profiler.enabled:
+            raise ValueError("Profiling is only available for the python backend.")
+        import cpp_tracker
+
+        output_offsets, ids, states = cpp_tracker.run_tracker_arrays(
+            tracker_settings, detections.positions, detections.frame_offsets
+        )
+    else:
+        tracker = TRACKER_ENGINES[engine](tracker_settings, profiler)
+        frame_ids = []
+        frame_states = []
+
+        for index in range(len(detections)):
+            tracker.predict_tracks()
+            tracker.update_tracks(detections.frame_positions(index))
+
+            ids, states = tracker.get_output_arrays()
+            frame_ids.append(ids)
+            frame_states.append(states)
 
+        counts = [len(ids) for ids in frame_ids]
+        output_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        ids = np.concatenate(frame_ids) if frame_ids else np.zeros(0, dtype=np.int64)
+        states = np.concatenate(frame_states) if frame_states else np.zeros((0, 9))
+
+    return Sequence(
+        frames=detections.frames,
+        frame_offsets=output_offsets,
+        positions=states[:, :3],
+        ids=ids,
+        attributes={key: states[:, 3 + i] for i, key in enumerate(TRACK_ATTRIBUTES)},
+    )
+
+
+def _run_lanes(
+    lane_settings: List[TrackSettings],
+    sequences: List[Sequence],
+    profiler: NullProfiler = NULL_PROFILER,
+) -> List[Sequence]:
+    num_sequences = len(sequences)
+    if num_sequences == 0:
+        return []
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    num_frames = int(lengths.max(initial=0))
+
+    # Object offsets of every sequence padded to the longest one, frames past
+    # the end of a sequence are empty.
+    positions = np.concatenate(
+        [sequence.positions for sequence in sequences] + [np.zeros((0, 3))]
+    )
+    bases = np.cumsum([0] + [sequence.num_objects for sequence in sequences])[:-1]
+    offsets = np.zeros((num_sequences, num_frames + 1), dtype=np.int64)
+    for nr, sequence in enumerate(sequences):
+        offsets[nr, : len(sequence) + 1] = sequence.frame_offsets
+        offsets[nr, len(sequence) + 1 :] = sequence.frame_offsets[-1]
+    offsets += bases[:, np.newaxis]
+
+    tracker = LockstepTracker(lane_settings, profiler)
+    records = []
+    for index in range(num_frames):
+        tracker.remove_lanes(lengths == index)
         tracker.predict_tracks()
-        tracker.update_tracks(frame_detections)
-
-        frame_tracks = []
-        for track in tracker.get_tracks():
-            if track.stage == TrackStage.CONFIRMED:
-                frame_tracks.append(
-                    {
-                        "id": track.id,
-                        "x": track.get_smoothed_position()[0],
-                        "y": track.get_smoothed_position()[1],
-                        "z": track.get_smoothed_position()[2],
-                        "vx": track.get_velocity()[0],
-                        "vy": track.get_velocity()[1],
-                        "vz": track.get_velocity()[2],
-                        "ax": track.get_acceleration()[0],
-                        "ay": track.get_acceleration()[1],
-                        "az": track.get_acceleration()[2],
-                    }
-                )
 
-        output_data[frame] = {"tracks": frame_tracks}
-    return output_data
+        counts = offsets[:, index + 1] - offsets[:, index]
+        starts = np.cumsum(counts) - counts
+        objects = np.repeat(offsets[:, index] - starts, counts) + np.arange(
+            counts.sum()
+        )
+        tracker.update_tracks(
+            positions[objects], np.repeat(np.arange(num_sequences), counts)
+        )
+
+        frame_lanes, ids, states = tracker.get_output_records()
+        records.append((frame_lanes, np.full(len(ids), index), ids, states))
+
+    # Records are in frame order, a stable sort by lane keeps that order.
+    if records:
+        frame_lanes, frame_indices, ids, states = map(np.concatenate, zip(*records))
+    else:
+        frame_lanes = frame_indices = ids = np.zeros(0, dtype=np.int64)
+        states = np.zeros((0, 9))
+    order = np.argsort(frame_lanes, kind="stable")
+    ids, states = ids[order], states[order]
+    counts = np.bincount(
+        frame_lanes * max(num_frames, 1) + frame_indices,
+        minlength=num_sequences * max(num_frames, 1),
+    ).reshape(num_sequences, -1)
+
+    outputs = []
+    start = 0
+    for nr, sequence in enumerate(sequences):
+        output_offsets = np.concatenate(
+            [[0], np.cumsum(counts[nr, : len(sequence)])]
+        ).astype(np.int64)
+        end = start + output_offsets[-1]
+        outputs.append(
+            Sequence(
+                frames=sequence.frames,
+                frame_offsets=output_offsets,
+                positions=states[start:end, :3],
+                ids=ids[start:end],
+                attributes={
+                    key: states[start:end, 3 + i]
+                    for i, key in enumerate(TRACK_ATTRIBUTES)
+                },
+            )
+        )
+        start = end
+    return outputs
+
+
+def run_tracker_on_sequences(
+    tracker_settings: TrackSettings,
+    sequences: List[Sequence],
+    profiler: NullProfiler = NULL_PROFILER,
+) -> List[Sequence]:
+    return _run_lanes([tracker_settings] * len(sequences), sequences, profiler)
+
+
+def run_trackers_on_sequences(
+    settings_batch: List[TrackSettings],
+    sequences: List[Sequence],
+    profiler: NullProfiler = NULL_PROFILER,
+) -> List[List[Sequence]]:
+    # One lane per combination of settings and sequence, the tracks of every
+    # settings are returned per sequence. Settings that select different code
+    # paths are tracked in separate passes.
+    passes: Dict[Tuple[bool, str, str], List[int]] = {}
+    for nr, settings in enumerate(settings_batch):
+        passes.setdefault(_control_settings(settings), []).append(nr)
+
+    outputs: List[List[Sequence]] = [[] for _ in settings_batch]
+    for members in passes.values():
+        lane_settings = [
+            settings_batch[nr] for nr in members for _ in range(len(sequences))
+        ]
+        lane_outputs = _run_lanes(lane_settings, sequences * len(members), profiler)
+        for position, nr in enumerate(members):
+            outputs[nr] = lane_outputs[
+                position * len(sequences) : (position + 1) * len(sequences)
+            ]
+    return outputs
 
 
 def parse_args():
@@ -264,7 +1382,7 @@ def parse_args():
     parser.add_argument(
         "--input-detections",
         type=Path,
-        help="Path to detections json file.",
+        help="Path to detections file (.json, .ndjson or columnar .npz).",
     )
     parser.add_argument(
         "--input-parameters",
@@ -274,16 +1392,112 @@ def parse_args():
     parser.add_argument(
         "--output",
         type=Path,
-        help="Path to output tracks json file.",
+        help="Path to output tracks file (.json, .ndjson or columnar .npz).",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=sorted(TRACKER_ENGINES),
+        default="object",
+        help="Tracker engine, one Kalman filter per track or batched arrays. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=TRACKER_BACKENDS,
+        default="python",
+        help="Tracker implementation, python or the C++ library in target/. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read newline-delimited frames from --input-detections (stdin if omitted) and write tracks frame by frame to --output (stdout if omitted).",
+    )
+    parser.add_argument(
+        "--gating",
+        action="store_true",
+        help="Gate association with a spatial index and solve each cluster separately.",
+    )
+    parser.add_argument(
+        "--metric",
+        type=str,
+        choices=DISTANCE_METRICS,
+        default="euclidean",
+        help="Association distance, euclidean or squared mahalanobis with distance_threshold as chi-square gate. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--solver",
+        type=str,
+        choices=ASSIGNMENT_SOLVERS,
+        default="hungarian",
+        help="Association solver, exact hungarian, greedy nearest neighbour within the gate or epsilon-auction, unless the parameters name one. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="Record per-frame stage timings and object counts to this file.",
+    )
+    parser.add_argument(
+        "--profile-format",
+        type=str,
+        choices=PROFILE_FORMATS,
+        default="json",
+        help="Format of --profile, plain json or a Chrome trace for chrome://tracing and Perfetto. (default: %(default)s)",
     )
 
     return parser.parse_args()
 
 
+def _run(
+    args: argparse.Namespace, tracker_settings: TrackSettings, profiler: NullProfiler
+) -> None:
+    if args.stream:
+        if args.backend != "python":
+            raise ValueError("Streaming requires the python backend.")
+        with ExitStack() as stack:
+            lines = (
+                sys.stdin
+                if args.input_detections is None
+                else stack.enter_context(open(args.input_detections))
+            )
+            output = (
+                sys.stdout
+                if args.output is None
+                else stack.enter_context(open(args.output, "w"))
+            )
+            run_tracker_stream(
+                tracker_settings, lines, output, engine=args.engine, profiler=profiler
+            )
+        return
+
+    if args.backend == "cpp":
+        detections = load_data(args.input_detections)
+        output_data = run_tracker_with_parameters(
+            tracker_settings, detections, backend=args.backend, profiler=profiler
+        )
+        save_data(args.output, output_data)
+        return
+
+    frames = (
+        (frame, content_positions(content))
+        for frame, content in iter_frames(args.input_detections)
+    )
+    tracked_frames = (
+        (frame, {"tracks": frame_tracks})
+        for frame, frame_tracks in stream_tracker(
+            tracker_settings, frames, engine=args.engine, profiler=profiler
+        )
+    )
+    if args.output.suffix == NDJSON_EXTENSION:
+        save_ndjson(args.output, tracked_frames)
+    else:
+        save_data(args.output, dict(tracked_frames))
+
+
 def main() -> None:
     args = parse_args()
 
-    detections = load_json(args.input_detections)
     parameters = load_json(args.input_parameters)
     tracker_settings = TrackSettings(
         measurement_noise=parameters["measurement_noise"],
@@ -293,10 +1507,17 @@ def main() -> None:
         max_age=parameters["max_age"],
         min_hits=parameters["min_hits"],
         max_consecutive_misses=parameters["max_consecutive_misses"],
+        gating=args.gating,
+        metric=args.metric,
+        solver=parameters.get("solver", args.solver),
     )
-    output_data = run_tracker_with_parameters(tracker_settings, detections)
+    profiler = FrameProfiler() if args.profile is not None else NULL_PROFILER
 
-    save_json(args.output, output_data)
+    try:
+        _run(args, tracker_settings, profiler)
+    finally:
+        if profiler.enabled:
+            profiler.save(args.profile, args.profile_format)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,17 @@
 from pathlib import Path
+import hashlib
 import json
-from typing import Any, List
+import struct
+import zipfile
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from datatypes.sequence import Sequence
+
+COLUMNAR_EXTENSION = ".npz"
+NDJSON_EXTENSION = ".ndjson"
+DATA_EXTENSIONS = (COLUMNAR_EXTENSION, NDJSON_EXTENSION, ".json")
+ATTRIBUTE_PREFIX = "attribute_"
 
 
 def get_data_path() -> Path:
@@ -17,11 +28,180 @@ def load_json(filepath: Path) -> Any:
     return data
 
 
-def save_json(filepath: Path, data: Any, indent: int = 4) -> None:
+def save_json(filepath: Path, data: Any, indent: Optional[int] = None) -> None:
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    # Compact separators unless the file is meant to be read by humans.
+    separators = (",", ":") if indent is None else None
+    with open(filepath, "w") as f:
+        json.dump(data, f, indent=indent, separators=separators)
+
+
+def save_json_frames(
+    filepath: Path, frames: Iterable[Tuple[str, Dict[str, Any]]]
+) -> None:
+    # One compact JSON object written frame by frame. Every frame goes through
+    # the C encoder of json.dumps, the document is never held as one string.
     filepath.parent.mkdir(parents=True, exist_ok=True)
+    separators = (",", ":")
     with open(filepath, "w") as f:
-        json.dump(data, f, indent=indent)
+        f.write("{")
+        for nr, (frame, content) in enumerate(frames):
+            if nr > 0:
+                f.write(",")
+            f.write(json.dumps(str(frame)))
+            f.write(":")
+            f.write(json.dumps(content, separators=separators))
+        f.write("}")
+
+
+def parse_frame_line(line: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None, {}
+    content = json.loads(line)
+    return str(content.pop("frame")), content
+
+
+def format_frame_line(frame: str, content: Dict[str, Any]) -> str:
+    return json.dumps({"frame": frame, **content}, separators=(",", ":")) + "\n"
+
+
+def iter_ndjson(filepath: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with open(filepath, "r") as f:
+        for line in f:
+            frame, content = parse_frame_line(line)
+            if frame is not None:
+                yield frame, content
+
+
+def save_ndjson(filepath: Path, frames: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, "w") as f:
+        for frame, content in frames:
+            f.write(format_frame_line(frame, content))
+
+
+def content_positions(content: Dict[str, Any]) -> np.ndarray:
+    return np.array(
+        [[obj["x"], obj["y"], obj["z"]] for obj in content["tracks"]], dtype=np.float64
+    ).reshape(-1, 3)
+
+
+def file_digest(filepath: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def get_files(dir: Path, extension: str = ".json") -> List[Path]:
     return list(dir.glob(f"*{extension}"))
+
+
+def find_data_file(dir: Path, name: str) -> Optional[Path]:
+    for extension in DATA_EXTENSIONS:
+        filepath = dir / f"{name}{extension}"
+        if filepath.exists():
+            return filepath
+    return None
+
+
+def _memory_map_npz(filepath: Path) -> Dict[str, np.ndarray]:
+    arrays = {}
+    with zipfile.ZipFile(filepath) as archive, open(filepath, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            # Skip the local file header to reach the raw .npy member.
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    filepath,
+                    dtype=dtype,
+                    mode="r",
+                    offset=f.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def load_columnar(filepath: Path) -> Sequence:
+    arrays = _memory_map_npz(filepath)
+    return Sequence(
+        frames=arrays["frames"],
+        frame_offsets=arrays["frame_offsets"],
+        positions=arrays["positions"],
+        ids=arrays.get("ids"),
+        attributes={
+            name[len(ATTRIBUTE_PREFIX) :]: array
+            for name, array in arrays.items()
+            if name.startswith(ATTRIBUTE_PREFIX)
+        },
+    )
+
+
+def save_columnar(filepath: Path, sequence: Sequence) -> None:
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "frames": sequence.frames,
+        "frame_offsets": sequence.frame_offsets,
+        "positions": sequence.positions,
+    }
+    if sequence.ids is not None:
+        arrays["ids"] = sequence.ids
+    for key, values in sequence.attributes.items():
+        arrays[f"{ATTRIBUTE_PREFIX}{key}"] = values
+
+    with open(filepath, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def iter_frames(filepath: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if filepath.suffix == NDJSON_EXTENSION:
+        yield from iter_ndjson(filepath)
+    elif filepath.suffix == COLUMNAR_EXTENSION:
+        yield from load_columnar(filepath).iter_frames()
+    else:
+        yield from load_json(filepath).items()
+
+
+def load_sequence(filepath: Path) -> Sequence:
+    if filepath.suffix == COLUMNAR_EXTENSION:
+        return load_columnar(filepath)
+    return Sequence.from_frames(iter_frames(filepath))
+
+
+def load_data(filepath: Path) -> Dict[str, Any]:
+    return dict(iter_frames(filepath))
+
+
+def save_data(filepath: Path, data: Union[Dict[str, Any], Sequence]) -> None:
+    if filepath.suffix == COLUMNAR_EXTENSION:
+        if not isinstance(data, Sequence):
+            data = Sequence.from_dict(data)
+        save_columnar(filepath, data)
+    elif filepath.suffix == NDJSON_EXTENSION:
+        save_ndjson(
+            filepath, data.iter_frames() if isinstance(data, Sequence) else data.items()
+        )
+    else:
+        save_json_frames(
+            filepath, data.iter_frames() if isinstance(data, Sequence) else data.items()
+        )
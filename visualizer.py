@@ -1,14 +1,62 @@
-import json
 import numpy as np
-import matplotlib.pyplot as plt
 import argparse
-from mpl_toolkits.mplot3d import Axes3D
+from concurrent.futures import ProcessPoolExecutor
 from itertools import cycle
 from time import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, List, Tuple
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d import Axes3D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from datatypes.sequence import MISSING_ID, Sequence
+from utilities import NDJSON_EXTENSION, content_positions, iter_ndjson, load_sequence
+
+FIGURE_SIZE = (18, 6)
+LIMIT_MARGIN = 0.05
 
-from utilities import load_json
+# One figure per number of subplots, reused by every Visualizer in a process.
+_FIGURE_TEMPLATES: Dict[int, Tuple[Figure, List[Axes3D]]] = {}
+
+
+def _figure_template(num_files: int) -> Tuple[Figure, List[Axes3D]]:
+    if num_files not in _FIGURE_TEMPLATES:
+        fig = Figure(figsize=FIGURE_SIZE)
+        FigureCanvasAgg(fig)
+        axes = [
+            fig.add_subplot(1, num_files, i + 1, projection="3d")
+            for i in range(num_files)
+        ]
+        _FIGURE_TEMPLATES[num_files] = (fig, axes)
+    return _FIGURE_TEMPLATES[num_files]
+
+
+def _read_plot_columns(filepath: Path) -> Sequence:
+    # Reads NDJSON one frame at a time and keeps only what is drawn, frame
+    # numbers, positions and ids, as one small array per frame.
+    frames: List[int] = []
+    counts: List[int] = []
+    positions: List[np.ndarray] = [np.zeros((0, 3))]
+    ids: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+    has_ids = False
+    for frame, content in iter_ndjson(filepath):
+        objects = content["tracks"]
+        frames.append(int(frame))
+        counts.append(len(objects))
+        positions.append(content_positions(content))
+        ids.append(
+            np.array([obj.get("id", MISSING_ID) for obj in objects], dtype=np.int64)
+        )
+        has_ids = has_ids or any("id" in obj for obj in objects)
+
+    return Sequence(
+        frames=np.array(frames, dtype=np.int64),
+        frame_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        positions=np.concatenate(positions),
+        ids=np.concatenate(ids) if has_ids else None,
+    )
 
 
 class VisualizerInput:
@@ -27,72 +75,103 @@ class Visualizer:
         self.colors = cycle(["r", "g", "b", "y", "c", "m", "k"])
         self.color_default = "b"
 
-    def _load_data(self, filepath: Path) -> Dict[str, Any]:
-        return load_json(filepath)
-
-    def _plot_tracks(
-        self,
-        ax: Axes3D,
-        json_data: Dict[str, Any],
-    ) -> None:
-        track_points = {}
-
-        for frame_data in json_data.values():
-            for track in frame_data["tracks"]:
-                track_id = track.get("id")
-                if track_id not in track_points:
-                    track_points[track_id] = {"x": [], "y": [], "z": []}
-                track_points[track_id]["x"].append(track["x"])
-                track_points[track_id]["y"].append(track["y"])
-                track_points[track_id]["z"].append(track["z"])
-
-        for track_id, points in track_points.items():
+    def _load_data(self, filepath: Path) -> Sequence:
+        if filepath.suffix == NDJSON_EXTENSION:
+            return _read_plot_columns(filepath)
+        return load_sequence(filepath)
+
+    def _clear(self, ax: Axes3D) -> None:
+        for artist in [*ax.collections, *ax.lines]:
+            artist.remove()
+
+    def _set_limits(self, ax: Axes3D, positions: np.ndarray) -> None:
+        if len(positions) == 0:
+            return
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        margin = np.maximum((high - low) * LIMIT_MARGIN, 1e-3)
+        ax.set_xlim(low[0] - margin[0], high[0] + margin[0])
+        ax.set_ylim(low[1] - margin[1], high[1] + margin[1])
+        ax.set_zlim(low[2] - margin[2], high[2] + margin[2])
+
+    def _plot_tracks(self, ax: Axes3D, sequence: Sequence) -> None:
+        if sequence.num_objects == 0:
+            return
+        ids = (
+            sequence.ids
+            if sequence.ids is not None
+            else np.zeros(sequence.num_objects, dtype=np.int64)
+        )
+
+        # Objects are stored frame by frame, a stable sort by id keeps every
+        # track in frame order; colors follow the order tracks first appear.
+        order = np.argsort(ids, kind="stable")
+        track_ids, starts = np.unique(ids[order], return_index=True)
+        segments = np.split(sequence.positions[order], starts[1:])
+        first_seen = np.argsort(np.unique(ids, return_index=True)[1], kind="stable")
+        for track_id in track_ids[first_seen].tolist():
             if track_id not in self.color_map:
                 self.color_map[track_id] = next(self.colors)
-            color = self.color_map[track_id]
+        colors = [self.color_map[track_id] for track_id in track_ids.tolist()]
 
-            ax.plot(points["x"], points["y"], points["z"], color=color)
+        ax.add_collection3d(Line3DCollection(segments, colors=colors))
 
-    def _plot_tracks_scatter(self, ax: Axes3D, json_data: Dict[str, Any]) -> None:
-        track_data_by_id = {}
+    def _plot_tracks_scatter(self, ax: Axes3D, sequence: Sequence) -> None:
+        if sequence.num_objects == 0:
+            return
+        frames = np.repeat(sequence.frames, np.diff(sequence.frame_offsets))
+        colors = np.tile(to_rgba(self.color_default), (len(frames), 1))
+        colors[:, 3] = self.alpha_min + (frames / frames.max()) * (
+            self.alpha_max - self.alpha_min
+        )
 
-        max_frame = max(map(int, json_data.keys()))
-        for frame_str, frame_data in json_data.items():
-            frame = int(frame_str)
-            alpha = self.alpha_min + (frame / max_frame) * (
-                self.alpha_max - self.alpha_min
-            )
-
-            for track in frame_data["tracks"]:
-                x, y, z = track["x"], track["y"], track["z"]
-
-                ax.scatter(x, y, z, color=self.color_default, alpha=alpha)
+        positions = sequence.positions
+        ax.scatter(positions[:, 0], positions[:, 1], positions[:, 2], c=colors)
 
     def visualize(self, output: Path, dpi: int = 50) -> None:
         output.parent.mkdir(parents=True, exist_ok=True)
 
         t0 = time()
-        fig = plt.figure(figsize=(18, 6))
-        num_files = len(self.input_files)
+        fig, axes = _figure_template(len(self.input_files))
 
-        for i, input_settings in enumerate(self.input_files):
-            ax = fig.add_subplot(1, num_files, i + 1, projection="3d")
+        for ax, input_settings in zip(axes, self.input_files):
+            self._clear(ax)
 
-            json_data = self._load_data(input_settings.filepath)
+            sequence = self._load_data(input_settings.filepath)
             if input_settings.ignore_id:
-                self._plot_tracks_scatter(ax, json_data)
+                self._plot_tracks_scatter(ax, sequence)
             else:
-                self._plot_tracks(ax, json_data)
+                self._plot_tracks(ax, sequence)
+            self._set_limits(ax, sequence.positions)
 
             ax.set_xlabel("X")
             ax.set_ylabel("Y")
             ax.set_zlabel("Z")
             ax.set_title(input_settings.title)
 
-        plt.savefig(output, dpi=dpi)
+        fig.savefig(output, dpi=dpi)
         print("Summarizing plots to", output, f"({time() - t0:.2f}s)")
 
 
+def _render(arguments: Tuple[List[VisualizerInput], Path, int]) -> None:
+    input_files, output, dpi = arguments
+    Visualizer(input_files).visualize(output, dpi=dpi)
+
+
+def visualize_clips(
+    clips: List[Tuple[List[VisualizerInput], Path]], dpi: int = 50, workers: int = 1
+) -> None:
+    arguments = [(input_files, output, dpi) for input_files, output in clips]
+
+    if workers <= 1:
+        for argument in arguments:
+            _render(argument)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(arguments) // (4 * workers))
+        list(pool.map(_render, arguments, chunksize=chunksize))
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Run visualization given references, detections or tracks."